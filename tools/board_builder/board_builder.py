@@ -8,12 +8,19 @@
 #   - A Honeycomb API key with the "Manage Queries and Columns" and "Manage Public Boards" permissions
 
 import argparse
+import json
 import logging
 import os
 import signal
 import sys
+import time
 
+from lib import REGIONS, configure_session, governor, metrics
 from lib.builders import HoneycombBuilder
+from lib.cache import QueryCache
+from lib.hnyapi import set_api_url
+from lib.fleet import build_fleet, load_manifest, write_results
+from lib.templates import TEMPLATE_DIR, service_types
 
 logger = logging.getLogger(__name__)
 
@@ -22,21 +29,64 @@ def main():
     # parse command line arguments
     parser = argparse.ArgumentParser(
         description='Honeycomb Standard Board Builder Tool')
-    parser.add_argument('-n', '--service-name',
-                        help='Service name to build board for', required=True)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('-n', '--service-name',
+                        help='Service name to build board for')
+    target.add_argument('-m', '--manifest',
+                        help='CSV, JSON or YAML manifest of service_name, service_type and region to build boards for')
     parser.add_argument('-t', '--service-type',
-                        default="other", choices=['java', 'ruby', 'python', 'node', 'go', 'php', 'other'],
-                        help='Service type: java, ruby, python, etc...  May add extra queries to default board', required=False)
+                        default="other",
+                        help='Service type: java, ruby, python, etc...  Adds the queries from templates/<service-type>.json to the default board', required=False)
+    parser.add_argument('--template-dir',
+                        default=TEMPLATE_DIR,
+                        help='Directory of board templates, default of the templates directory next to this tool', required=False)
     parser.add_argument('-k', '--api-key',
                         help='Honeycomb API key', required=False)
     parser.add_argument('-r', '--region',
-                        default="us", choices=['us', 'eu'],
+                        default="us", choices=REGIONS,
                         help='Honeycomb region, default of "us", but can choose "eu" for customers using the EU datacenter', required=False)
+    parser.add_argument('-a', '--api-url',
+                        help='Honeycomb API URL (e.g. http://localhost:8080/1/), overrides the region\'s URL', required=False)
+    parser.add_argument('-w', '--workers',
+                        default=1, type=int,
+                        help='Number of queries and annotations to create concurrently, default of 1 (sequential)', required=False)
+    parser.add_argument('-f', '--fleet-workers',
+                        default=4, type=int,
+                        help='Number of services to build concurrently when using a manifest, default of 4', required=False)
+    parser.add_argument('-o', '--results-out',
+                        default="board_results.json",
+                        help='File to write manifest build results (board URLs, failures and timing) to, default of "board_results.json"', required=False)
+    parser.add_argument('--rate',
+                        default=10, type=float,
+                        help='Starting number of API requests per second, adjusted from the API\'s rate limit responses, default of 10', required=False)
+    parser.add_argument('--max-rate',
+                        default=50, type=float,
+                        help='Maximum number of API requests per second, default of 50', required=False)
+    parser.add_argument('-c', '--query-cache',
+                        help='File to cache created query and annotation IDs in, so rebuilding a board reuses unchanged queries', required=False)
+    parser.add_argument('--query-cache-max-age',
+                        default=30, type=int,
+                        help='Days after which cached queries are evicted and recreated, default of 30', required=False)
+    parser.add_argument('--query-cache-verify-interval',
+                        default=24, type=int,
+                        help='Hours after which a cached query is re-verified against the API before reuse, default of 24 (0 verifies every time)', required=False)
+    parser.add_argument('--reconcile',
+                        action='store_true',
+                        help='Update the existing board with the same name instead of creating a new one, making only the changes needed', required=False)
+    parser.add_argument('--plan',
+                        action='store_true',
+                        help='Print the reconcile plan (board, column and query changes, and API call count) without making any changes', required=False)
+    parser.add_argument('--metrics-out',
+                        help='File to write per-endpoint API call counts, retries, status codes, bytes and latencies to as JSON', required=False)
     parser.add_argument('-l', '--log-level',
                         default="warning", choices=['debug', 'info', 'warning', 'error', 'critical'],
                         help='Log level. Use warning or higher to only log the JSON output of this tool', required=False)
     args = parser.parse_args()
 
+    known_service_types = service_types(args.template_dir)
+    if args.service_type not in known_service_types:
+        parser.error(f"argument -t/--service-type: invalid choice: '{args.service_type}' (choose from {', '.join(sorted(known_service_types))})")
+
     logging.basicConfig(
         format="{asctime} ({funcName}:{levelname}) {message}",
         style="{",
@@ -54,9 +104,48 @@ def main():
         logger.critical('You must provide an API key via the -k flag or the HONEYCOMB_API_KEY environment variable')
         sys.exit(1)
 
-    builder = HoneycombBuilder(api_key, args.region)
+    if args.api_url:
+        set_api_url(args.api_url)
+
+    started = time.monotonic()
+    query_cache = None
+    if args.query_cache:
+        query_cache = QueryCache(args.query_cache, args.query_cache_max_age * 86400, args.query_cache_verify_interval * 3600)
+
+    try:
+        if args.manifest:
+            try:
+                entries = load_manifest(args.manifest, args.region, args.template_dir)
+            except ValueError as e:
+                parser.error(str(e))
+            configure_session(args.workers * args.fleet_workers, args.rate, args.max_rate)
+            results = build_fleet(entries, api_key, args.workers, args.fleet_workers, query_cache, args.reconcile, args.plan, args.template_dir)
+            results['rate_governor'] = governor.snapshot()
+            write_results(results, args.results_out)
+            print(f"\nBuilt {results['succeeded']} of {results['total']} boards, results written to {args.results_out}")
+            if results['failed']:
+                sys.exit(1)
+            return
+
+        configure_session(args.workers, args.rate, args.max_rate)
+        builder = HoneycombBuilder(api_key, args.region, args.workers, query_cache, args.plan, args.template_dir)
+
+        if args.reconcile or args.plan:
+            plan = builder.reconcile_service_board(args.service_name, args.service_type)
+            print(json.dumps(plan, indent=2))
+            if plan['board_url']:
+                print('\n' + plan['board_url'])
+            return
 
-    builder.build_service_board(args.service_name, args.service_type)
+        board_url = builder.build_service_board(args.service_name, args.service_type)
+        print('\n' + board_url)
+    finally:
+        # queries created before a failure are still valid, so keep them cached
+        if query_cache is not None:
+            query_cache.save()
+        logger.info(f"Request pacing: {governor.snapshot()}")
+        if args.metrics_out:
+            metrics.write(args.metrics_out, duration_s=round(time.monotonic() - started, 3), rate_governor=governor.snapshot())
 
 
 if __name__ == "__main__":
@@ -1,19 +1,52 @@
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+from .metrics import EndpointMetrics
+from .ratelimit import GovernedAdapter, RateGovernor
+
 HONEYCOMB_API_US = 'https://api.honeycomb.io/1/'  # /columns/dataset_slug
 HONEYCOMB_API_EU = 'https://api.eu1.honeycomb.io/1/'  # /columns/dataset_slug
+REGIONS = ('us', 'eu')
 
-# Define the retry strategy
+# Define the retry strategy, 429s are retried by the rate governor
 retry_strategy = Retry(
     total=4,  # Maximum number of retries
-    status_forcelist=[429, 500, 502, 503, 504],  # HTTP status codes to retry on
+    status_forcelist=[500, 502, 503, 504],  # HTTP status codes to retry on
 )
+
+# Shared pacing for every request made on the session
+governor = RateGovernor()
+
+# Per-endpoint call metrics for every request made on the session
+metrics = EndpointMetrics()
+
+# Number of pooled connections kept per host
+pool_maxsize = 10
+
 # Create an HTTP adapter with the retry strategy and mount it to session
-adapter = HTTPAdapter(max_retries=retry_strategy)
+adapter = GovernedAdapter(governor, max_retries=retry_strategy, pool_maxsize=pool_maxsize)
 
 # Create a new session object
 session = requests.Session()
 session.mount('http://', adapter)
 session.mount('https://', adapter)
+session.hooks['response'].append(metrics.response_hook)
+
+
+def configure_session(maxsize, rate=None, max_rate=None):
+    """
+    Remounts the shared session's adapter so at least maxsize connections
+    per host can be kept alive, e.g. when several workers share the session,
+    and optionally sets the governor's starting and maximum request rates.
+    """
+    global adapter, pool_maxsize
+    if max_rate is not None:
+        governor.max_rate = max_rate
+    if rate is not None:
+        governor.set_rate(rate)
+    if maxsize <= pool_maxsize:
+        return
+    pool_maxsize = maxsize
+    adapter = GovernedAdapter(governor, max_retries=retry_strategy, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
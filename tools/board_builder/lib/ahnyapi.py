@@ -0,0 +1,135 @@
+"""
+asyncio variant of lib/hnyapi.py, built on a pooled httpx.AsyncClient.
+
+The functions mirror hnyapi.py with the same names and arguments, so many calls
+can be in flight on one event loop instead of one per thread.  Both modules run
+the same API call generators from hnyapi.py, which build each request and read
+its response; only the client sending the requests differs.  Failed responses
+raise httpx.HTTPStatusError instead of requests.HTTPError.
+
+Requests are paced by the same rate governor and recorded in the same endpoint
+metrics as the sync session.  The client belongs to the event loop that first
+uses it; call aclose() before that loop ends.
+
+Requires the httpx module: pip3 install httpx
+"""
+import asyncio
+import functools
+import logging
+import time
+
+import httpx
+
+from . import governor, hnyapi, metrics
+from .metrics import endpoint_for_url
+from .hnyapi import hnyapi_url, craft_query_body, craft_queries_json_for_boards  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+
+# Maximum number of pooled connections shared by all in-flight calls
+max_connections = 100
+
+client = None
+
+
+def get_client():
+    global client
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=httpx.AsyncHTTPTransport(retries=MAX_RETRIES),  # retries connection errors
+            timeout=30.0,
+        )
+    return client
+
+
+async def aclose():
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+async def send(request):
+    """
+    Sends a request through the rate governor, retrying 429 and 5xx responses,
+    and records the call in the shared endpoint metrics.
+    """
+    headers = {"X-Honeycomb-Team": request.api_key}
+    if request.json is not None:
+        headers["Content-Type"] = "application/json"
+    started = time.monotonic()
+    for attempt in range(MAX_RETRIES + 1):
+        await governor.acquire_async()
+        response = await get_client().request(request.method, request.url, headers=headers, json=request.json)
+        governor.observe(response.status_code, response.headers)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            metrics.record(endpoint_for_url(request.url),
+                           response.status_code,
+                           time.monotonic() - started,
+                           len(response.request.content),
+                           len(response.content),
+                           attempt)
+            return response
+        if response.status_code != 429:
+            # 429s are paced by the governor, back off from server errors here
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    return response
+
+
+async def run_call(call):
+    """
+    Runs an API call generator from hnyapi.py on the pooled client, sending each
+    Request it yields and sending the response back in, and returns its result.
+    """
+    try:
+        request = next(call)
+        while True:
+            request = call.send(await send(request))
+    except StopIteration as stop:
+        return stop.value
+
+
+def async_api_call(function):
+    """Makes the async version of an hnyapi.py function."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        return await run_call(function.call(*args, **kwargs))
+    return wrapper
+
+
+hnyapi_request = async_api_call(hnyapi.hnyapi_request)
+check_dataset_exists = async_api_call(hnyapi.check_dataset_exists)
+check_column_exists = async_api_call(hnyapi.check_column_exists)
+list_columns = async_api_call(hnyapi.list_columns)
+create_dataset = async_api_call(hnyapi.create_dataset)
+create_column = async_api_call(hnyapi.create_column)
+create_query = async_api_call(hnyapi.create_query)
+create_annotation = async_api_call(hnyapi.create_annotation)
+get_query_annotation = async_api_call(hnyapi.get_query_annotation)
+get_query = async_api_call(hnyapi.get_query)
+craft_board_query = async_api_call(hnyapi.craft_board_query)
+craft_board = async_api_call(hnyapi.craft_board)
+list_boards = async_api_call(hnyapi.list_boards)
+update_board = async_api_call(hnyapi.update_board)
+
+
+async def craft_board_queries(dataset, query_specs, api_key, region="us", concurrency=10):
+    """
+    Creates the query and annotation for each (name, description, query_body) spec,
+    up to concurrency pairs at a time.  Results keep query_specs order; the first
+    failure cancels the remaining pairs and is raised.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def craft_one(name, description, query_body):
+        async with semaphore:
+            return await craft_board_query(dataset, name, description, query_body, api_key, region)
+
+    async with asyncio.TaskGroup() as group:
+        tasks = [group.create_task(craft_one(name, description, query_body))
+                 for name, description, query_body in query_specs]
+    return [task.result() for task in tasks]
@@ -1,255 +1,350 @@
-from .hnyapi import craft_query_body, craft_board_query, craft_board, create_column, create_dataset, check_column_exists, check_dataset_exists
+from .cache import query_cache_key
+from .hnyapi import craft_board_query, craft_board, create_column, create_dataset, check_dataset_exists, get_query, get_query_annotation, hnyapi_url, list_boards, list_columns, update_board
+from .templates import TEMPLATE_DIR, compile_board_plan
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 
+def query_matches(query_body, query):
+    """
+    Checks whether an existing query, as returned by the API, has query_body.
+    A field that is empty in one and missing from the other counts as equal.
+    """
+    return all((query.get(field) or None) == (value or None) for field, value in query_body.items())
+
+
 class HoneycombBuilder:
-    def __init__(self, api_key, region="us"):
+    def __init__(self, api_key, region="us", workers=1, query_cache=None, dry_run=False, template_dir=TEMPLATE_DIR):
         self.api_key = api_key
         self.region = region
+        self.workers = max(1, workers)
+        self.query_cache = query_cache
+        self.template_dir = template_dir
+        # when dry_run is set, datasets and columns are only recorded as changes, never created
+        self.dry_run = dry_run
         self.logger = logging.getLogger(__name__)
+        # dataset -> set of column names, probed once per dataset for the builder's lifetime
+        self.schemas = {}
+        self.schema_locks = {}
+        self.schema_lock = threading.Lock()
+        # dataset -> API calls made probing its schema that no plan has counted yet
+        self.schema_calls = {}
+        # datasets and {column: type} created (or, in a dry run, to be created) by this builder
+        self.dataset_changes = set()
+        self.column_changes = {}
+        # board name -> board, listed once per builder for reconciles
+        self.boards = None
+        self.boards_lock = threading.Lock()
+
+    def dataset_columns(self, dataset):
+        """
+        Returns the cached set of column names for dataset, creating the dataset
+        if needed.  The first call per dataset costs one dataset check and one
+        column listing; later calls are free.
+        """
+        with self.schema_lock:
+            dataset_lock = self.schema_locks.setdefault(dataset, threading.Lock())
+
+        with dataset_lock:
+            if dataset not in self.schemas:
+                if check_dataset_exists(dataset, self.api_key, self.region):
+                    columns = {column["key_name"] for column in list_columns(dataset, self.api_key, self.region)}
+                    self.schema_calls[dataset] = 2
+                else:
+                    if not self.dry_run:
+                        create_dataset(dataset, self.api_key, self.region)
+                    self.dataset_changes.add(dataset)
+                    columns = set()
+                    self.schema_calls[dataset] = 1
+                self.schemas[dataset] = columns
+            return self.schemas[dataset]
+
+    def ensure_columns(self, dataset, required_columns):
+        """
+        Creates any of required_columns ({name: type}) missing from the dataset's schema snapshot.
+        """
+        columns = self.dataset_columns(dataset)
+        missing = {column: column_type for column, column_type in required_columns.items() if column not in columns}
+        self.column_changes.setdefault(dataset, {}).update(missing)
+        if self.dry_run:
+            self.logger.info(f"Dataset: {dataset} is missing {len(missing)} of {len(required_columns)} required columns")
+            return
+        for column, column_type in missing.items():
+            create_column(dataset, column, column_type, self.api_key, self.region)
+            columns.add(column)
+        self.logger.info(f"Dataset: {dataset} has {len(required_columns) - len(missing)} of {len(required_columns)} required columns, created {len(missing)}")
+
+    def cache_key(self, dataset, query_body, name, description):
+        return query_cache_key(hnyapi_url(self.region), self.api_key, dataset, query_body, name, description)
+
+    def craft_cached_board_query(self, dataset, name, description, query_body):
+        """
+        Returns the board query reference for a query spec, reusing the query and
+        annotation from the query cache when an identical spec was created before.
+        """
+        if self.query_cache is None:
+            return craft_board_query(dataset, name, description, query_body, self.api_key, self.region)
+
+        key = self.cache_key(dataset, query_body, name, description)
+        entry = self.query_cache.get(key)
+        if entry is not None:
+            if not self.query_cache.needs_verification(entry):
+                self.logger.info(f"Reusing cached board query: {name}")
+                return {"query_id": entry["query_id"], "annotation_id": entry["annotation_id"]}
+            annotation = get_query_annotation(dataset, entry["annotation_id"], self.api_key, self.region)
+            if annotation is not None and annotation.get("query_id") == entry["query_id"]:
+                self.logger.info(f"Reusing verified cached board query: {name}")
+                self.query_cache.mark_verified(key)
+                return {"query_id": entry["query_id"], "annotation_id": entry["annotation_id"]}
+            self.logger.info(f"Evicting stale cached board query: {name}")
+            self.query_cache.evict(key)
+
+        board_query_reference = craft_board_query(dataset, name, description, query_body, self.api_key, self.region)
+        self.query_cache.put(key, board_query_reference)
+        return board_query_reference
+
+    def craft_board_queries(self, dataset, query_specs):
+        """
+        Creates the query and annotation for each (name, description, query_body) spec.
 
-    def build_service_queries(self, service_name):
-        queries = []
+        Each query+annotation pair is independent of the others, so when the builder
+        has more than one worker the pairs are created concurrently on the shared
+        session.  Specs found in the query cache are reused instead.  Results are
+        returned in the same order as query_specs.  If any pair fails, queued pairs
+        are cancelled and the first error is raised.
 
-        # Define the required columns
-        required_columns = {
-            "duration_ms": "float",
-            "error": "boolean",
-            "http.response.status_code": "integer",
-            "status_code": "integer",
-            "http.route": "string",
-        }
+        Parameters:
+        - dataset (str): The dataset the queries run against.
+        - query_specs (list): (name, description, query_body) tuples.
+
+        Returns:
+        list: Board query references, in query_specs order.
+        """
+        if self.workers == 1 or len(query_specs) < 2:
+            return [self.craft_cached_board_query(dataset, name, description, query_body)
+                    for name, description, query_body in query_specs]
+
+        self.logger.info(f"Crafting {len(query_specs)} board queries with {self.workers} workers")
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(query_specs)))
+        try:
+            futures = [executor.submit(self.craft_cached_board_query, dataset, name, description, query_body)
+                       for name, description, query_body in query_specs]
+            return [future.result() for future in futures]
+        except Exception:
+            self.logger.error(f"Failed to craft board queries for dataset: {dataset}, cancelling remaining queries")
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def build_board_specs(self, service_name, service_type):
+        """
+        Ensures the dataset has every column the board's templates require and returns
+        the (name, description, query_body) specs for a service's board: the standard
+        service queries followed by any type-specific queries.
+        """
+        plan = compile_board_plan(service_type, self.template_dir)
+        self.logger.info(f"Building {len(plan['queries'])} queries from templates: {', '.join(plan['templates'])}")
+
+        # Create the dataset and any missing columns for all templates at once
+        self.ensure_columns(service_name, plan["required_columns"])
+
+        return list(plan["queries"])
+
+    def load_boards(self):
+        """
+        Lists the boards once per builder, so reconciling many services costs a
+        single lookup.  Returns the number of API calls made: 1 for the call that
+        listed them, 0 afterwards.
+        """
+        with self.boards_lock:
+            if self.boards is not None:
+                return 0
+            self.boards = {}
+            for board in list_boards(self.api_key, self.region):
+                self.boards.setdefault(board["name"], board)
+            return 1
+
+    def find_board(self, board_name):
+        """
+        Returns the existing board named board_name, or None.
+        """
+        self.load_boards()
+        with self.boards_lock:
+            return self.boards.get(board_name)
+
+    def match_board_queries(self, service_name, query_specs):
+        """
+        Matches the desired query specs to existing queries, for a plan.
+
+        A spec is matched through the query cache when it has an entry, and
+        otherwise to a query on the existing board whose annotation has the
+        spec's name and description and whose body is unchanged, so boards are
+        reconciled without a cache too.  Cached entries on the board need no
+        verification, as the board refers to them; others are verified when due.
 
-        if not check_dataset_exists(service_name, self.api_key, self.region):
-            # Create the dataset
-            create_dataset(service_name, self.api_key, self.region)
-
-        # Create the columns
-        for column, column_type in required_columns.items():
-            if not check_column_exists(service_name, column, self.api_key, self.region):
-                create_column(service_name, column, column_type, self.api_key, self.region)
-
-        # Heatmap Query for Duration
-        duration_query_name = "Latency"
-        duration_query_description = "Heatmap of event duration in milliseconds"
-        duration_qb = craft_query_body(time_range=86400,
-                                       calculations=[
-                                           {"op": "HEATMAP",
-                                            "column": "duration_ms"}
-                                            ])
-        queries.append(craft_board_query(service_name,
-                                         duration_query_name,
-                                         duration_query_description,
-                                         duration_qb,
-                                         self.api_key, self.region))
-
-        # Query for Error Counts
-        error_query_name = "Error counts by status code"
-        error_query_description = "Counts of events where error = true, grouped by status code"
-        errors_qb = craft_query_body(time_range=86400,
-                                     filters=[{"column": "error", "op": "exists"}],
-                                     breakdowns=["http.response.status_code", "status_code"],
-                                     calculations=[{"op": "COUNT"}])
-        queries.append(craft_board_query(service_name,
-                                         error_query_name,
-                                         error_query_description,
-                                         errors_qb,
-                                         self.api_key, self.region))
-
-        # Query for Route Breakdown
-        routes_query_name = "Route Breakdown"
-        routes_query_description = "Counts of events grouped by http.route"
-        routes_qb = craft_query_body(time_range=86400,
-                                     breakdowns=["http.route"],
-                                     calculations=[{"op": "COUNT"}])
-        queries.append(craft_board_query(service_name,
-                                         routes_query_name,
-                                         routes_query_description,
-                                         routes_qb,
-                                         self.api_key, self.region))
-
-        return queries
-
-    def build_java_queries(self, service_name):
-        logger.info("Building Java queries")
-        queries = []
-
-        required_columns = {
-            "jvm.memory.used": "integer",
-            "jvm.memory.limit": "integer",
-            "jvm.memory.committed": "integer",
-            "jvm.memory.used_after_last_gc": "integer",
-            "jvm.memory.type": "string",
-            "jvm.memory.pool.name": "string",
-            "jvm.gc.duration.avg": "float",
-            "jvm.gc.duration.max": "float",
-            "jvm.gc.action": "string",
-            "jvm.cpu.recent_utilization": "float",
-            "host.name": "string",
+        Returns:
+        tuple: The board (or None), a query reference or None (to be created) for
+        each spec, and the number of API lookups made.
+        """
+        dataset = service_name
+        lookups = self.schema_calls.pop(dataset, 0) + self.load_boards()
+        board = self.find_board(f"{service_name} Operations Overview")
+        existing = [] if board is None else [
+            {"query_id": query.get("query_id"), "annotation_id": query.get("query_annotation_id")}
+            for query in board.get("queries", [])
+        ]
+        existing_refs = {(query["query_id"], query["annotation_id"]) for query in existing}
+
+        references = []
+        keys = []
+        for name, description, query_body in query_specs:
+            reference = None
+            key = None
+            if self.query_cache is not None:
+                key = self.cache_key(dataset, query_body, name, description)
+                entry = self.query_cache.get(key)
+                if entry is not None:
+                    reference = {"query_id": entry["query_id"], "annotation_id": entry["annotation_id"]}
+                    if (entry["query_id"], entry["annotation_id"]) in existing_refs:
+                        self.query_cache.mark_verified(key)
+                    elif self.query_cache.needs_verification(entry):
+                        lookups += 1
+                        annotation = get_query_annotation(dataset, entry["annotation_id"], self.api_key, self.region)
+                        if annotation is not None and annotation.get("query_id") == entry["query_id"]:
+                            self.query_cache.mark_verified(key)
+                        else:
+                            self.logger.info(f"Evicting stale cached board query: {name}")
+                            self.query_cache.evict(key)
+                            reference = None
+            references.append(reference)
+            keys.append(key)
+
+        if None not in references:
+            return board, references, lookups
+
+        # Look up the annotations of the board's other queries to match the rest by name and description
+        claimed = {(reference["query_id"], reference["annotation_id"]) for reference in references if reference}
+        annotated = {}
+        for query in existing:
+            if query["annotation_id"] is None or (query["query_id"], query["annotation_id"]) in claimed:
+                continue
+            lookups += 1
+            annotation = get_query_annotation(dataset, query["annotation_id"], self.api_key, self.region)
+            if annotation is not None and annotation.get("query_id") == query["query_id"]:
+                annotated.setdefault((annotation.get("name"), annotation.get("description") or ""), query)
+
+        for i, (name, description, query_body) in enumerate(query_specs):
+            query = references[i] is None and annotated.pop((name, description or ""), None)
+            if not query:
+                continue
+            lookups += 1
+            existing_query = get_query(dataset, query["query_id"], self.api_key, self.region)
+            if existing_query is None or not query_matches(query_body, existing_query):
+                self.logger.info(f"Board query: {name} has changed")
+                continue
+            references[i] = dict(query)
+            if self.query_cache is not None:
+                self.query_cache.put(keys[i], references[i])
+
+        return board, references, lookups
+
+    def plan_board(self, service_name, query_specs):
+        """
+        Returns the plan (see plan_service_board) and the query reference, or None
+        for a query to be created, of each of query_specs.
+        """
+        dataset = service_name
+        board, references, lookups = self.match_board_queries(service_name, query_specs)
+
+        existing_refs = [] if board is None else [
+            (query.get("query_id"), query.get("query_annotation_id")) for query in board.get("queries", [])
+        ]
+        desired_refs = [None if reference is None else (reference["query_id"], reference["annotation_id"])
+                        for reference in references]
+        creates = desired_refs.count(None)
+
+        if board is None:
+            action = "create"
+        elif desired_refs == existing_refs:
+            action = "none"
+        else:
+            action = "update"
+
+        column_changes = self.column_changes.get(dataset, {})
+        api_calls = {
+            "lookups": lookups,
+            "datasets": 1 if dataset in self.dataset_changes else 0,
+            "columns": len(column_changes),
+            "queries": 2 * creates,
+            "board": 0 if action == "none" else 1,
         }
+        api_calls["total"] = sum(api_calls.values())
+
+        plan = {
+            "service_name": service_name,
+            "board_name": f"{service_name} Operations Overview",
+            "board_id": None if board is None else board["id"],
+            "board_url": None if board is None else board.get("links", {}).get("board_url"),
+            "action": action,
+            "create_dataset": dataset in self.dataset_changes,
+            "create_columns": dict(column_changes),
+            "queries": {
+                "keep": [name for (name, _, _), ref in zip(query_specs, desired_refs) if ref is not None and ref in existing_refs],
+                "add": [name for (name, _, _), ref in zip(query_specs, desired_refs) if ref is None or ref not in existing_refs],
+                "remove": [{"query_id": query_id, "annotation_id": annotation_id}
+                           for query_id, annotation_id in existing_refs if (query_id, annotation_id) not in desired_refs],
+            },
+            "api_calls": api_calls,
+        }
+        return plan, references
+
+    def plan_service_board(self, service_name, query_specs):
+        """
+        Compares a service's existing board with the desired query specs and returns a
+        plan of the minimal changes needed and the number of API calls they take.
+
+        Desired queries are matched to existing ones through the query cache, or by
+        their annotation on the board (see match_board_queries); the rest are planned
+        as new queries.  api_calls includes the lookups already made to plan.
+        """
+        return self.plan_board(service_name, query_specs)[0]
 
-        if not check_dataset_exists(service_name, self.api_key, self.region):
-            # Create the dataset
-            create_dataset(service_name, self.api_key, self.region)
-
-        # Create the columns
-        for column, column_type in required_columns.items():
-            if not check_column_exists(service_name, column, self.api_key, self.region):
-                create_column(service_name, column, column_type, self.api_key, self.region)
-
-        # Query for JVM Memory (Young Generation)
-        jvm_mem_yg_query_name = "JVM Memory (Young Generation)"
-        jvm_mem_yg_query_description = "Eden space on the JVM heap is where newly created objects are stored. When it fills, a minor GC occurs, moving all \"live\" objects to the Survivor space. In addition to current memory usage, committed represents the guaranteed available memory, and limit represents maximum usable."
-        jvm_mem_yg_qb = craft_query_body(time_range=86400,
-                                         breakdowns=["jvm.memory.pool.name", "host.name"],
-                                         filters=[
-                                                {"column": "jvm.memory.type", "op": "=", "value": "heap"},
-                                                {"column": "jvm.memory.pool.name", "op": "in", "value": ["Eden Space", "Survivor Space"]},
-                                                {"column": "jvm.memory.used", "op": "exists"}
-                                         ],
-                                         calculations=[
-                                                       {"op": "MAX", "column": "jvm.memory.used"},
-                                                       {"op": "MAX", "column": "jvm.memory.committed"},
-                                                       {"op": "MAX", "column": "jvm.memory.limit"},
-                                                       {"op": "MAX", "column": "jvm.memory.used_after_last_gc"}
-                                         ])
-        queries.append(craft_board_query(service_name,
-                                         jvm_mem_yg_query_name,
-                                         jvm_mem_yg_query_description,
-                                         jvm_mem_yg_qb,
-                                         self.api_key, self.region))
-
-        # Query for JVM Memory (Old Generation)
-        jvm_mem_og_query_name = "JVM Memory (Old Generation)"
-        jvm_mem_og_query_description = "Tenured Gen JVM heap space stores long-lived objects. When a Full or Major GC is performed, it is expensive and may pause app execution. Committed represents guaranteed available memory, and limit represents maximum usable memory."
-        jvm_mem_og_qb = craft_query_body(time_range=86400,
-                                         breakdowns=["jvm.memory.pool.name", "host.name"],
-                                         filters=[
-                                                {"column": "jvm.memory.type", "op": "=", "value": "heap"},
-                                                {"column": "jvm.memory.pool.name", "op": "=", "value": "Tenured Gen"},
-                                                {"column": "jvm.memory.used", "op": "exists"}
-                                         ],
-                                         calculations=[
-                                                       {"op": "MAX", "column": "jvm.memory.used"},
-                                                       {"op": "MAX", "column": "jvm.memory.committed"},
-                                                       {"op": "MAX", "column": "jvm.memory.limit"},
-                                                       {"op": "MAX", "column": "jvm.memory.used_after_last_gc"}
-                                         ])
-        queries.append(craft_board_query(service_name,
-                                         jvm_mem_og_query_name,
-                                         jvm_mem_og_query_description,
-                                         jvm_mem_og_qb,
-                                         self.api_key, self.region))
-
-        # Query for JVM Memory (Non-Heap)
-        jvm_mem_nh_query_name = "JVM Non-Heap Memory Usage"
-        jvm_mem_nh_query_description = "JVM non-heap memory is allocated above and beyond the heap size you've configured. It is a section of memory in the JVM that stores class information (Metaspace), compiled code cache, thread stack, etc. It cannot be garbage collected."
-        jvm_mem_nh_qb = craft_query_body(time_range=86400,
-                                         breakdowns=["jvm.memory.pool.name", "host.name"],
-                                         filters=[
-                                                {"column": "jvm.memory.type", "op": "=", "value": "non_heap"},
-                                                {"column": "jvm.memory.used", "op": "exists"}
-                                         ],
-                                         calculations=[
-                                                       {"op": "MAX", "column": "jvm.memory.used"},
-                                                       {"op": "MAX", "column": "jvm.memory.committed"},
-                                                       {"op": "MAX", "column": "jvm.memory.limit"},
-                                         ])
-        queries.append(craft_board_query(service_name,
-                                         jvm_mem_nh_query_name,
-                                         jvm_mem_nh_query_description,
-                                         jvm_mem_nh_qb,
-                                         self.api_key, self.region))
-
-        # Query for Garbage Collection
-        jvm_gc_query_name = "JVM GC (Garbage Collection) Activity"
-        jvm_gc_query_description = "JVM GC actions occur periodically to reclaim memory but consume CPU cycles to do so. In the worst cases, a GC can cause the entire JVM to pause, making the application appear unresponsive."
-        jvm_gc_qb = craft_query_body(time_range=86400,
-                                     breakdowns=["jvm.gc.action", "host.name"],
-                                     filters=[{"column": "jvm.gc.action", "op": "exists"}],
-                                     calculations=[
-                                                 {"op": "AVG", "column": "jvm.gc.duration.avg"},
-                                                 {"op": "MAX", "column": "jvm.gc.duration.max"}
-                                     ])
-        queries.append(craft_board_query(service_name,
-                                         jvm_gc_query_name,
-                                         jvm_gc_query_description,
-                                         jvm_gc_qb,
-                                         self.api_key, self.region))
-
-        # Query for CPU Utilization
-        jvm_cpu_query_name = "JVM CPU Utilization"
-        jvm_cpu_query_description = "Shows system CPU utilization, as captured by the JVM"
-        jvm_cpu_qb = craft_query_body(time_range=86400,
-                                      breakdowns=["host.name"],
-                                      filters=[{"column": "jvm.cpu.recent_utilization", "op": "exists"}],
-                                      calculations=[{"op": "MAX", "column": "jvm.cpu.recent_utilization"}])
-        queries.append(craft_board_query(service_name,
-                                         jvm_cpu_query_name,
-                                         jvm_cpu_query_description,
-                                         jvm_cpu_qb,
-                                         self.api_key, self.region))
-
-        return queries
-
-    def build_ruby_queries(self, service_name):
-        logger.info("Building Ruby queries")
-        queries = []
-
-        # required_columns = {}
-
-        # Create the dataset
-        # if not check_dataset_exists(service_name, self.api_key, self.region):
-        #     create_dataset(service_name, self.api_key, self.region)
-
-        # Create the columns
-        # for column, column_type in required_columns.items():
-        #     if not check_column_exists(service_name, column, self.api_key, self.region):
-        #         create_column(service_name, column, column_type, self.api_key, self.region)
-
-        logger.warning("No Ruby queries have been defined yet")
-
-        return queries
-
-    def build_python_queries(self, service_name):
-        logger.info("Building Python queries")
-        queries = []
-
-        # required_columns = {}
-
-        # Create the dataset
-        # if not check_dataset_exists(service_name, self.api_key, self.region):
-        #     create_dataset(service_name, self.api_key, self.region)
-
-        # Create the columns
-        # for column, column_type in required_columns.items():
-        #     if not check_column_exists(service_name, column, self.api_key, self.region):
-        #         create_column(service_name, column, column_type, self.api_key, self.region)
-
-        logger.warning("No Python queries have been defined yet")
-
-        return queries
-
-    def build_node_queries(self, service_name):
-        logger.info("Building Node queries")
-        queries = []
-
-        # required_columns = {}
-
-        # Create the dataset
-        # if not check_dataset_exists(service_name, self.api_key, self.region):
-        #     create_dataset(service_name, self.api_key, self.region)
-
-        # Create the columns
-        # for column, column_type in required_columns.items():
-        #     if not check_column_exists(service_name, column, self.api_key, self.region):
-        #         create_column(service_name, column, column_type, self.api_key, self.region)
-
-        logger.warning("No Node queries have been defined yet")
-
-        return queries
+    def reconcile_service_board(self, service_name, service_type):
+        """
+        Brings a service's board in line with the desired queries using the minimal
+        set of API calls: nothing when the board is already up to date, an update of
+        the existing board when queries changed, or a new board when none exists.
+        Only queries that match no existing one are created.  With dry_run set, only
+        the plan is returned.
+
+        Returns:
+        dict: The plan (see plan_service_board), with board_id and board_url set once applied.
+        """
+        self.logger.info(f"Reconciling board for service: {service_name}")
+        query_specs = self.build_board_specs(service_name, service_type)
+        plan, references = self.plan_board(service_name, query_specs)
+        self.logger.info(f"Board: {plan['board_name']} plan: {plan['action']} with {plan['api_calls']['total']} API calls")
+        if self.dry_run or plan["action"] == "none":
+            return plan
+
+        dataset = service_name
+        missing = [i for i, reference in enumerate(references) if reference is None]
+        created = self.craft_board_queries(dataset, [query_specs[i] for i in missing])
+        for i, reference in zip(missing, created):
+            references[i] = reference
+        if plan["action"] == "create":
+            board = craft_board(plan["board_name"], dataset, references, self.api_key, self.region)
+        else:
+            board = update_board(self.find_board(plan["board_name"]), dataset, references, self.api_key, self.region)
+        with self.boards_lock:
+            self.boards[plan["board_name"]] = board
+
+        plan["board_id"] = board["id"]
+        plan["board_url"] = board.get("links", {}).get("board_url", plan["board_url"])
+        return plan
 
     def build_service_board(self, service_name, service_type):
         """
@@ -257,7 +352,7 @@ class HoneycombBuilder:
             - service_name: name of the service
             - service_type: type of the service
         Outputs:
-            - None
+            - URL of the new board
         """
         self.logger.info(f"Building board for service: {service_name}")
 
@@ -268,25 +363,10 @@ class HoneycombBuilder:
         board_name = f"{service_name} Operations Overview"
 
         # Define the queries
-        service_queries = self.build_service_queries(service_name)
-
-        match service_type:
-            case "java":
-                type_queries = self.build_java_queries(service_name)
-            case "ruby":
-                type_queries = self.build_ruby_queries(service_name)
-            case "python":
-                type_queries = self.build_python_queries(service_name)
-            case "node":
-                type_queries = self.build_node_queries(service_name)
-            case "_":
-                type_queries = []
-
-        queries = service_queries + type_queries
+        queries = self.craft_board_queries(dataset, self.build_board_specs(service_name, service_type))
 
         # Create the board
         board = craft_board(board_name, dataset, queries, self.api_key, self.region)
 
-        # Print the board
         logger.info(f"Board URL: {board['links']['board_url']}")
-        print('\n' + board['links']['board_url'])
+        return board['links']['board_url']
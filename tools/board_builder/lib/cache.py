@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def query_cache_key(api_url, api_key, dataset, query_body, name, description):
+    """
+    Returns a content hash identifying a board query in one environment.
+
+    The environment is the API URL the query is created at and the API key's
+    team and environment, so environments sharing a cache file never reuse
+    each other's query IDs.  Only the hash is stored, never the API key.
+
+    The query body is serialized canonically (sorted keys, no whitespace) so
+    equal bodies always hash the same regardless of how they were built.
+    """
+    canonical = json.dumps({
+        "api_url": api_url,
+        "api_key": api_key,
+        "dataset": dataset,
+        "query": query_body,
+        "name": name,
+        "description": description,
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """
+    Persistent local cache mapping query content hashes to the query_id and
+    annotation_id previously created for them.
+
+    Entries older than max_age seconds are evicted on load and lookup.  An
+    entry is re-verified against the API when it was last verified more than
+    verify_interval seconds ago (0 verifies on every hit).
+    """
+
+    def __init__(self, path, max_age=30 * 86400, verify_interval=86400):
+        self.path = path
+        self.max_age = max_age
+        self.verify_interval = verify_interval
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get("entries", {})
+        self.evict_expired()
+
+    def evict_expired(self):
+        cutoff = time.time() - self.max_age
+        with self.lock:
+            expired = [key for key, entry in self.entries.items() if entry["created_at"] < cutoff]
+            for key in expired:
+                del self.entries[key]
+            self.evictions += len(expired)
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired query cache entries")
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry["created_at"] < time.time() - self.max_age:
+                del self.entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def needs_verification(self, entry):
+        return entry.get("verified_at", 0) < time.time() - self.verify_interval
+
+    def mark_verified(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries[key]["verified_at"] = time.time()
+
+    def put(self, key, board_query_reference):
+        now = time.time()
+        with self.lock:
+            self.entries[key] = {
+                "query_id": board_query_reference["query_id"],
+                "annotation_id": board_query_reference["annotation_id"],
+                "created_at": now,
+                "verified_at": now,
+            }
+
+    def evict(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.evictions += 1
+
+    def save(self):
+        """
+        Writes the cache to disk, replacing the previous file atomically.
+        """
+        with self.lock:
+            data = {"version": 1, "entries": self.entries}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(self.entries)} query cache entries to {self.path} ({self.hits} hits, {self.misses} misses, {self.evictions} evictions)")
@@ -0,0 +1,138 @@
+import csv
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from . import REGIONS
+from .builders import HoneycombBuilder
+from .templates import TEMPLATE_DIR, service_types
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_manifest_entry(entry, default_region="us", known_service_types=None):
+    """
+    Normalizes a manifest row into a {service_name, service_type, region} dict.
+    Accepts "name"/"type" as short forms of "service_name"/"service_type".
+    Raises ValueError for an unknown region, or a service type missing from
+    known_service_types when it is given.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"Manifest entry is not an object: {entry}")
+    service_name = entry.get("service_name") or entry.get("name")
+    if not service_name:
+        raise ValueError(f"Manifest entry is missing a service name: {entry}")
+    normalized = {
+        "service_name": service_name.strip(),
+        "service_type": (entry.get("service_type") or entry.get("type") or "other").strip(),
+        "region": (entry.get("region") or default_region).strip(),
+    }
+    if normalized["region"] not in REGIONS:
+        raise ValueError(f"Unknown region '{normalized['region']}' for service {normalized['service_name']} (choose from {', '.join(REGIONS)})")
+    if known_service_types is not None and normalized["service_type"] not in known_service_types:
+        raise ValueError(f"Unknown service type '{normalized['service_type']}' for service {normalized['service_name']} "
+                         f"(choose from {', '.join(sorted(known_service_types))})")
+    return normalized
+
+
+def load_manifest(path, default_region="us", template_dir=TEMPLATE_DIR):
+    """
+    Loads a list of services to build boards for from a CSV, JSON or YAML manifest.
+
+    CSV manifests need a header row naming the service_name, service_type and region
+    columns.  JSON and YAML manifests are either a list of entries or an object with
+    a "services" list.  YAML support requires the PyYAML module.
+
+    Every entry is validated before any board is built, so a typo in a region or
+    service type fails the whole run up front.  Raises ValueError naming the
+    entry's row, counted from 1 and not counting a CSV header, and for a YAML
+    manifest that can't be read.
+
+    Returns:
+    list: Normalized manifest entries, in file order.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    elif path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML manifests require the PyYAML module: pip3 install pyyaml")
+        with open(path) as f:
+            try:
+                rows = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path}: {e}")
+    else:
+        with open(path) as f:
+            rows = json.load(f)
+
+    if isinstance(rows, dict):
+        rows = rows.get("services", [])
+    known_service_types = service_types(template_dir)
+    entries = []
+    for row_number, row in enumerate(rows, 1):
+        try:
+            entries.append(normalize_manifest_entry(row, default_region, known_service_types))
+        except ValueError as e:
+            raise ValueError(f"{path} row {row_number}: {e}")
+    return entries
+
+
+def build_fleet(entries, api_key, workers=1, fleet_workers=4, query_cache=None, reconcile=False, dry_run=False, template_dir=TEMPLATE_DIR):
+    """
+    Builds a board for every manifest entry in one process.
+
+    Services are built fleet_workers at a time.  All builds share the module
+    session's connection pool, and services in the same region share one
+    HoneycombBuilder and therefore one schema cache; all regions share
+    query_cache when one is given.  A failed service is
+    recorded and does not stop the others.  With reconcile set, existing boards
+    are updated in place and each result carries its plan.
+
+    Returns:
+    dict: Machine-readable results with a board URL or error and the timing for each service.
+    """
+    builders = {region: HoneycombBuilder(api_key, region, workers, query_cache, dry_run, template_dir)
+                for region in {entry["region"] for entry in entries}}
+
+    def build_one(entry):
+        result = dict(entry)
+        started = time.monotonic()
+        try:
+            builder = builders[entry["region"]]
+            if reconcile or dry_run:
+                result["plan"] = builder.reconcile_service_board(entry["service_name"], entry["service_type"])
+                result["board_url"] = result["plan"]["board_url"]
+            else:
+                result["board_url"] = builder.build_service_board(entry["service_name"], entry["service_type"])
+            result["status"] = "ok"
+        except Exception as e:
+            logger.error(f"Failed to build board for service: {entry['service_name']}: {e}")
+            result["status"] = "error"
+            result["error"] = str(e)
+        result["duration_s"] = round(time.monotonic() - started, 3)
+        return result
+
+    started_at = datetime.now(timezone.utc)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, fleet_workers)) as executor:
+        services = list(executor.map(build_one, entries))
+
+    return {
+        "started_at": started_at.isoformat(),
+        "duration_s": round(time.monotonic() - started, 3),
+        "total": len(services),
+        "succeeded": sum(1 for service in services if service["status"] == "ok"),
+        "failed": sum(1 for service in services if service["status"] == "error"),
+        "services": services,
+    }
+
+
+def write_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Wrote fleet results to {path}")
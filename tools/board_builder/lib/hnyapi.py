@@ -1,27 +1,78 @@
+import functools
 import logging
+from collections import namedtuple
 from . import session, HONEYCOMB_API_US, HONEYCOMB_API_EU
 
 logger = logging.getLogger(__name__)
 
+# One API request, yielded by the API call generators below
+Request = namedtuple("Request", "method url api_key json", defaults=(None,))
+
+
+# Replaces the regional API URL when set, e.g. to point at a local stand-in server
+api_url_override = None
+
+
+def set_api_url(url):
+    global api_url_override
+    api_url_override = url if url is None or url.endswith('/') else url + '/'
+
 
 def hnyapi_url(region="us"):
+    if api_url_override:
+        return api_url_override
     if region == "eu":
         return HONEYCOMB_API_EU
     else:
         return HONEYCOMB_API_US
 
 
+def send(request):
+    headers = {"X-Honeycomb-Team": request.api_key}
+    if request.json is not None:
+        headers["Content-Type"] = "application/json"
+    return session.request(request.method, request.url, headers=headers, json=request.json)
+
+
+def run_call(call):
+    """
+    Runs an API call generator on the shared session, sending each Request it
+    yields and sending the response back in, and returns its result.
+    """
+    try:
+        request = next(call)
+        while True:
+            request = call.send(send(request))
+    except StopIteration as stop:
+        return stop.value
+
+
+def api_call(function):
+    """
+    Makes a function from an API call generator function.  The generator only
+    builds requests and reads responses, so lib/ahnyapi.py runs the same one,
+    available as the function's call attribute, on its asyncio client.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return run_call(function(*args, **kwargs))
+    wrapper.call = function
+    return wrapper
+
+
+@api_call
 def hnyapi_request(endpoint, api_key, region="us"):
     url = hnyapi_url(region) + endpoint
-    response = session.get(url, headers={"X-Honeycomb-Team": api_key})
+    response = yield Request("GET", url, api_key)
     response.raise_for_status()
     return response.json()
 
 
+@api_call
 def check_dataset_exists(dataset, api_key, region="us"):
     logger.info(f"Checking if dataset: {dataset} exists")
     url = hnyapi_url(region) + 'datasets/' + dataset
-    response = session.get(url, headers={"X-Honeycomb-Team": api_key})
+    response = yield Request("GET", url, api_key)
     if response.status_code == 404:
         logger.info(f"Dataset: {dataset} does not exist")
         return False
@@ -29,10 +80,11 @@ def check_dataset_exists(dataset, api_key, region="us"):
     return True
 
 
+@api_call
 def check_column_exists(dataset, column, api_key, region="us"):
     logger.info(f"Checking if column: {column} exists for dataset: {dataset}")
     url = hnyapi_url(region) + 'columns/' + dataset + '?key_name=' + column
-    response = session.get(url, headers={"X-Honeycomb-Team": api_key})
+    response = yield Request("GET", url, api_key)
     if response.status_code == 404:
         logger.info(f"Column: {column} does not exist for dataset: {dataset}")
         return False
@@ -40,18 +92,26 @@ def check_column_exists(dataset, column, api_key, region="us"):
     return True
 
 
+@api_call
+def list_columns(dataset, api_key, region="us"):
+    logger.info(f"Listing columns for dataset: {dataset}")
+    return (yield from hnyapi_request.call('columns/' + dataset, api_key, region))
+
+
+@api_call
 def create_dataset(dataset, api_key, region="us"):
     logger.info(f"Creating dataset: {dataset}")
     url = hnyapi_url(region) + 'datasets'
     dataset_body = {
         "name": dataset
     }
-    response = session.post(url, headers={"X-Honeycomb-Team": api_key,  "Content-Type": "application/json"}, json=dataset_body)
+    response = yield Request("POST", url, api_key, dataset_body)
     logger.debug(response.text)
     response.raise_for_status()
     return response.json()
 
 
+@api_call
 def create_column(dataset, column, type, api_key, region="us"):
     logger.info(f"Creating column: {column} for dataset: {dataset}")
     url = hnyapi_url(region) + 'columns/' + dataset
@@ -59,22 +119,24 @@ def create_column(dataset, column, type, api_key, region="us"):
         "key_name": column,
         "type": type
     }
-    response = session.post(url, headers={"X-Honeycomb-Team": api_key, "Content-Type": "application/json"}, json=column_body)
+    response = yield Request("POST", url, api_key, column_body)
     logger.debug(response.text)
     response.raise_for_status()
     return response.json()
 
 
 # create a query using https://docs.honeycomb.io/api/tag/Queries#operation/createQuery
+@api_call
 def create_query(dataset, query, api_key, region="us"):
     logger.info(f"Creating query for dataset: {dataset}")
     url = hnyapi_url(region) + 'queries/' + dataset
-    response = session.post(url, headers={"X-Honeycomb-Team": api_key, "Content-Type": "application/json"}, json=query)
+    response = yield Request("POST", url, api_key, query)
     logger.debug(response.text)
     response.raise_for_status()
     return response.json()
 
 
+@api_call
 def create_annotation(dataset, query_id, name, description, api_key, region="us"):
     logger.info(f"Creating annotation for query: {query_id}")
     url = hnyapi_url(region) + 'query_annotations/' + dataset
@@ -83,18 +145,43 @@ def create_annotation(dataset, query_id, name, description, api_key, region="us"
         "name": name,
         "description": description,
     }
-    response = session.post(url, headers={"X-Honeycomb-Team": api_key, "Content-Type": "application/json"}, json=annotation_body)
+    response = yield Request("POST", url, api_key, annotation_body)
     logger.debug(response.text)
     response.raise_for_status()
     return response.json()
 
 
+@api_call
+def get_query_annotation(dataset, annotation_id, api_key, region="us"):
+    logger.info(f"Getting annotation: {annotation_id} for dataset: {dataset}")
+    url = hnyapi_url(region) + 'query_annotations/' + dataset + '/' + annotation_id
+    response = yield Request("GET", url, api_key)
+    if response.status_code == 404:
+        logger.info(f"Annotation: {annotation_id} does not exist for dataset: {dataset}")
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+@api_call
+def get_query(dataset, query_id, api_key, region="us"):
+    logger.info(f"Getting query: {query_id} for dataset: {dataset}")
+    url = hnyapi_url(region) + 'queries/' + dataset + '/' + query_id
+    response = yield Request("GET", url, api_key)
+    if response.status_code == 404:
+        logger.info(f"Query: {query_id} does not exist for dataset: {dataset}")
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+@api_call
 def craft_board_query(dataset, name, description, query_body, api_key, region="us"):
     logger.info(f"Crafting board query: {name}")
     logger.debug("Creating Query:" + f"{query_body}")
-    query = create_query(dataset, query_body, api_key, region)
+    query = yield from create_query.call(dataset, query_body, api_key, region)
     logger.debug("Creating Annotation" + f"{name}")
-    annotation = create_annotation(dataset, query["id"], name, description, api_key, region)
+    annotation = yield from create_annotation.call(dataset, query["id"], name, description, api_key, region)
     board_query_reference = {
         "query_id": query['id'],
         "annotation_id": annotation['id']
@@ -153,6 +240,7 @@ def craft_queries_json_for_boards(dataset, queries):
     return data
 
 
+@api_call
 def craft_board(name, dataset, queries, api_key, region="us"):
     """
     Creates a board with the given name, dataset, and queries.
@@ -173,7 +261,38 @@ def craft_board(name, dataset, queries, api_key, region="us"):
         "name": name,
         "queries": craft_queries_json_for_boards(dataset, queries)
     }
-    response = session.post(url, headers={"X-Honeycomb-Team": api_key, "Content-Type": "application/json"}, json=board)
+    response = yield Request("POST", url, api_key, board)
+    logger.debug(response.text)
+    response.raise_for_status()
+    return response.json()
+
+
+@api_call
+def list_boards(api_key, region="us"):
+    logger.info("Listing boards")
+    return (yield from hnyapi_request.call('boards', api_key, region))
+
+
+@api_call
+def update_board(board, dataset, queries, api_key, region="us"):
+    """
+    Replaces the queries on an existing board, keeping its other settings.
+
+    Parameters:
+    - board (dict): The existing board, as returned by the API.
+    - dataset (str): The dataset for the board.
+    - queries (list): The list of queries for the board.
+    - api_key (str): The Honeycomb API key.
+    - region (str): The region for the board. Default is "us".
+
+    Returns:
+    dict: The response JSON from the API.
+    """
+    logger.info(f"Updating board: {board['name']}")
+    url = hnyapi_url(region) + 'boards/' + board['id']
+    body = {key: value for key, value in board.items() if key not in ("id", "links")}
+    body["queries"] = craft_queries_json_for_boards(dataset, queries)
+    response = yield Request("PUT", url, api_key, body)
     logger.debug(response.text)
     response.raise_for_status()
     return response.json()
@@ -0,0 +1,96 @@
+import json
+import logging
+import math
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_for_url(url):
+    """
+    Returns the API endpoint a URL belongs to, e.g. "columns" for
+    https://api.honeycomb.io/1/columns/my-dataset?key_name=duration_ms
+    """
+    parts = [part for part in urlparse(url).path.split('/') if part]
+    if parts and parts[0] == '1':
+        parts = parts[1:]
+    return parts[0] if parts else ""
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class EndpointMetrics:
+    """
+    Per-endpoint request counts, retries, status codes, bytes and latencies
+    for every call made through the instrumented clients.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, endpoint, status_code, latency, bytes_sent=0, bytes_received=0, retries=0):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "retries": 0,
+                "status_codes": Counter(),
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "latencies": [],
+            })
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["status_codes"][str(status_code)] += 1
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["latencies"].append(latency)
+
+    def response_hook(self, response, *args, **kwargs):
+        """
+        requests response hook recording the final response of each call.  Latency
+        covers the whole call, including rate governor waits and retries.
+        """
+        retries = getattr(response, "throttle_retries", 0)
+        urllib3_retries = getattr(response.raw, "retries", None)
+        if urllib3_retries is not None:
+            retries += len(urllib3_retries.history)
+        body = response.request.body or b""
+        self.record(endpoint_for_url(response.url),
+                    response.status_code,
+                    response.elapsed.total_seconds(),
+                    len(body),
+                    len(response.content),
+                    retries)
+
+    def summary(self):
+        with self.lock:
+            summary = {}
+            for endpoint, stats in sorted(self.endpoints.items()):
+                latencies = sorted(stats["latencies"])
+                summary[endpoint] = {
+                    "requests": stats["requests"],
+                    "retries": stats["retries"],
+                    "status_codes": dict(stats["status_codes"]),
+                    "bytes_sent": stats["bytes_sent"],
+                    "bytes_received": stats["bytes_received"],
+                    "latency_ms": {
+                        "p50": round(percentile(latencies, 0.50) * 1000, 1),
+                        "p95": round(percentile(latencies, 0.95) * 1000, 1),
+                        "max": round(latencies[-1] * 1000, 1),
+                        "total": round(sum(latencies) * 1000, 1),
+                    },
+                }
+            return summary
+
+    def write(self, path, **extra):
+        data = {"endpoints": self.summary(), **extra}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        logger.info(f"Wrote API metrics to {path}")
@@ -0,0 +1,173 @@
+import asyncio
+import email.utils
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RATELIMIT_FIELD = re.compile(r'(limit|remaining|reset)\s*=\s*(\d+)')
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header given either as delay seconds or as an HTTP date.
+    Returns the number of seconds to wait, or None if the value can't be parsed.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_ratelimit_headers(headers):
+    """
+    Reads the remaining request budget from rate limit headers.
+
+    Understands the combined "RateLimit: limit=100, remaining=50, reset=30" form as
+    well as separate RateLimit-* and X-RateLimit-* headers.  Returns a dict with any
+    of "limit", "remaining" and "reset" (seconds) that were present.
+    """
+    budget = {}
+    combined = headers.get("RateLimit")
+    if combined:
+        budget = {name: int(value) for name, value in RATELIMIT_FIELD.findall(combined)}
+    for name in ("limit", "remaining", "reset"):
+        for header in (f"RateLimit-{name.capitalize()}", f"X-RateLimit-{name.capitalize()}"):
+            value = headers.get(header)
+            if name not in budget and value is not None and value.strip().isdigit():
+                budget[name] = int(value)
+    return budget
+
+
+class RateGovernor:
+    """
+    Token bucket shared by every request on a session.
+
+    Requests take a token before they are sent, refilled at `rate` per second
+    with up to `burst` tokens saved up.  The rate adapts to the API: it follows
+    the remaining budget advertised by rate limit headers, halves on every 429,
+    honours Retry-After by pausing all requests, and otherwise grows by 5% per
+    response back up towards max_rate.
+    """
+
+    def __init__(self, rate=10.0, burst=10, min_rate=0.5, max_rate=50.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.budget = {}
+
+    def reserve(self):
+        """
+        Takes a token and returns how long the caller must wait before sending.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            self.requests += 1
+            delay = max(0.0, -self.tokens / self.rate, self.paused_until - now)
+            if delay > 0:
+                self.waits += 1
+                self.wait_seconds += delay
+            return delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def set_rate(self, rate):
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def observe(self, status_code, headers):
+        """
+        Adjusts pacing from a response's status code and headers.
+        """
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        budget = parse_ratelimit_headers(headers)
+        with self.lock:
+            now = time.monotonic()
+            if budget:
+                self.budget = budget
+            if status_code == 429:
+                self.throttled += 1
+                self.set_rate(self.rate / 2)
+                self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1.0 / self.rate))
+                logger.info(f"Throttled by the API, pacing at {self.rate:.2f} requests/s")
+            elif "remaining" in budget and "reset" in budget:
+                if budget["remaining"] == 0:
+                    self.paused_until = max(self.paused_until, now + budget["reset"])
+                else:
+                    self.set_rate(budget["remaining"] / max(1, budget["reset"]))
+            else:
+                self.set_rate(self.rate * 1.05)
+            if retry_after is not None and status_code != 429:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def snapshot(self):
+        """
+        Returns the current pacing as a dict of metrics.
+        """
+        with self.lock:
+            return {
+                "rate": round(self.rate, 3),
+                "tokens": round(self.tokens, 3),
+                "paused_for_s": round(max(0.0, self.paused_until - time.monotonic()), 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "waits": self.waits,
+                "wait_s": round(self.wait_seconds, 3),
+                "budget": dict(self.budget),
+            }
+
+
+class GovernedAdapter(HTTPAdapter):
+    """
+    HTTP adapter that paces every attempt through a RateGovernor and retries
+    429 responses (for any method, as a throttled request was not processed)
+    once the governor allows it.  The number of throttled attempts is kept on
+    the returned response as throttle_retries.
+    """
+
+    def __init__(self, governor, max_throttle_retries=4, **kwargs):
+        self.governor = governor
+        self.max_throttle_retries = max_throttle_retries
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        for attempt in range(self.max_throttle_retries + 1):
+            self.governor.acquire()
+            response = super().send(request, **kwargs)
+            self.governor.observe(response.status_code, response.headers)
+            if response.status_code != 429 or attempt == self.max_throttle_retries:
+                response.throttle_retries = attempt
+                return response
+            response.close()
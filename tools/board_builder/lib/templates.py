@@ -0,0 +1,125 @@
+import functools
+import inspect
+import json
+import logging
+import os
+
+from .hnyapi import craft_query_body
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+# queries from this template are added to every board
+BASE_TEMPLATE = "service"
+
+# service types accepted without a template of their own, their boards only get the base queries
+BUILTIN_SERVICE_TYPES = ("java", "ruby", "python", "node", "go", "php", "other")
+
+COLUMN_TYPES = ("string", "integer", "float", "boolean")
+QUERY_FIELDS = tuple(inspect.signature(craft_query_body).parameters)
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def available_templates(template_dir=TEMPLATE_DIR):
+    """
+    Returns the names of the board templates in template_dir.
+    """
+    if not os.path.isdir(template_dir):
+        return []
+    return sorted(os.path.splitext(filename)[0] for filename in os.listdir(template_dir) if filename.endswith(".json"))
+
+
+def service_types(template_dir=TEMPLATE_DIR):
+    """
+    Returns the service types boards can be built for: the built-in types and every template but the base one.
+    """
+    return (set(BUILTIN_SERVICE_TYPES) | set(available_templates(template_dir))) - {BASE_TEMPLATE}
+
+
+def query_columns(query):
+    """
+    Returns the set of columns a template query's body refers to.
+    """
+    columns = set(query.get("breakdowns", []))
+    for clause in query.get("calculations", []) + query.get("filters", []) + query.get("havings", []):
+        if clause.get("column"):
+            columns.add(clause["column"])
+    return columns
+
+
+def validate_template(template, path):
+    """
+    Checks a loaded template's structure, raising TemplateError on the first problem.
+    """
+    if not isinstance(template.get("name"), str):
+        raise TemplateError(f"{path}: template needs a name")
+    required_columns = template.get("required_columns", {})
+    if not isinstance(required_columns, dict):
+        raise TemplateError(f"{path}: required_columns must map column names to types")
+    for column, column_type in required_columns.items():
+        if column_type not in COLUMN_TYPES:
+            raise TemplateError(f"{path}: column {column} has type {column_type}, expected one of {', '.join(COLUMN_TYPES)}")
+    if not isinstance(template.get("queries", []), list):
+        raise TemplateError(f"{path}: queries must be a list")
+    for query in template.get("queries", []):
+        if not isinstance(query.get("name"), str) or not isinstance(query.get("description", ""), str):
+            raise TemplateError(f"{path}: every query needs a name and a description")
+        unknown = set(query.get("query", {})) - set(QUERY_FIELDS)
+        if unknown:
+            raise TemplateError(f"{path}: query {query['name']} has unknown fields: {', '.join(sorted(unknown))}")
+        undeclared = query_columns(query.get("query", {})) - set(required_columns)
+        if undeclared:
+            raise TemplateError(f"{path}: query {query['name']} uses columns missing from required_columns: {', '.join(sorted(undeclared))}")
+
+
+def load_template(name, template_dir=TEMPLATE_DIR):
+    """
+    Loads and validates the template called name, or returns None if there isn't one.
+    """
+    path = os.path.join(template_dir, name + ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        template = json.load(f)
+    validate_template(template, path)
+    return template
+
+
+@functools.lru_cache(maxsize=None)
+def compile_board_plan(service_type, template_dir=TEMPLATE_DIR):
+    """
+    Compiles the base template plus the service type's template (when there is one,
+    "other" has none) into a board plan.  Plans are cached, so each template is read, validated and
+    turned into query bodies once per process.
+
+    Returns:
+    dict: "templates" used, the union of their "required_columns", and the
+    (name, description, query_body) "queries" in board order.
+    """
+    names = [BASE_TEMPLATE] if service_type in (BASE_TEMPLATE, "other") else [BASE_TEMPLATE, service_type]
+    templates = []
+    for name in names:
+        template = load_template(name, template_dir)
+        if template is None:
+            logger.warning(f"No {name} queries have been defined yet")
+            continue
+        templates.append(template)
+
+    required_columns = {}
+    queries = []
+    for template in templates:
+        for column, column_type in template.get("required_columns", {}).items():
+            if required_columns.setdefault(column, column_type) != column_type:
+                raise TemplateError(f"Column {column} is required as both {required_columns[column]} and {column_type}")
+        for query in template.get("queries", []):
+            queries.append((query["name"], query.get("description", ""), craft_query_body(**query.get("query", {}))))
+
+    return {
+        "templates": tuple(template["name"] for template in templates),
+        "required_columns": required_columns,
+        "queries": tuple(queries),
+    }
@@ -0,0 +1,27 @@
+"""
+Runs the local Honeycomb API stand-in (tools/hny_api_standin) for the tests.
+"""
+import os
+import sys
+import unittest
+
+from lib import configure_session
+from lib.hnyapi import set_api_url
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'hny_api_standin'))
+from standin_harness import Standin  # noqa: E402,F401
+
+
+class StandinTestCase(unittest.TestCase):
+    """Runs each test against a fresh API stand-in."""
+
+    standin_args = ()
+
+    def setUp(self):
+        self.standin = Standin(*self.standin_args)
+        self.standin.__enter__()
+        self.addCleanup(self.standin.__exit__, None, None, None)
+        set_api_url(self.standin.url + '/1/')
+        self.addCleanup(set_api_url, None)
+        # Don't let the rate governor pace the tests
+        configure_session(8, rate=1000, max_rate=1000)
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from lib import hnyapi
+from lib.hnyapi import craft_query_body
+from lib.metrics import EndpointMetrics
+
+try:
+    import httpx
+    from lib import ahnyapi
+except ImportError:
+    ahnyapi = None
+
+from standin import StandinTestCase
+
+
+@unittest.skipIf(ahnyapi is None, "the async API needs the httpx module")
+class AsyncHnyApiTest(StandinTestCase):
+    def run_async(self, coroutine):
+        async def run():
+            try:
+                return await coroutine
+            finally:
+                await ahnyapi.aclose()
+        return asyncio.run(run())
+
+    def test_dataset_and_columns_round_trip(self):
+        async def round_trip():
+            missing = await ahnyapi.check_dataset_exists("checkout", "key")
+            await ahnyapi.create_dataset("checkout", "key")
+            await ahnyapi.create_column("checkout", "http.route", "string", "key")
+            return (missing,
+                    await ahnyapi.check_dataset_exists("checkout", "key"),
+                    await ahnyapi.check_column_exists("checkout", "http.route", "key"),
+                    await ahnyapi.check_column_exists("checkout", "http.method", "key"),
+                    await ahnyapi.list_columns("checkout", "key"))
+
+        missing, exists, route, method, columns = self.run_async(round_trip())
+
+        self.assertEqual((missing, exists, route, method), (False, True, True, False))
+        self.assertEqual([column["key_name"] for column in columns], ["http.route"])
+        self.assertEqual(hnyapi.list_columns("checkout", "key"), columns)
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.run_async(ahnyapi.list_columns("missing", "key"))
+
+    def test_concurrent_board_queries_keep_their_order(self):
+        hnyapi.create_dataset("checkout", "key")
+        specs = [(f"Query {i}", f"Query {i}", craft_query_body(limit=i + 1)) for i in range(12)]
+
+        async def build():
+            references = await ahnyapi.craft_board_queries("checkout", specs, "key", concurrency=4)
+            board = await ahnyapi.craft_board("checkout Operations Overview", "checkout", references, "key")
+            updated = await ahnyapi.update_board(board, "checkout", references[:2], "key")
+            return references, board, updated, await ahnyapi.list_boards("key")
+
+        references, board, updated, boards = self.run_async(build())
+
+        for (name, _, body), reference in zip(specs, references):
+            self.assertEqual(hnyapi.get_query("checkout", reference["query_id"], "key")["limit"], body["limit"])
+            self.assertEqual(hnyapi.get_query_annotation("checkout", reference["annotation_id"], "key")["name"], name)
+        self.assertEqual(self.standin.count("POST", "queries"), 12)
+        self.assertEqual(len(board["queries"]), 12)
+        self.assertEqual((updated["id"], len(updated["queries"])), (board["id"], 2))
+        self.assertEqual([board["name"] for board in boards], ["checkout Operations Overview"])
+
+
+@unittest.skipIf(ahnyapi is None, "the async API needs the httpx module")
+class AsyncRetryTest(StandinTestCase):
+    standin_args = ('--error-rate', '0.2', '--error-burst', '1')
+
+    def test_server_errors_are_retried_and_recorded(self):
+        metrics = EndpointMetrics()
+
+        async def list_datasets():
+            try:
+                return await asyncio.gather(*[ahnyapi.hnyapi_request("datasets", "key") for _ in range(20)])
+            finally:
+                await ahnyapi.aclose()
+
+        with mock.patch.object(ahnyapi, "metrics", metrics):
+            results = asyncio.run(list_datasets())
+
+        summary = metrics.summary()["datasets"]
+        self.assertEqual(len(results), 20)
+        self.assertEqual(summary["status_codes"], {"200": 20})
+        self.assertGreater(summary["retries"], 0)
+        self.assertEqual(summary["requests"] + summary["retries"], self.standin.count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+from lib.builders import HoneycombBuilder
+from lib.hnyapi import craft_board_query, craft_query_body, create_column, create_dataset, get_query_annotation
+from lib.templates import compile_board_plan
+
+from standin import StandinTestCase
+
+
+def query_specs(count):
+    return [(f"Query {i}", f"Description {i}", craft_query_body(breakdowns=[f"column.{i}"]))
+            for i in range(count)]
+
+
+class ConcurrentBuildTest(StandinTestCase):
+    def test_concurrent_queries_keep_board_order(self):
+        builder = HoneycombBuilder("key", workers=4)
+        specs = query_specs(10)
+
+        queries = builder.craft_board_queries("checkout", specs)
+
+        self.assertEqual(len(queries), len(specs))
+        for (name, description, _), query in zip(specs, queries):
+            annotation = get_query_annotation("checkout", query["annotation_id"], "key")
+            self.assertEqual(annotation["name"], name)
+            self.assertEqual(annotation["query_id"], query["query_id"])
+        self.assertEqual(self.standin.count("POST", "queries"), 10)
+        self.assertEqual(self.standin.count("POST", "query_annotations"), 10)
+
+    def test_failed_pair_fails_the_build_without_a_board(self):
+        builder = HoneycombBuilder("key", workers=4)
+
+        def failing_craft(dataset, name, *args):
+            if name == "Latency":
+                raise RuntimeError("query creation failed")
+            return craft_board_query(dataset, name, *args)
+
+        with mock.patch("lib.builders.craft_board_query", side_effect=failing_craft):
+            with self.assertRaises(RuntimeError):
+                builder.build_service_board("checkout", "java")
+        self.assertEqual(self.standin.count("POST", "boards"), 0)
+
+
+class ReconcileTest(StandinTestCase):
+    def test_second_reconcile_changes_nothing(self):
+        first = HoneycombBuilder("key").reconcile_service_board("checkout", "java")
+        requests = self.standin.count()
+
+        second = HoneycombBuilder("key").reconcile_service_board("checkout", "java")
+
+        self.assertEqual(first["action"], "create")
+        self.assertEqual(second["action"], "none")
+        self.assertEqual(second["board_id"], first["board_id"])
+        self.assertEqual(second["queries"]["keep"], first["queries"]["add"])
+        self.assertEqual(first["api_calls"]["total"], requests)
+        self.assertEqual(second["api_calls"]["total"], self.standin.count() - requests)
+        self.assertEqual(self.standin.count("POST") + self.standin.count("PUT"), requests - first["api_calls"]["lookups"])
+
+    def test_changed_query_is_recreated_and_the_board_updated(self):
+        HoneycombBuilder("key").reconcile_service_board("checkout", "other")
+        specs = HoneycombBuilder("key").build_board_specs("checkout", "other")
+        name, description, body = specs[0]
+        changed = [(name, description, dict(body, time_range=body.get("time_range", 7200) * 2))] + specs[1:]
+        builder = HoneycombBuilder("key")
+
+        with mock.patch.object(builder, "build_board_specs", return_value=changed):
+            plan = builder.reconcile_service_board("checkout", "other")
+
+        self.assertEqual(plan["action"], "update")
+        self.assertEqual(plan["queries"]["add"], [name])
+        self.assertEqual(len(plan["queries"]["remove"]), 1)
+        self.assertEqual(self.standin.count("PUT", "boards"), 1)
+        self.assertEqual(self.standin.count("POST", "boards"), 1)
+
+
+class SchemaProbeTest(StandinTestCase):
+    def test_dataset_schema_is_probed_once(self):
+        required = compile_board_plan("java")["required_columns"]
+        existing = sorted(required)[:3]
+        create_dataset("checkout", "key")
+        for column in existing:
+            create_column("checkout", column, required[column], "key")
+
+        builder = HoneycombBuilder("key")
+        builder.build_board_specs("checkout", "java")
+        builder.build_board_specs("checkout", "java")
+
+        self.assertEqual(self.standin.count("GET", "datasets"), 1)
+        self.assertEqual(self.standin.count("GET", "columns"), 1)
+        self.assertEqual(self.standin.count("POST", "columns") - len(existing), len(required) - len(existing))
+        self.assertEqual(builder.schemas["checkout"], set(required))
+
+    def test_dry_run_only_records_missing_columns(self):
+        builder = HoneycombBuilder("key", dry_run=True)
+        builder.build_board_specs("checkout", "other")
+
+        self.assertEqual(builder.dataset_changes, {"checkout"})
+        self.assertEqual(builder.column_changes["checkout"], compile_board_plan("other")["required_columns"])
+        self.assertEqual(self.standin.count("POST"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
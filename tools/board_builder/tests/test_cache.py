@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from lib import HONEYCOMB_API_EU, HONEYCOMB_API_US
+from lib.builders import HoneycombBuilder
+from lib.cache import QueryCache, query_cache_key
+
+from standin import StandinTestCase
+
+
+def cache_path(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return os.path.join(directory.name, "query_cache.json")
+
+
+class QueryCacheTest(unittest.TestCase):
+    def test_key_ignores_body_key_order(self):
+        body = {"time_range": 7200, "breakdowns": ["http.route"], "calculations": [{"op": "COUNT"}]}
+        reordered = dict(reversed(list(body.items())))
+
+        key = query_cache_key(HONEYCOMB_API_US, "key", "checkout", body, "Routes", "By route")
+
+        self.assertEqual(key, query_cache_key(HONEYCOMB_API_US, "key", "checkout", reordered, "Routes", "By route"))
+        self.assertNotEqual(key, query_cache_key(HONEYCOMB_API_EU, "key", "checkout", body, "Routes", "By route"))
+        self.assertNotEqual(key, query_cache_key(HONEYCOMB_API_US, "other-key", "checkout", body, "Routes", "By route"))
+
+    def test_entries_survive_a_save_and_expire(self):
+        path = cache_path(self)
+        cache = QueryCache(path)
+        cache.put("fresh", {"query_id": "q1", "annotation_id": "a1"})
+        cache.put("stale", {"query_id": "q2", "annotation_id": "a2"})
+        cache.entries["stale"]["created_at"] = time.time() - 31 * 86400
+        cache.save()
+
+        reloaded = QueryCache(path, max_age=30 * 86400)
+
+        self.assertEqual(reloaded.get("fresh")["query_id"], "q1")
+        self.assertIsNone(reloaded.get("stale"))
+        self.assertEqual(reloaded.evictions, 1)
+
+
+class CachedBuildTest(StandinTestCase):
+    def test_rebuild_reuses_cached_queries(self):
+        cache = QueryCache(cache_path(self))
+        HoneycombBuilder("key", query_cache=cache).build_service_board("checkout", "java")
+        created = self.standin.count("POST", "queries")
+
+        HoneycombBuilder("key", query_cache=cache).build_service_board("checkout", "java")
+
+        self.assertEqual(self.standin.count("POST", "queries"), created)
+        self.assertEqual(self.standin.count("POST", "query_annotations"), created)
+        self.assertEqual(self.standin.count("GET", "query_annotations"), 0)
+        self.assertEqual(self.standin.count("POST", "boards"), 2)
+        self.assertEqual(cache.hits, created)
+
+    def test_environments_sharing_a_cache_do_not_reuse_queries(self):
+        cache = QueryCache(cache_path(self))
+        HoneycombBuilder("key", query_cache=cache).build_service_board("checkout", "java")
+        created = self.standin.count("POST", "queries")
+
+        HoneycombBuilder("other-key", query_cache=cache).build_service_board("checkout", "java")
+
+        self.assertEqual(self.standin.count("POST", "queries"), 2 * created)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(len(cache.entries), 2 * created)
+
+    def test_stale_entries_are_verified_and_recreated(self):
+        path = cache_path(self)
+        cache = QueryCache(path, verify_interval=0)
+        HoneycombBuilder("key", query_cache=cache).build_service_board("checkout", "other")
+        created = self.standin.count("POST", "queries")
+        # Point one entry at an annotation that no longer exists
+        stale_key = next(iter(cache.entries))
+        cache.entries[stale_key]["annotation_id"] = "missing"
+
+        HoneycombBuilder("key", query_cache=cache).build_service_board("checkout", "other")
+
+        self.assertEqual(self.standin.count("GET", "query_annotations"), created)
+        self.assertEqual(self.standin.count("POST", "queries"), created + 1)
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotEqual(cache.entries[stale_key]["annotation_id"], "missing")
+        cache.save()
+        with open(path) as f:
+            self.assertEqual(len(json.load(f)["entries"]), created)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from board_builder import main
+from lib.builders import HoneycombBuilder
+from lib.fleet import build_fleet, load_manifest
+
+from standin import StandinTestCase
+
+
+class ManifestTest(unittest.TestCase):
+    def write_manifest(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_csv_manifest_fills_in_defaults(self):
+        path = self.write_manifest("services.csv", "service_name,service_type,region\ncheckout,java,\n payments ,,us\n")
+
+        self.assertEqual(load_manifest(path, "eu"), [
+            {"service_name": "checkout", "service_type": "java", "region": "eu"},
+            {"service_name": "payments", "service_type": "other", "region": "us"},
+        ])
+
+    def test_json_manifest_accepts_short_keys(self):
+        path = self.write_manifest("services.json", json.dumps({"services": [{"name": "checkout", "type": "java"}]}))
+
+        self.assertEqual(load_manifest(path), [{"service_name": "checkout", "service_type": "java", "region": "us"}])
+
+    def test_unknown_region_fails_with_its_row(self):
+        path = self.write_manifest("services.csv", "service_name,service_type,region\ncheckout,java,us\npayments,java,eu1\n")
+
+        with self.assertRaisesRegex(ValueError, r"row 2: Unknown region 'eu1' for service payments"):
+            load_manifest(path)
+
+    def test_unknown_service_type_fails_with_its_row(self):
+        path = self.write_manifest("services.json", json.dumps([{"name": "checkout", "type": "jvaa"}]))
+
+        with self.assertRaisesRegex(ValueError, r"row 1: Unknown service type 'jvaa' for service checkout"):
+            load_manifest(path)
+
+    def test_yaml_manifest_without_pyyaml_is_a_usage_error(self):
+        path = self.write_manifest("services.yaml", "- service_name: checkout\n")
+        stderr = io.StringIO()
+
+        with mock.patch.dict(sys.modules, {"yaml": None}):
+            with self.assertRaisesRegex(ValueError, "require the PyYAML module"):
+                load_manifest(path)
+            with mock.patch.object(sys, "argv", ["board_builder.py", "-k", "key", "-m", path]), \
+                    contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as exited:
+                main()
+
+        self.assertEqual(exited.exception.code, 2)
+        self.assertIn("YAML manifests require the PyYAML module", stderr.getvalue())
+
+    def test_template_directory_adds_service_types(self):
+        template_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(template_dir.cleanup)
+        with open(os.path.join(template_dir.name, "elixir.json"), "w") as f:
+            json.dump({"name": "elixir", "queries": []}, f)
+        path = self.write_manifest("services.json", json.dumps([{"name": "checkout", "type": "elixir"}]))
+
+        self.assertEqual(load_manifest(path, template_dir=template_dir.name)[0]["service_type"], "elixir")
+
+
+class BuildFleetTest(StandinTestCase):
+    def test_failed_service_does_not_stop_the_others(self):
+        entries = [{"service_name": name, "service_type": "other", "region": "us"}
+                   for name in ("checkout", "payments", "frontend")]
+        build_service_board = HoneycombBuilder.build_service_board
+
+        def failing_build(builder, service_name, service_type):
+            if service_name == "payments":
+                raise RuntimeError("board creation failed")
+            return build_service_board(builder, service_name, service_type)
+
+        with mock.patch.object(HoneycombBuilder, "build_service_board", failing_build):
+            results = build_fleet(entries, "key", fleet_workers=3)
+
+        self.assertEqual((results["total"], results["succeeded"], results["failed"]), (3, 2, 1))
+        self.assertEqual([service["service_name"] for service in results["services"]], ["checkout", "payments", "frontend"])
+        self.assertEqual(results["services"][1]["error"], "board creation failed")
+        self.assertTrue(results["services"][0]["board_url"].startswith("https://"))
+        self.assertEqual(self.standin.count("POST", "boards"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
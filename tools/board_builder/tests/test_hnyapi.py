@@ -0,0 +1,39 @@
+import unittest
+
+from lib.hnyapi import (check_column_exists, check_dataset_exists, craft_board, craft_board_query, craft_query_body,
+                        create_column, create_dataset, get_query, list_boards, list_columns, update_board)
+
+from standin import StandinTestCase
+
+
+class HnyApiTest(StandinTestCase):
+    def test_dataset_and_columns_round_trip(self):
+        self.assertFalse(check_dataset_exists("checkout", "key"))
+
+        create_dataset("checkout", "key")
+        create_column("checkout", "http.route", "string", "key")
+
+        self.assertTrue(check_dataset_exists("checkout", "key"))
+        self.assertTrue(check_column_exists("checkout", "http.route", "key"))
+        self.assertFalse(check_column_exists("checkout", "http.method", "key"))
+        self.assertEqual([column["key_name"] for column in list_columns("checkout", "key")], ["http.route"])
+
+    def test_board_round_trip(self):
+        create_dataset("checkout", "key")
+        body = craft_query_body(breakdowns=["http.route"])
+        query = craft_board_query("checkout", "Routes", "By route", body, "key")
+
+        self.assertEqual(get_query("checkout", query["query_id"], "key")["breakdowns"], ["http.route"])
+        self.assertIsNone(get_query("checkout", "missing", "key"))
+
+        board = craft_board("checkout Operations Overview", "checkout", [query], "key")
+        updated = update_board(board, "checkout", [query, query], "key")
+
+        self.assertEqual(updated["id"], board["id"])
+        self.assertEqual(len(updated["queries"]), 2)
+        self.assertEqual(updated["queries"][0]["query_annotation_id"], query["annotation_id"])
+        self.assertEqual([board["name"] for board in list_boards("key")], ["checkout Operations Overview"])
+
+
+if __name__ == '__main__':
+    unittest.main()
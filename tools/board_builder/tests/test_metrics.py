@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+from urllib3.util import Retry
+
+from lib.metrics import EndpointMetrics, endpoint_for_url
+from lib.ratelimit import GovernedAdapter, RateGovernor
+
+from standin import Standin
+
+
+class EndpointMetricsTest(unittest.TestCase):
+    def test_endpoint_for_url(self):
+        self.assertEqual(endpoint_for_url("https://api.honeycomb.io/1/columns/checkout?key_name=duration_ms"), "columns")
+        self.assertEqual(endpoint_for_url("http://127.0.0.1:8080/1/boards"), "boards")
+        self.assertEqual(endpoint_for_url("https://api.honeycomb.io/"), "")
+
+    def test_summary_percentiles(self):
+        metrics = EndpointMetrics()
+        for latency in range(1, 101):
+            metrics.record("queries", 200, latency / 1000, bytes_sent=10)
+        metrics.record("queries", 429, 0.5, retries=1)
+
+        summary = metrics.summary()["queries"]
+
+        self.assertEqual(summary["requests"], 101)
+        self.assertEqual(summary["retries"], 1)
+        self.assertEqual(summary["status_codes"], {"200": 100, "429": 1})
+        self.assertEqual(summary["bytes_sent"], 1000)
+        self.assertEqual(summary["latency_ms"]["p50"], 51.0)
+        self.assertEqual(summary["latency_ms"]["p95"], 96.0)
+        self.assertEqual(summary["latency_ms"]["max"], 500.0)
+
+    def test_write_adds_extra_sections(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "metrics.json")
+        metrics = EndpointMetrics()
+        metrics.record("boards", 201, 0.01)
+
+        metrics.write(path, governor={"rate": 10})
+
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(data["endpoints"]["boards"]["requests"], 1)
+        self.assertEqual(data["governor"], {"rate": 10})
+
+
+class ResponseHookTest(unittest.TestCase):
+    def test_hook_counts_final_responses_and_retries(self):
+        metrics = EndpointMetrics()
+        session = requests.Session()
+        session.mount('http://', GovernedAdapter(RateGovernor(rate=1000, max_rate=1000),
+                                                 max_retries=Retry(total=4, status_forcelist=[500, 502, 503, 504])))
+        session.hooks['response'].append(metrics.response_hook)
+
+        with Standin('--error-rate', '0.2', '--error-burst', '1') as standin:
+            for _ in range(20):
+                session.get(standin.url + '/1/datasets', headers={"X-Honeycomb-Team": "key"}).raise_for_status()
+            served = standin.count()
+
+        summary = metrics.summary()["datasets"]
+        self.assertEqual(summary["requests"], 20)
+        self.assertEqual(summary["status_codes"], {"200": 20})
+        self.assertGreater(summary["retries"], 0)
+        self.assertEqual(summary["requests"] + summary["retries"], served)
+        self.assertGreater(summary["bytes_received"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
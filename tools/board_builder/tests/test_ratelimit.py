@@ -0,0 +1,76 @@
+import email.utils
+import time
+import unittest
+
+import requests
+
+from lib.ratelimit import GovernedAdapter, RateGovernor, parse_ratelimit_headers, parse_retry_after
+
+from standin import Standin
+
+
+class HeaderParsingTest(unittest.TestCase):
+    def test_retry_after_as_seconds_or_date(self):
+        self.assertEqual(parse_retry_after(" 3 "), 3.0)
+        self.assertAlmostEqual(parse_retry_after(email.utils.formatdate(time.time() + 10, usegmt=True)), 10, delta=2)
+        self.assertEqual(parse_retry_after(email.utils.formatdate(time.time() - 10, usegmt=True)), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_ratelimit_headers(self):
+        self.assertEqual(parse_ratelimit_headers({"RateLimit": "limit=100, remaining=50, reset=30"}),
+                         {"limit": 100, "remaining": 50, "reset": 30})
+        self.assertEqual(parse_ratelimit_headers({"X-RateLimit-Remaining": "7", "RateLimit-Reset": "2"}),
+                         {"remaining": 7, "reset": 2})
+        self.assertEqual(parse_ratelimit_headers({}), {})
+
+
+class RateGovernorTest(unittest.TestCase):
+    def test_throttling_halves_the_rate_and_pauses(self):
+        governor = RateGovernor(rate=8)
+
+        governor.observe(429, {"Retry-After": "2"})
+
+        self.assertEqual(governor.rate, 4)
+        self.assertEqual(governor.throttled, 1)
+        self.assertAlmostEqual(governor.reserve(), 2, delta=0.1)
+
+    def test_rate_follows_the_advertised_budget(self):
+        governor = RateGovernor(rate=8)
+
+        governor.observe(200, {"RateLimit": "limit=100, remaining=20, reset=10"})
+        self.assertEqual(governor.rate, 2)
+
+        governor.observe(200, {})
+        self.assertAlmostEqual(governor.rate, 2.1)
+
+    def test_tokens_pace_requests_beyond_the_burst(self):
+        governor = RateGovernor(rate=10, burst=2)
+
+        delays = [governor.reserve() for _ in range(4)]
+
+        self.assertEqual(delays[:2], [0, 0])
+        self.assertAlmostEqual(delays[3], 0.2, delta=0.05)
+        self.assertEqual(governor.waits, 2)
+
+
+class GovernedAdapterTest(unittest.TestCase):
+    def test_throttled_requests_are_retried(self):
+        governor = RateGovernor(rate=1000, burst=100, max_rate=1000)
+        session = requests.Session()
+        session.mount('http://', GovernedAdapter(governor, max_throttle_retries=20))
+
+        with Standin('--throttle-rate', '0.3', '--retry-after', '0') as standin:
+            responses = [session.get(standin.url + '/1/datasets', headers={"X-Honeycomb-Team": "key"})
+                         for _ in range(20)]
+            stats = standin.stats()
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(stats.get("GET datasets 200"), 20)
+        self.assertEqual(governor.throttled, stats.get("GET datasets 429"))
+        self.assertGreater(governor.throttled, 0)
+        self.assertEqual(sum(response.throttle_retries for response in responses), governor.throttled)
+
+
+if __name__ == '__main__':
+    unittest.main()
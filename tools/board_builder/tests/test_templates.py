@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+from lib.templates import TemplateError, compile_board_plan, load_template
+
+
+class TemplateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.template_dir = directory.name
+        self.write_template("service", {"duration_ms": "float"}, [
+            {"name": "Latency", "description": "P99", "query": {"calculations": [{"op": "P99", "column": "duration_ms"}]}},
+        ])
+
+    def write_template(self, name, required_columns, queries):
+        with open(os.path.join(self.template_dir, name + ".json"), "w") as f:
+            json.dump({"name": name, "required_columns": required_columns, "queries": queries}, f)
+
+    def test_plan_combines_the_base_and_service_templates(self):
+        self.write_template("java", {"duration_ms": "float", "jvm.threads": "integer"}, [
+            {"name": "Threads", "query": {"breakdowns": ["jvm.threads"], "time_range": 3600}},
+        ])
+
+        plan = compile_board_plan("java", self.template_dir)
+
+        self.assertEqual(plan["templates"], ("service", "java"))
+        self.assertEqual(plan["required_columns"], {"duration_ms": "float", "jvm.threads": "integer"})
+        self.assertEqual([name for name, _, _ in plan["queries"]], ["Latency", "Threads"])
+        self.assertEqual(plan["queries"][1][2]["time_range"], 3600)
+        self.assertEqual(plan["queries"][1][2]["breakdowns"], ["jvm.threads"])
+
+    def test_other_gets_only_the_base_queries(self):
+        plan = compile_board_plan("other", self.template_dir)
+
+        self.assertEqual(plan["templates"], ("service",))
+        self.assertEqual(len(plan["queries"]), 1)
+
+    def test_conflicting_column_types_are_rejected(self):
+        self.write_template("go", {"duration_ms": "integer"}, [])
+
+        with self.assertRaisesRegex(TemplateError, "duration_ms is required as both float and integer"):
+            compile_board_plan("go", self.template_dir)
+
+    def test_invalid_templates_are_rejected(self):
+        invalid = {
+            "bad_type": ({"duration_ms": "number"}, []),
+            "bad_field": ({}, [{"name": "Q", "query": {"granularity": 60}}]),
+            "undeclared": ({}, [{"name": "Q", "query": {"breakdowns": ["http.route"]}}]),
+        }
+        for name, (required_columns, queries) in invalid.items():
+            self.write_template(name, required_columns, queries)
+
+        with self.assertRaisesRegex(TemplateError, "has type number"):
+            load_template("bad_type", self.template_dir)
+        with self.assertRaisesRegex(TemplateError, "unknown fields: granularity"):
+            load_template("bad_field", self.template_dir)
+        with self.assertRaisesRegex(TemplateError, "missing from required_columns: http.route"):
+            load_template("undeclared", self.template_dir)
+        self.assertIsNone(load_template("missing", self.template_dir))
+
+    def test_shipped_templates_are_valid(self):
+        for service_type in ("java", "ruby", "python", "node", "go", "php", "other"):
+            plan = compile_board_plan(service_type)
+            self.assertTrue(plan["queries"])
+            self.assertEqual(len({name for name, _, _ in plan["queries"]}), len(plan["queries"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
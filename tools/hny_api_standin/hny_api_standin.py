@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Honeycomb API Stand-in Server
+
+A local, in-memory stand-in for the parts of the Honeycomb API used by the
+tools in this repository, for exercising and load testing them without a
+live Honeycomb account.  It supports:
+- datasets, columns, queries, query_annotations and boards
+- maps/dependencies/requests with async status and page[next] pagination
+- Configurable latency, 429s with Retry-After, 5xx bursts and dataset sizes
+- Request statistics at /stats
+
+No external dependencies (uses only Python standard library).
+"""
+
+import argparse
+import email.utils
+import gzip
+import itertools
+import json
+import random
+import ssl
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def isoformat(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FaultInjector:
+    """Decides, per request, whether to add latency, throttle or fail it."""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0,
+                 rate_limit: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 1, retry_after_date: bool = False,
+                 error_rate: float = 0.0, error_burst: int = 1,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit = rate_limit
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.retry_after_date = retry_after_date
+        self.error_rate = error_rate
+        self.error_burst = error_burst
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate_limit
+        self.updated = time.monotonic()
+        self.burst_remaining = 0
+
+    def delay(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(-self.latency_jitter, self.latency_jitter)
+        return max(0.0, self.latency + jitter)
+
+    def retry_after_header(self) -> str:
+        if self.retry_after_date:
+            return email.utils.format_datetime(
+                datetime.now(timezone.utc) + timedelta(seconds=self.retry_after), usegmt=True)
+        return str(self.retry_after)
+
+    def check(self) -> Tuple[Optional[int], Dict[str, str]]:
+        """
+        Returns (status, headers) for an injected fault, or (None, headers)
+        when the request should be served.  Headers carry the rate limit budget.
+        """
+        headers = {}
+        with self.lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.updated) * self.rate_limit)
+                self.updated = now
+                limited = self.tokens < 1
+                if not limited:
+                    self.tokens -= 1
+                headers['RateLimit'] = f"limit={int(self.rate_limit)}, remaining={int(self.tokens)}, reset=1"
+                if limited:
+                    headers['Retry-After'] = self.retry_after_header()
+                    return 429, headers
+
+            if self.throttle_rate and self.random.random() < self.throttle_rate:
+                headers['Retry-After'] = self.retry_after_header()
+                return 429, headers
+
+            if self.burst_remaining == 0 and self.error_rate and self.random.random() < self.error_rate:
+                self.burst_remaining = self.error_burst
+            if self.burst_remaining:
+                self.burst_remaining -= 1
+                return self.random.choice([500, 502, 503, 504]), headers
+
+        return None, headers
+
+
+class StandinState:
+    """In-memory Honeycomb environment."""
+
+    def __init__(self, datasets: int = 0, columns: int = 0,
+                 dependency_services: int = 100, dependency_edges: int = 500,
+                 dependency_ready_after: float = 2.0, page_size: int = 1000,
+                 seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.datasets = {}
+        self.columns = {}
+        self.queries = {}
+        self.annotations = {}
+        self.boards = {}
+        self.dependency_requests = {}
+        self.dependency_ready_after = dependency_ready_after
+        self.page_size = page_size
+        self.stats = Counter()
+
+        now = datetime.now(timezone.utc)
+        for i in range(datasets):
+            self.add_dataset(f"dataset-{i:04d}", now - timedelta(days=self.random.randint(0, 365)))
+            slug = f"dataset-{i:04d}"
+            for j in range(columns):
+                self.add_column(slug, f"field.{j:05d}", "string",
+                                hidden=self.random.random() < 0.1,
+                                created_at=now - timedelta(days=self.random.randint(0, 365)),
+                                last_written=now - timedelta(days=self.random.randint(0, 365)))
+
+        self.graph = self.build_graph(dependency_services, dependency_edges)
+
+    def next_id(self) -> str:
+        return f"{next(self.ids):08x}"
+
+    def add_dataset(self, name: str, created_at: Optional[datetime] = None) -> Dict:
+        created_at = created_at or datetime.now(timezone.utc)
+        slug = name.lower().replace(' ', '-')
+        dataset = {
+            'name': name,
+            'slug': slug,
+            'description': '',
+            'created_at': isoformat(created_at),
+            'last_written_at': isoformat(created_at),
+            'settings': {'delete_protected': True},
+        }
+        self.datasets[slug] = dataset
+        self.columns.setdefault(slug, {})
+        return dataset
+
+    def add_column(self, slug: str, key_name: str, column_type: str, hidden: bool = False,
+                   created_at: Optional[datetime] = None,
+                   last_written: Optional[datetime] = None) -> Dict:
+        created_at = created_at or datetime.now(timezone.utc)
+        column = {
+            'id': self.next_id(),
+            'key_name': key_name,
+            'type': column_type,
+            'hidden': hidden,
+            'description': '',
+            'created_at': isoformat(created_at),
+            'updated_at': isoformat(created_at),
+            'last_written': isoformat(last_written or created_at),
+        }
+        self.columns[slug][column['id']] = column
+        return column
+
+    def build_graph(self, services: int, edges: int) -> List[Tuple[str, str, int]]:
+        """Random service graph of (parent, child, calls per hour) edges."""
+        names = [f"service-{i:04d}" for i in range(services)]
+        edges = min(edges, services * (services - 1))
+        graph = set()
+        while len(graph) < edges:
+            parent, child = self.random.sample(names, 2)
+            graph.add((parent, child))
+        return [(parent, child, self.random.randint(1, 1000)) for parent, child in sorted(graph)]
+
+    def create_dependency_request(self, payload: Dict, limit: int) -> Dict:
+        now = time.time()
+        end_time = payload.get('end_time') or now
+        start_time = payload.get('start_time') or end_time - payload.get('time_range', 7200)
+        if payload.get('start_time') and not payload.get('end_time') and payload.get('time_range'):
+            end_time = start_time + payload['time_range']
+        hours = max(0.0, end_time - start_time) / 3600
+
+        services = {f['name'] for f in payload.get('filters', []) if f.get('type', 'service') == 'service'}
+        dependencies = []
+        for parent, child, calls_per_hour in self.graph:
+            if services and parent not in services and child not in services:
+                continue
+            call_count = int(calls_per_hour * hours)
+            if call_count == 0:
+                continue
+            dependencies.append({
+                'parent_node': {'name': parent, 'type': 'service'},
+                'child_node': {'name': child, 'type': 'service'},
+                'call_count': call_count,
+            })
+            if len(dependencies) >= limit:
+                break
+
+        request_id = self.next_id()
+        self.dependency_requests[request_id] = {
+            'ready_at': now + self.dependency_ready_after,
+            'dependencies': dependencies,
+        }
+        return {'request_id': request_id, 'status': 'pending'}
+
+    def get_dependency_page(self, request_id: str, cursor: Optional[str]) -> Optional[Dict]:
+        request = self.dependency_requests.get(request_id)
+        if request is None:
+            return None
+        if time.time() < request['ready_at']:
+            return {'request_id': request_id, 'status': 'pending'}
+        offset = int(cursor or 0)
+        end = offset + self.page_size
+        page = {
+            'request_id': request_id,
+            'status': 'ready',
+            'dependencies': request['dependencies'][offset:end],
+            'links': {},
+        }
+        if end < len(request['dependencies']):
+            page['links']['next'] = f"/1/maps/dependencies/requests/{request_id}?page[next]={end}"
+        return page
+
+    def handle(self, method: str, parts: List[str], params: Dict, body) -> Tuple[int, object]:
+        """Routes an API request, returning (status, response body)."""
+        endpoint = parts[0] if parts else ''
+        with self.lock:
+            if endpoint == 'datasets':
+                return self.handle_datasets(method, parts, body)
+            if endpoint == 'columns' and len(parts) >= 2:
+                return self.handle_columns(method, parts, params, body)
+            if endpoint == 'queries' and len(parts) >= 2:
+                return self.handle_objects(self.queries, method, parts, body)
+            if endpoint == 'query_annotations' and len(parts) >= 2:
+                return self.handle_objects(self.annotations, method, parts, body)
+            if endpoint == 'boards':
+                return self.handle_boards(method, parts, body)
+            if parts[:3] == ['maps', 'dependencies', 'requests']:
+                if method == 'POST' and len(parts) == 3:
+                    return 201, self.create_dependency_request(body or {}, int(params.get('limit', ['10000'])[0]))
+                if method == 'GET' and len(parts) == 4:
+                    page = self.get_dependency_page(parts[3], params.get('page[next]', [None])[0])
+                    return (404, {'error': 'request not found'}) if page is None else (200, page)
+        return 404, {'error': 'not found'}
+
+    def handle_datasets(self, method: str, parts: List[str], body) -> Tuple[int, object]:
+        if len(parts) == 1:
+            if method == 'GET':
+                return 200, list(self.datasets.values())
+            if method == 'POST':
+                slug = body['name'].lower().replace(' ', '-')
+                if slug in self.datasets:
+                    return 200, self.datasets[slug]
+                return 201, self.add_dataset(body['name'])
+        elif parts[1] in self.datasets:
+            dataset = self.datasets[parts[1]]
+            if method == 'GET':
+                return 200, dataset
+            if method == 'PUT':
+                dataset['settings'].update((body or {}).get('settings', {}))
+                return 200, dataset
+            if method == 'DELETE':
+                if dataset['settings'].get('delete_protected'):
+                    return 409, {'error': 'dataset is delete protected'}
+                del self.datasets[parts[1]]
+                del self.columns[parts[1]]
+                return 202, {}
+        return 404, {'error': 'dataset not found'}
+
+    def handle_columns(self, method: str, parts: List[str], params: Dict, body) -> Tuple[int, object]:
+        slug = parts[1]
+        if slug not in self.columns:
+            return 404, {'error': 'dataset not found'}
+        columns = self.columns[slug]
+        if len(parts) == 2:
+            if method == 'GET':
+                if 'key_name' in params:
+                    for column in columns.values():
+                        if column['key_name'] == params['key_name'][0]:
+                            return 200, column
+                    return 404, {'error': 'column not found'}
+                return 200, list(columns.values())
+            if method == 'POST':
+                return 201, self.add_column(slug, body['key_name'], body.get('type', 'string'))
+        elif parts[2] in columns:
+            if method == 'GET':
+                return 200, columns[parts[2]]
+            if method == 'DELETE':
+                del columns[parts[2]]
+                return 204, None
+        return 404, {'error': 'column not found'}
+
+    def handle_objects(self, objects: Dict, method: str, parts: List[str], body) -> Tuple[int, object]:
+        if len(parts) == 2 and method == 'POST':
+            obj = dict(body or {}, id=self.next_id())
+            objects[obj['id']] = obj
+            return 200, obj
+        if len(parts) == 3 and method == 'GET' and parts[2] in objects:
+            return 200, objects[parts[2]]
+        return 404, {'error': 'not found'}
+
+    def handle_boards(self, method: str, parts: List[str], body) -> Tuple[int, object]:
+        if len(parts) == 1:
+            if method == 'GET':
+                return 200, list(self.boards.values())
+            if method == 'POST':
+                board_id = self.next_id()
+                self.boards[board_id] = dict(body or {}, id=board_id,
+                                             links={'board_url': f"https://ui.honeycomb.io/standin/board/{board_id}"})
+                return 201, self.boards[board_id]
+        elif parts[1] in self.boards:
+            board_id = parts[1]
+            if method == 'GET':
+                return 200, self.boards[board_id]
+            if method == 'PUT':
+                self.boards[board_id] = dict(body or {}, id=board_id, links=self.boards[board_id]['links'])
+                return 200, self.boards[board_id]
+            if method == 'DELETE':
+                del self.boards[board_id]
+                return 204, None
+        return 404, {'error': 'board not found'}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'HoneycombStandin/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.handle_api('POST')
+
+    def do_PUT(self):
+        self.handle_api('PUT')
+
+    def do_DELETE(self):
+        self.handle_api('DELETE')
+
+    def send_json(self, status: int, body, headers: Optional[Dict[str, str]] = None):
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+            if len(data) > 1024 and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                data = gzip.compress(data)
+                self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_api(self, method: str):
+        state = self.server.state
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+
+        if url.path == '/stats':
+            with state.lock:
+                stats = dict(state.stats)
+            return self.send_json(200, stats)
+
+        parts = [part for part in url.path.split('/') if part]
+        if not parts or parts[0] != '1':
+            return self.send_json(404, {'error': 'not found'})
+        parts = parts[1:]
+        endpoint = '/'.join(parts[:3]) if parts[:1] == ['maps'] else (parts[0] if parts else '')
+
+        time.sleep(self.server.faults.delay())
+        status, headers = self.server.faults.check()
+        if status is None:
+            if not self.headers.get('X-Honeycomb-Team'):
+                status, body = 401, {'error': 'missing X-Honeycomb-Team header'}
+            else:
+                try:
+                    body = json.loads(raw_body) if raw_body else None
+                    status, body = state.handle(method, parts, parse_qs(url.query), body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, body = 400, {'error': f"bad request: {e}"}
+        else:
+            body = {'error': 'injected fault'}
+
+        with state.lock:
+            state.stats[f"{method} {endpoint} {status}"] += 1
+        self.send_json(status, body, headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Honeycomb API with fault injection')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('--certfile', help='TLS certificate, to serve https for tools that require it')
+    parser.add_argument('--keyfile', help='TLS private key for --certfile')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response latency in seconds (default: 0.05)')
+    parser.add_argument('--latency-jitter', type=float, default=0.02, help='Latency varies by up to this many seconds (default: 0.02)')
+    parser.add_argument('--rate-limit', type=float, default=0, help='Requests per second before 429s are returned, 0 for unlimited (default: 0)')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Fraction of requests randomly answered with 429 (default: 0)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s (default: 1)')
+    parser.add_argument('--retry-after-date', action='store_true', help='Send Retry-After as an HTTP date instead of seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='Chance of a request starting a burst of 5xx errors (default: 0)')
+    parser.add_argument('--error-burst', type=int, default=3, help='Number of consecutive 5xx errors in a burst (default: 3)')
+    parser.add_argument('--datasets', type=int, default=10, help='Number of datasets to start with (default: 10)')
+    parser.add_argument('--columns', type=int, default=100, help='Number of columns in each starting dataset (default: 100)')
+    parser.add_argument('--dependency-services', type=int, default=100, help='Number of services in the dependency graph (default: 100)')
+    parser.add_argument('--dependency-edges', type=int, default=500, help='Number of edges in the dependency graph (default: 500)')
+    parser.add_argument('--dependency-ready-after', type=float, default=2.0, help='Seconds before a dependency request is ready (default: 2)')
+    parser.add_argument('--page-size', type=int, default=1000, help='Dependencies per page (default: 1000)')
+    parser.add_argument('--seed', type=int, help='Random seed, for repeatable data and faults')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StandinHandler)
+    server.daemon_threads = True
+    server.verbose = args.verbose
+    server.state = StandinState(args.datasets, args.columns,
+                                args.dependency_services, args.dependency_edges,
+                                args.dependency_ready_after, args.page_size, args.seed)
+    server.faults = FaultInjector(args.latency, args.latency_jitter,
+                                  args.rate_limit, args.throttle_rate,
+                                  args.retry_after, args.retry_after_date,
+                                  args.error_rate, args.error_burst, args.seed)
+
+    scheme = 'http'
+    if args.certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.certfile, args.keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+
+    print(f"Honeycomb API stand-in listening on {scheme}://{args.host}:{args.port}/1/")
+    print(f"{len(server.state.datasets)} datasets, {len(server.state.graph)} dependency edges")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
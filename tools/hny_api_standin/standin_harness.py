@@ -0,0 +1,70 @@
+"""
+Runs hny_api_standin.py in a subprocess for other tools' tests.
+
+Add this directory to sys.path and use Standin as a context manager:
+
+    with Standin('--error-rate', '0.1') as standin:
+        ...  # point the tool at standin.url
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+STANDIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hny_api_standin.py')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Standin:
+    """
+    Context manager that starts the stand-in on a free port with no latency,
+    and dependency requests that are ready at once, and stops it on exit.
+    Extra arguments are passed to the stand-in and override these defaults.
+    """
+
+    def __init__(self, *args):
+        self.args = ['--latency', '0', '--latency-jitter', '0', '--datasets', '0', '--seed', '1',
+                     '--dependency-ready-after', '0'] + list(args)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen([sys.executable, STANDIN, '--port', str(self.port)] + self.args,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.stats()
+                return self
+            except OSError:
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.__exit__(None, None, None)
+                    raise RuntimeError("The API stand-in did not start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+    def stats(self):
+        """Requests served so far, by "METHOD endpoint status"."""
+        with urllib.request.urlopen(self.url + '/stats', timeout=5) as response:
+            return json.load(response)
+
+    def count(self, method=None, endpoint=None):
+        """Number of requests served, optionally only those with the given method and endpoint."""
+        total = 0
+        for key, value in self.stats().items():
+            key_method, key_endpoint, _ = key.split(' ')
+            if method in (None, key_method) and endpoint in (None, key_endpoint):
+                total += value
+        return total
@@ -0,0 +1,142 @@
+import gzip
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from http.server import ThreadingHTTPServer
+
+from hny_api_standin import FaultInjector, StandinHandler, StandinState
+from standin_harness import Standin
+
+
+class StandinStateTest(unittest.TestCase):
+    def test_starting_datasets_and_columns(self):
+        state = StandinState(datasets=2, columns=3, seed=1)
+
+        status, datasets = state.handle('GET', ['datasets'], {}, None)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([dataset['slug'] for dataset in datasets], ['dataset-0000', 'dataset-0001'])
+        self.assertEqual(len(state.handle('GET', ['columns', 'dataset-0000'], {}, None)[1]), 3)
+        self.assertEqual(state.handle('GET', ['columns', 'dataset-0000'], {'key_name': ['field.00001']}, None)[0], 200)
+        self.assertEqual(state.handle('GET', ['columns', 'dataset-0000'], {'key_name': ['missing']}, None)[0], 404)
+
+    def test_delete_protected_datasets(self):
+        state = StandinState(datasets=1, seed=1)
+
+        self.assertEqual(state.handle('DELETE', ['datasets', 'dataset-0000'], {}, None)[0], 409)
+        state.handle('PUT', ['datasets', 'dataset-0000'], {}, {'settings': {'delete_protected': False}})
+        self.assertEqual(state.handle('DELETE', ['datasets', 'dataset-0000'], {}, None)[0], 202)
+        self.assertEqual(state.handle('GET', ['datasets', 'dataset-0000'], {}, None)[0], 404)
+
+    def test_boards_keep_their_links_on_update(self):
+        state = StandinState(seed=1)
+
+        _, board = state.handle('POST', ['boards'], {}, {'name': 'Overview', 'queries': []})
+        status, updated = state.handle('PUT', ['boards', board['id']], {}, {'name': 'Overview', 'queries': [{'query_id': 'q'}]})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(updated['links'], board['links'])
+        self.assertEqual(len(state.handle('GET', ['boards'], {}, None)[1]), 1)
+
+    def test_dependency_pages_follow_the_cursor(self):
+        state = StandinState(dependency_services=20, dependency_edges=25, dependency_ready_after=0, page_size=10, seed=1)
+
+        _, request = state.handle('POST', ['maps', 'dependencies', 'requests'], {}, {'time_range': 7200})
+        edges = []
+        cursor = None
+        while True:
+            page = state.get_dependency_page(request['request_id'], cursor)
+            edges.extend(page['dependencies'])
+            if 'next' not in page['links']:
+                break
+            cursor = page['links']['next'].split('page[next]=')[1]
+
+        self.assertEqual(len(edges), 25)
+        self.assertEqual({edge['call_count'] for edge in edges} - {2 * calls for _, _, calls in state.graph}, set())
+
+    def test_pending_until_ready_and_filters_and_limit(self):
+        state = StandinState(dependency_services=20, dependency_edges=25, dependency_ready_after=60, seed=1)
+        service = state.graph[0][0]
+
+        _, request = state.handle('POST', ['maps', 'dependencies', 'requests'], {'limit': ['2']},
+                                  {'time_range': 3600, 'filters': [{'name': service}]})
+
+        self.assertEqual(state.get_dependency_page(request['request_id'], None)['status'], 'pending')
+        dependencies = state.dependency_requests[request['request_id']]['dependencies']
+        self.assertLessEqual(len(dependencies), 2)
+        self.assertTrue(all(service in (edge['parent_node']['name'], edge['child_node']['name']) for edge in dependencies))
+        self.assertIsNone(state.get_dependency_page('missing', None))
+
+
+class FaultInjectorTest(unittest.TestCase):
+    def test_rate_limit_advertises_the_budget(self):
+        faults = FaultInjector(rate_limit=2)
+
+        results = [faults.check() for _ in range(3)]
+
+        self.assertEqual([status for status, _ in results], [None, None, 429])
+        self.assertEqual(results[0][1]['RateLimit'], 'limit=2, remaining=1, reset=1')
+        self.assertEqual(results[2][1]['Retry-After'], '1')
+
+    def test_error_bursts(self):
+        faults = FaultInjector(error_rate=1, error_burst=2, seed=1)
+
+        self.assertTrue(all(500 <= faults.check()[0] <= 504 for _ in range(4)))
+        self.assertIsNone(FaultInjector().check()[0])
+
+
+class StandinServerTest(unittest.TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandinHandler)
+        server.daemon_threads = True
+        server.verbose = False
+        server.state = StandinState(datasets=50, seed=1)
+        server.faults = FaultInjector(seed=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(self, path, headers=None):
+        request = urllib.request.Request(self.url + path, headers=headers or {})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.headers, response.read()
+
+    def test_large_responses_are_gzipped_on_request(self):
+        headers, data = self.get('/1/datasets', {'X-Honeycomb-Team': 'key', 'Accept-Encoding': 'gzip'})
+        _, plain = self.get('/1/datasets', {'X-Honeycomb-Team': 'key'})
+
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertLess(len(data), len(plain))
+        self.assertEqual(json.loads(gzip.decompress(data)), json.loads(plain))
+
+    def test_requests_need_a_team_header_and_are_counted(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.get('/1/datasets')
+        self.assertEqual(raised.exception.code, 401)
+        self.get('/1/datasets', {'X-Honeycomb-Team': 'key'})
+
+        _, stats = self.get('/stats')
+
+        self.assertEqual(json.loads(stats), {'GET datasets 401': 1, 'GET datasets 200': 1})
+
+
+class StandinHarnessTest(unittest.TestCase):
+    def test_runs_the_server_with_overridden_defaults(self):
+        with Standin('--datasets', '3') as standin:
+            request = urllib.request.Request(standin.url + '/1/datasets', headers={'X-Honeycomb-Team': 'key'})
+            with urllib.request.urlopen(request, timeout=5) as response:
+                datasets = json.load(response)
+            served = (standin.count(), standin.count('GET', 'datasets'), standin.count('POST'))
+
+        self.assertEqual(len(datasets), 3)
+        self.assertEqual(served, (1, 1, 0))
+        self.assertIsNotNone(standin.process.poll())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,27 +8,226 @@ It supports:
 - Time-based querying
 - Handling large-scale service lists
 - Pagination support
+- Sharding long time ranges into separately fetched windows
+- Checkpointing progress so interrupted runs can be resumed
+- Writing straight into a dependency_tracker.py database
+- Incremental fetches of only the time since the last sync
 """
 
+import gzip
+import hashlib
+import http.client
+import io
 import json
+import os
+import queue
+import random
+import statistics
+import threading
 import time
 import sys
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Set
-import urllib.request
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
 import urllib.error
 import urllib.parse
+import zlib
+
+from dependency_tracker import DependencyTracker
+
+
+# Adaptive batching treats a batch that returns this fraction of the limit as
+# possibly truncated, and packs remembered services into batches expected to
+# return no more than COALESCE_TARGET of it
+SPLIT_THRESHOLD = 0.9
+COALESCE_TARGET = 0.5
+
+# Ways to merge the call counts of an edge returned by more than one batch
+MERGE_RULES = ('max', 'sum')
+
+# Pages that can wait for the database writer before fetch threads block
+DB_QUEUE_PAGES = 16
+
+
+class PollScheduler:
+    """
+    Decides when to poll each pending dependency request.
+
+    Polls start short and back off exponentially with jitter.  The time requests
+    took to become ready is remembered, so new requests are first polled around
+    the typical readiness latency rather than immediately.  Safe to share between
+    threads.
+    """
+
+    def __init__(self, min_interval: float = 0.5, max_interval: float = 15.0,
+                 backoff: float = 1.6, jitter: float = 0.2, history: int = 50):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.readiness = deque(maxlen=history)
+        self.polls = 0
+        self.completed = 0
+
+    def jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def typical_readiness(self) -> Optional[float]:
+        """Median time recent requests took to become ready, if any have."""
+        with self.lock:
+            return statistics.median(self.readiness) if self.readiness else None
+
+    def register(self, request_id: str):
+        """Start tracking a newly created request."""
+        now = time.monotonic()
+        typical = self.typical_readiness()
+        # Aim the first poll a little before the typical readiness latency
+        first_delay = self.min_interval if typical is None else max(self.min_interval, typical * 0.8)
+        with self.lock:
+            self.pending[request_id] = {
+                'created': now,
+                'attempts': 0,
+                'next_poll': now + self.jittered(first_delay),
+            }
+
+    def next_poll(self, request_id: str) -> float:
+        """Monotonic time the request is next due to be polled."""
+        with self.lock:
+            return self.pending[request_id]['next_poll']
+
+    def not_ready(self, request_id: str):
+        """Reschedule a request that was polled and is still pending."""
+        with self.lock:
+            self.polls += 1
+            entry = self.pending[request_id]
+            entry['attempts'] += 1
+            delay = min(self.max_interval, self.min_interval * self.backoff ** entry['attempts'])
+            entry['next_poll'] = time.monotonic() + self.jittered(delay)
+
+    def ready(self, request_id: str):
+        """Record that a request is ready and stop tracking it."""
+        with self.lock:
+            self.polls += 1
+            self.completed += 1
+            entry = self.pending.pop(request_id)
+            self.readiness.append(time.monotonic() - entry['created'])
+
+    def forget(self, request_id: str):
+        with self.lock:
+            self.pending.pop(request_id, None)
+
+    def stats(self) -> Dict:
+        typical = self.typical_readiness()
+        with self.lock:
+            return {
+                'polls': self.polls,
+                'completed': self.completed,
+                'typical_readiness': typical,
+            }
+
+
+class HTTPTransport:
+    """
+    Keep-alive HTTP(S) client that reuses one connection per thread and host,
+    negotiates gzip/deflate response compression, and counts bytes on the
+    wire versus bytes decoded.
+
+    Error responses raise urllib.error.HTTPError, like urllib.request.urlopen.
+    A connection that fails part way through a request is closed and never
+    reused.
+    """
+
+    def __init__(self, timeout: float = 60):
+        self.timeout = timeout
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.bytes_on_wire = 0
+        self.bytes_decoded = 0
+
+    def connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        connections = self.local.__dict__.setdefault('connections', {})
+        key = (scheme, netloc)
+        if key not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connections[key] = connection_class(netloc, timeout=self.timeout)
+            with self.lock:
+                self.connections += 1
+        return connections[key]
+
+    def discard(self, scheme: str, netloc: str):
+        """Close this thread's connection to netloc, so the next request reconnects."""
+        connection = self.local.__dict__.get('connections', {}).pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> bytes:
+        """Send a request and return the decoded response body."""
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        headers = dict(headers or {}, **{'Accept-Encoding': 'gzip, deflate'})
+
+        for attempt in range(2):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                raw = response.read()
+                break
+            except BaseException as e:
+                # The connection may be part way through a request, so it can't be reused
+                self.discard(parts.scheme, parts.netloc)
+                # Reconnect once after a connection error, e.g. when the server closed an
+                # idle keep-alive connection, but don't wait out a second timeout
+                if attempt > 0 or isinstance(e, TimeoutError) or not isinstance(e, (http.client.HTTPException, OSError)):
+                    raise
+
+        encoding = response.getheader('Content-Encoding', '').lower()
+        if encoding == 'gzip':
+            data = gzip.decompress(raw)
+        elif encoding == 'deflate':
+            data = zlib.decompress(raw)
+        else:
+            data = raw
+
+        with self.lock:
+            self.requests += 1
+            self.bytes_on_wire += len(raw)
+            self.bytes_decoded += len(data)
+
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason,
+                                         response.headers, io.BytesIO(data))
+        return data
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'bytes_on_wire': self.bytes_on_wire,
+                'bytes_decoded': self.bytes_decoded,
+            }
 
 
 class HoneycombDependencyFetcher:
-    def __init__(self, api_key: str, api_url: str = "https://api.honeycomb.io"):
+    def __init__(self, api_key: str, api_url: str = "https://api.honeycomb.io",
+                 scheduler: Optional[PollScheduler] = None,
+                 transport: Optional[HTTPTransport] = None):
         self.api_key = api_key
         self.api_url = api_url
         self.headers = {
             "X-Honeycomb-Team": api_key,
             "Content-Type": "application/json"
         }
+        self.scheduler = scheduler or PollScheduler()
+        self.transport = transport or HTTPTransport()
 
     def create_dependency_request(self,
                                   start_time: Optional[int] = None,
@@ -66,12 +265,10 @@ class HoneycombDependencyFetcher:
             ]
 
         data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers=self.headers, method='POST')
 
         try:
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                return result['request_id']
+            result = json.loads(self.transport.request('POST', url, data, self.headers).decode('utf-8'))
+            return result['request_id']
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
             print(f"Error creating dependency request: {e.code} - {error_body}")
@@ -85,11 +282,8 @@ class HoneycombDependencyFetcher:
         if page_cursor:
             url += f"?page[next]={page_cursor}"
 
-        req = urllib.request.Request(url, headers=self.headers)
-
         try:
-            with urllib.request.urlopen(req) as response:
-                return json.loads(response.read().decode('utf-8'))
+            return json.loads(self.transport.request('GET', url, headers=self.headers).decode('utf-8'))
         except urllib.error.HTTPError as e:
             error_body = e.read().decode('utf-8')
             print(f"Error getting dependencies: {e.code} - {error_body}")
@@ -97,49 +291,442 @@ class HoneycombDependencyFetcher:
 
     def wait_for_results(self, request_id: str, max_wait: int = 300) -> Dict:
         """
-        Poll for results until ready or timeout.
+        Poll for results until ready or timeout, on the scheduler's timetable.
         """
-        start_time = time.time()
+        deadline = time.monotonic() + max_wait
+        self.scheduler.register(request_id)
+        try:
+            while True:
+                due = self.scheduler.next_poll(request_id)
+                if due > deadline:
+                    raise TimeoutError(f"Dependency request timed out after {max_wait} seconds")
+                # Wait until the request is due
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
 
-        while time.time() - start_time < max_wait:
-            result = self.get_dependencies(request_id)
+                result = self.get_dependencies(request_id)
 
-            if result['status'] == 'ready':
-                return result
-            elif result['status'] == 'error':
-                raise Exception(f"Dependency request failed: {result}")
+                if result['status'] == 'ready':
+                    self.scheduler.ready(request_id)
+                    return result
+                elif result['status'] == 'error':
+                    raise Exception(f"Dependency request failed: {result}")
+                self.scheduler.not_ready(request_id)
+        finally:
+            self.scheduler.forget(request_id)
 
-            # Wait before polling again
-            time.sleep(2)
+    def iter_dependency_pages(self, request_id: str) -> Iterator[List[Dict]]:
+        """
+        Wait for a request to be ready, then yield its dependencies one page at a time.
+        """
+        for page, _ in self.iter_cursor_pages(request_id):
+            yield page
 
-        raise TimeoutError(f"Dependency request timed out after {max_wait} seconds")
+    def iter_cursor_pages(self, request_id: str,
+                          page_cursor: Optional[str] = None) -> Iterator[Tuple[List[Dict], Optional[str]]]:
+        """
+        Like iter_dependency_pages, but yield each page together with the cursor
+        of the page after it (None for the last page).  Passing a cursor saved
+        from an earlier run continues from that page of an already ready request.
+        """
+        if page_cursor:
+            result = self.get_dependencies(request_id, page_cursor)
+        else:
+            # First, wait for the request to be ready
+            result = self.wait_for_results(request_id)
+
+        # Handle pagination
+        while True:
+            # Extract cursor from next link
+            next_url = result.get('links', {}).get('next') or ''
+            next_cursor = None
+            if 'page[next]=' in next_url:
+                next_cursor = next_url.split('page[next]=')[1].split('&')[0]
+
+            if result.get('dependencies'):
+                yield result['dependencies'], next_cursor
+            if next_cursor is None:
+                break
+            result = self.get_dependencies(request_id, next_cursor)
 
     def fetch_all_dependencies(self, request_id: str) -> List[Dict]:
         """
         Fetch all dependencies, handling pagination.
         """
         all_dependencies = []
-        page_cursor = None
+        for page in self.iter_dependency_pages(request_id):
+            all_dependencies.extend(page)
+        return all_dependencies
 
-        # First, wait for the request to be ready
-        initial_result = self.wait_for_results(request_id)
 
-        if initial_result.get('dependencies'):
-            all_dependencies.extend(initial_result['dependencies'])
+class EdgeIndex:
+    """
+    In-memory index of dependency edges, keyed by parent and child node, that
+    merges duplicates as pages arrive.
 
-        # Handle pagination
-        while initial_result.get('links', {}).get('next'):
-            # Extract cursor from next link
-            next_url = initial_result['links']['next']
-            if 'page[next]=' in next_url:
-                page_cursor = next_url.split('page[next]=')[1].split('&')[0]
-                initial_result = self.get_dependencies(request_id, page_cursor)
-                if initial_result.get('dependencies'):
-                    all_dependencies.extend(initial_result['dependencies'])
+    Batches overlap whenever an edge's parent and child are in different
+    batches, so the same edge can come back from several requests.  Within one
+    time window duplicates are merged with `rule`: 'max' keeps the largest
+    call_count, which is the edge's real count when batches overlap, and 'sum'
+    adds them.  Edges from different --shard-window windows (tagged with
+    window_start) cover different time and are always summed.  Safe to share
+    between threads.
+
+    For incremental fetches, windows starting before counted_from overlap the
+    previous sync, whose calls were already counted, so they add nothing to
+    call_count.
+    """
+
+    def __init__(self, rule: str = 'max', counted_from: Optional[int] = None):
+        if rule not in MERGE_RULES:
+            raise ValueError(f"Unknown merge rule: {rule}")
+        self.rule = rule
+        self.counted_from = counted_from
+        self.lock = threading.Lock()
+        self.edges: Dict[Tuple, Dict] = {}
+        self.duplicates = 0
+
+    def add(self, dependencies: List[Dict]):
+        with self.lock:
+            for dep in dependencies:
+                key = (dep.get('window_start'),) + edge_key(dep)
+                existing = self.edges.get(key)
+                if existing is None:
+                    self.edges[key] = dep
+                    continue
+                self.duplicates += 1
+                self.edges[key] = dict(existing, call_count=merge_call_counts(
+                    self.rule, existing.get('call_count', 0), dep.get('call_count', 0)))
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def dependencies(self) -> List[Dict]:
+        """
+        The merged edges, with each edge's windows summed into one, sorted by
+        parent and child so the result doesn't depend on which batch finished
+        first.  An edge only seen in windows overlapping the previous sync keeps
+        the window_start of one of them, so the tracker knows not to count it.
+        """
+        merged: Dict[Tuple, Dict] = {}
+        with self.lock:
+            for dep in self.edges.values():
+                key = edge_key(dep)
+                overlap = (self.counted_from is not None and dep.get('window_start') is not None
+                           and dep['window_start'] < self.counted_from)
+                call_count = 0 if overlap else dep.get('call_count', 0)
+                if key not in merged:
+                    merged[key] = {field: value for field, value in dep.items() if field != 'window_start'}
+                    merged[key]['call_count'] = 0
+                    if overlap:
+                        merged[key]['window_start'] = dep['window_start']
+                elif not overlap:
+                    merged[key].pop('window_start', None)
+                merged[key]['call_count'] += call_count
+        return [merged[key] for key in sorted(merged, key=lambda key: tuple(part or '' for part in key))]
+
+
+def edge_key(dep: Dict) -> Tuple:
+    """Identify a dependency edge by its parent and child nodes"""
+    parent = dep.get('parent_node', {})
+    child = dep.get('child_node', {})
+    return (parent.get('name'), parent.get('type'), child.get('name'), child.get('type'))
+
+
+def merge_call_counts(rule: str, existing: int, new: int) -> int:
+    return max(existing, new) if rule == 'max' else existing + new
+
+
+class WrittenEdges:
+    """
+    Edges already written to a streaming output, which can't merge duplicates
+    after the fact like EdgeIndex does.  With the 'max' merge rule, an edge that
+    was already written for the same window with at least the same call_count
+    is a duplicate and can be skipped; with 'sum', every edge is written.
+
+    This only thins out duplicates, it doesn't merge them: when a larger
+    call_count arrives after a smaller one, both are written.  Readers of the
+    output must still merge repeated edges with the recorded merge_rule, as
+    dependency_tracker.py does.
+    """
+
+    def __init__(self, merge_rule: str = 'max'):
+        self.merge_rule = merge_rule
+        self.call_counts: Dict[Tuple, int] = {}
+        self.duplicates = 0
+
+    def is_duplicate(self, dep: Dict) -> bool:
+        """Check an edge against those already written, remembering it if it is new"""
+        if self.merge_rule != 'max':
+            return False
+        key = (dep.get('window_start'),) + edge_key(dep)
+        call_count = dep.get('call_count', 0)
+        if key in self.call_counts and self.call_counts[key] >= call_count:
+            self.duplicates += 1
+            return True
+        self.call_counts[key] = call_count
+        return False
+
+
+class NDJSONWriter:
+    """
+    Streams fetched dependencies to a newline-delimited JSON file as they arrive.
+
+    The first line is a header record with the fetch metadata, followed by one
+    dependency per line and a closing summary record.  Files ending in .gz are
+    gzip-compressed.  Safe to share between threads.
+
+    With resume, an existing file from an interrupted run is appended to
+    instead of being replaced.
+
+    Edges are written as they arrive, so they cannot be merged like EdgeIndex
+    does; see WrittenEdges for how duplicates are skipped instead.  An edge can
+    still appear more than once, so the merge rule is recorded in the header
+    and readers must merge repeated edges with it.
+    """
+
+    def __init__(self, filename: str, metadata: Dict, resume: bool = False,
+                 merge_rule: str = 'max'):
+        self.filename = filename
+        self.compressed = filename.endswith('.gz')
+        self.lock = threading.Lock()
+        self.total_dependencies = 0
+        self.services = set()
+        self.written = WrittenEdges(merge_rule)
+        if resume and os.path.exists(filename):
+            self.recover()
+        else:
+            self.file = self.open_file(filename, 'w')
+            self.write_record(dict(metadata, merge_rule=merge_rule, record='header'))
+
+    @property
+    def duplicates(self) -> int:
+        return self.written.duplicates
+
+    def open_file(self, filename: str, mode: str):
+        if self.compressed:
+            return gzip.open(filename, mode + 't', encoding='utf-8')
+        return open(filename, mode, encoding='utf-8')
+
+    def recover(self):
+        """
+        Reopen the output of an interrupted run for appending.
+
+        Every complete record is copied to a fresh file, dropping a partly
+        written last line, the unterminated end of a gzip stream and the summary
+        record of an earlier attempt, so the finished file reads as one run.
+        """
+        lines = []
+        try:
+            with self.open_file(self.filename, 'r') as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        lines.append(line)
+        except (EOFError, zlib.error):
+            # A killed run leaves a gzip stream without its end marker; the
+            # pages flushed before that are still readable
+            pass
+
+        temp_filename = self.filename + '.tmp'
+        self.file = self.open_file(temp_filename, 'w')
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get('record') == 'summary':
+                continue
+            self.file.write(line)
+            if record.get('record') == 'header':
+                # Keep merging the way the interrupted run did
+                self.written.merge_rule = record.get('merge_rule', self.written.merge_rule)
             else:
-                break
+                self.written.is_duplicate(record)
+                self.count_dependency(record)
+        self.file.flush()
+        os.replace(temp_filename, self.filename)
+        print(f"Resuming {self.filename} with {self.total_dependencies} dependencies already written")
 
-        return all_dependencies
+    def write_record(self, record: Dict):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def count_dependency(self, dep: Dict):
+        self.total_dependencies += 1
+        if dep.get('parent_node', {}).get('name'):
+            self.services.add(dep['parent_node']['name'])
+        if dep.get('child_node', {}).get('name'):
+            self.services.add(dep['child_node']['name'])
+
+    def write_dependencies(self, dependencies: List[Dict]):
+        with self.lock:
+            for dep in dependencies:
+                if self.written.is_duplicate(dep):
+                    continue
+                self.write_record(dep)
+                self.count_dependency(dep)
+            # Flush each page so a crash keeps everything fetched so far
+            self.file.flush()
+
+    def close(self, summary: Optional[Dict] = None):
+        with self.lock:
+            self.write_record(dict(summary or {},
+                                   duplicates_skipped=self.duplicates,
+                                   record='summary',
+                                   total_dependencies=self.total_dependencies,
+                                   unique_services=len(self.services)))
+            self.file.close()
+
+
+class DatabaseWriter:
+    """
+    Streams fetched dependencies straight into a dependency_tracker.py database.
+
+    Pages are handed to a writer thread through a bounded queue, so fetching
+    and database writes overlap without the whole graph being held in memory;
+    when the database falls behind, fetch threads wait for room in the queue.
+    The writer thread owns the DependencyTracker, since SQLite connections
+    can't be shared between threads, and commits whatever pages have queued up
+    as one batch.  Repeated edges are all staged and merged by the tracker when
+    the snapshot is finished, so no per-edge state is kept in memory.
+    """
+
+    def __init__(self, db_path: str, metadata: Dict, merge_rule: str = 'max',
+                 queue_size: int = DB_QUEUE_PAGES):
+        self.db_path = db_path
+        # The tracker merges repeated edges with the snapshot's merge_rule
+        self.metadata = dict(metadata, merge_rule=merge_rule)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.total_dependencies = 0
+        self.services = set()
+        self.commits = 0
+        self.updated = 0
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self.run, name='dependency-db-writer', daemon=True)
+        self.thread.start()
+
+    def write_dependencies(self, dependencies: List[Dict]):
+        with self.lock:
+            for dep in dependencies:
+                self.total_dependencies += 1
+                if dep.get('parent_node', {}).get('name'):
+                    self.services.add(dep['parent_node']['name'])
+                if dep.get('child_node', {}).get('name'):
+                    self.services.add(dep['child_node']['name'])
+        if dependencies:
+            self.queue.put(dependencies)
+
+    def run(self):
+        tracker = None
+        done = False
+        try:
+            tracker = DependencyTracker(self.db_path)
+            tracker.begin_snapshot(self.metadata)
+            while not done:
+                # Commit every page that has queued up since the last commit together
+                pages = [self.queue.get()]
+                while len(pages) < self.queue.maxsize:
+                    try:
+                        pages.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if pages[-1] is None:
+                    pages.pop()
+                    done = True
+                tracker.add_dependencies(dep for page in pages for dep in page)
+                self.commits += 1
+            self.updated = tracker.finish_snapshot()
+        except BaseException as e:
+            self.error = e
+            # Keep draining the queue so fetch threads never block on it
+            while not done:
+                done = self.queue.get() is None
+        finally:
+            if tracker:
+                tracker.close()
+
+    def close(self, summary: Optional[Dict] = None) -> int:
+        """
+        Wait for every queued page to be written and finish the snapshot,
+        adding summary (e.g. failed_batches) to its metadata.
+
+        Returns the number of distinct dependencies in the snapshot.
+        """
+        self.metadata.update(summary or {})
+        self.queue.put(None)
+        self.thread.join()
+        if self.error:
+            raise self.error
+        return self.updated
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON lines journal of dependency fetch progress, so an
+    interrupted run can be resumed without re-fetching finished batches.
+
+    Each batch is identified by a key derived from its request parameters.  The
+    journal records the request created for it, the cursor and running edge
+    count after each page written to the output, and the batch's result once it
+    is complete.  Pages are only journaled after they have been flushed to the
+    output, so a resumed run never skips edges, though a page written just
+    before the process died may be written twice.  Safe to share between threads.
+    """
+
+    def __init__(self, filename: str, resume: bool = False):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.run: Optional[Dict] = None
+        self.batches: Dict[str, Dict] = {}
+        if resume and os.path.exists(filename):
+            self.load()
+        self.file = open(filename, 'a' if resume else 'w', encoding='utf-8')
+
+    def load(self):
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partly written last line of a killed run
+                    continue
+                if entry['event'] == 'run':
+                    self.run = entry
+                    continue
+                state = self.batches.setdefault(entry['key'], {})
+                state.update(entry)
+                state['status'] = entry['event']
+
+    @staticmethod
+    def batch_key(batch: Optional[List[str]],
+                  start_time: Optional[int],
+                  end_time: Optional[int],
+                  time_range: int,
+                  limit: int) -> str:
+        params = json.dumps([batch, start_time, end_time, time_range, limit])
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()[:16]
+
+    def record(self, event: str, **fields):
+        with self.lock:
+            self.file.write(json.dumps(dict(fields, event=event), separators=(',', ':')) + '\n')
+            self.file.flush()
+
+    def start_run(self, params: Dict) -> Dict:
+        """
+        Record the parameters of a new run, or return those of the run being
+        resumed so it fetches exactly the same batches and time bounds.
+        """
+        if self.run is None:
+            self.run = dict(params)
+            self.record('run', **params)
+        return self.run
+
+    def lookup(self, key: str) -> Dict:
+        return self.batches.get(key, {})
+
+    def close(self):
+        self.file.close()
 
 
 def load_services_from_file(filename: str) -> List[str]:
@@ -165,6 +752,487 @@ def batch_services(services: List[str], batch_size: int = 100) -> List[List[str]
     return batches
 
 
+def load_batch_stats(filename: str) -> Dict[str, int]:
+    """
+    Load remembered per-service edge counts, or an empty dict if there are none yet.
+    """
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f).get('services', {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_batch_stats(filename: str, edge_counts: Dict[str, int]):
+    """
+    Save per-service edge counts for plan_batches to use on the next run.
+    """
+    with open(filename, 'w') as f:
+        json.dump({
+            'updated_at': datetime.now().isoformat(),
+            'services': dict(sorted(edge_counts.items())),
+        }, f, indent=2)
+
+
+def plan_batches(services: List[str],
+                 batch_size: int,
+                 edge_counts: Dict[str, int],
+                 limit: int,
+                 max_batch_size: int = 500) -> List[List[str]]:
+    """
+    Group services into as few batches as their remembered edge counts allow.
+
+    Services with a known edge count are packed so that each batch is expected
+    to return at most COALESCE_TARGET of the limit, leaving headroom for growth,
+    and no more than max_batch_size services.  Services never seen before fall
+    back to fixed batches of batch_size.
+    """
+    budget = limit * COALESCE_TARGET
+    batches = []
+    current: List[str] = []
+    estimate = 0
+    for service in services:
+        if service not in edge_counts:
+            continue
+        edges = edge_counts[service]
+        if current and (estimate + edges > budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            estimate = 0
+        current.append(service)
+        estimate += edges
+    if current:
+        batches.append(current)
+
+    unknown = [service for service in services if service not in edge_counts]
+    return batches + batch_services(unknown, batch_size)
+
+
+def time_windows(start_time: int, end_time: int, window: int) -> List[Tuple[int, int]]:
+    """Split [start_time, end_time) into consecutive windows of at most `window` seconds"""
+    windows = []
+    window_start = start_time
+    while window_start < end_time:
+        window_end = min(window_start + window, end_time)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+def resolve_time_bounds(start_time: Optional[int],
+                        end_time: Optional[int],
+                        time_range: int) -> Tuple[int, int]:
+    """
+    Turn the optional start/end/time_range combination into absolute bounds,
+    the same way the API does: a missing end is start + time_range, a missing
+    start is end - time_range, and with neither the range ends now.
+    """
+    if start_time is not None and end_time is not None:
+        return start_time, end_time
+    if start_time is not None:
+        return start_time, start_time + time_range
+    if end_time is None:
+        end_time = int(time.time())
+    return end_time - time_range, end_time
+
+
+def format_window(window: Tuple[int, int]) -> str:
+    """Render a (start, end) window in local time for progress output"""
+    return ' - '.join(datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') for ts in window)
+
+
+def fetch_batch(fetcher: HoneycombDependencyFetcher,
+                batch_number: int,
+                total_batches: int,
+                batch: Optional[List[str]],
+                start_time: Optional[int],
+                end_time: Optional[int],
+                time_range: int,
+                limit: int,
+                on_page: Optional[Callable[[List[Dict]], None]] = None,
+                checkpoint: Optional[CheckpointJournal] = None) -> Dict:
+    """
+    Create, poll and paginate the dependency request for one batch of services.
+
+    Returns a result dict with the batch, its time bounds, the number of
+    dependencies fetched, the number of edges seen for each service in the
+    batch, and the dependencies themselves, or an 'error' entry if the batch
+    failed.  When on_page is given, each page is passed to it as it arrives
+    instead of being collected, and 'dependencies' is left empty.
+
+    With a checkpoint journal, each page passed to on_page is journaled.  A
+    batch the journal already records as complete is skipped, and one that was
+    interrupted continues from its last journaled page, or is re-fetched
+    without repeating the pages already written if its request has expired.
+    """
+    result = {
+        'batch': batch,
+        'start_time': start_time,
+        'end_time': end_time,
+        'fetched': 0,
+        'truncated': False,
+        'requests': 1,
+        'service_edges': dict.fromkeys(batch or [], 0),
+        'dependencies': [],
+        'error': None,
+    }
+    key = None
+    saved: Dict = {}
+    if checkpoint:
+        key = checkpoint.batch_key(batch, start_time, end_time, time_range, limit)
+        saved = checkpoint.lookup(key)
+        if saved.get('status') == 'done':
+            print(f"Skipping batch {batch_number}/{total_batches}, already fetched")
+            result.update(saved['result'])
+            return result
+
+    if batch:
+        print(f"Processing batch {batch_number}/{total_batches} ({len(batch)} services)")
+
+    def fetch_pages(request_id: str, page_cursor: Optional[str] = None, skip: int = 0):
+        for page, next_cursor in fetcher.iter_cursor_pages(request_id, page_cursor):
+            result['fetched'] += len(page)
+            count_service_edges(result['service_edges'], page)
+            if skip:
+                # Already written before the previous request expired
+                page, skip = page[skip:], max(0, skip - len(page))
+            if on_page:
+                if page:
+                    on_page(page)
+            else:
+                result['dependencies'].extend(page)
+            if checkpoint:
+                checkpoint.record('page', key=key, cursor=next_cursor,
+                                  edges_written=result['fetched'],
+                                  service_edges=result['service_edges'])
+
+    try:
+        resumed = False
+        if saved.get('request_id'):
+            request_id = saved['request_id']
+            result['fetched'] = saved.get('edges_written', 0)
+            result['service_edges'].update(saved.get('service_edges', {}))
+            skip = max(0, saved.get('skip', 0) - result['fetched'])
+            if saved['status'] == 'page' and saved.get('cursor') is None:
+                # The last page was written just before the run stopped
+                resumed = True
+            else:
+                print(f"Resuming request {request_id} after {result['fetched']} dependencies")
+                try:
+                    fetch_pages(request_id, saved.get('cursor'), skip)
+                    resumed = True
+                except urllib.error.HTTPError as e:
+                    if e.code != 404:
+                        raise
+                    print(f"Request {request_id} has expired, fetching batch {batch_number} again")
+
+        if not resumed:
+            # Edges of an expired request that were already written, including
+            # those an earlier expired request wrote before it
+            skip = max(saved.get('skip', 0), result['fetched'])
+            result['fetched'] = 0
+            result['service_edges'] = dict.fromkeys(batch or [], 0)
+
+            # Create dependency request
+            request_id = fetcher.create_dependency_request(
+                start_time=start_time,
+                end_time=end_time,
+                time_range=time_range,
+                service_filters=batch,
+                limit=limit
+            )
+            print(f"Created request: {request_id}")
+            if checkpoint:
+                checkpoint.record('created', key=key, request_id=request_id, cursor=None,
+                                  edges_written=0, skip=skip, batch=batch,
+                                  start_time=start_time, end_time=end_time)
+
+            # Fetch dependencies
+            fetch_pages(request_id, skip=skip)
+
+        print(f"Fetched {result['fetched']} dependencies")
+        result['truncated'] = result['fetched'] >= limit
+        if checkpoint:
+            checkpoint.record('done', key=key, result=checkpoint_result(result))
+
+    except Exception as e:
+        print(f"Error processing batch {batch_number}: {e}")
+        result['error'] = str(e)
+
+    return result
+
+
+def checkpoint_result(result: Dict) -> Dict:
+    """The parts of a batch result the checkpoint journal keeps for skipped batches"""
+    return {field: result[field] for field in ('fetched', 'truncated', 'requests', 'service_edges')}
+
+
+def count_service_edges(service_edges: Dict[str, int], dependencies: List[Dict]):
+    """Count each dependency against the filtered services at either end of it"""
+    if not service_edges:
+        return
+    for dep in dependencies:
+        parent = dep.get('parent_node', {}).get('name')
+        child = dep.get('child_node', {}).get('name')
+        if parent in service_edges:
+            service_edges[parent] += 1
+        if child in service_edges and child != parent:
+            service_edges[child] += 1
+
+
+def fetch_adaptive_batch(fetcher: HoneycombDependencyFetcher,
+                         batch_number: int,
+                         total_batches: int,
+                         batch: Optional[List[str]],
+                         start_time: Optional[int],
+                         end_time: Optional[int],
+                         time_range: int,
+                         limit: int,
+                         on_page: Optional[Callable[[List[Dict]], None]] = None,
+                         checkpoint: Optional[CheckpointJournal] = None) -> Dict:
+    """
+    Fetch one batch like fetch_batch, but split it in half and re-fetch each
+    half whenever it comes back with SPLIT_THRESHOLD of the limit or more, until
+    every piece is complete or down to a single service.
+
+    A batch's dependencies are only passed to on_page once the batch is known to
+    be complete, so a truncated result is never written out.  The returned
+    result covers the whole batch, with 'truncated' set if any single-service
+    piece still hit the limit.
+
+    With a checkpoint journal, complete batches and splits are journaled, so a
+    resumed run skips finished pieces and goes straight to the halves of a
+    batch that was already split.
+    """
+    key = None
+    saved: Dict = {}
+    if checkpoint:
+        key = checkpoint.batch_key(batch, start_time, end_time, time_range, limit)
+        saved = checkpoint.lookup(key)
+        if saved.get('status') == 'done':
+            print(f"Skipping batch {batch_number}/{total_batches}, already fetched")
+            return dict(saved['result'], batch=batch, start_time=start_time,
+                        end_time=end_time, dependencies=[], error=None)
+
+    if saved.get('status') == 'split':
+        result = None
+    else:
+        result = fetch_batch(fetcher, batch_number, total_batches, batch,
+                             start_time, end_time, time_range, limit)
+
+    if result is None or (result['error'] is None and batch and len(batch) > 1
+                          and result['fetched'] >= limit * SPLIT_THRESHOLD):
+        if result is not None:
+            print(f"Batch {batch_number} returned {result['fetched']} of {limit} dependencies, "
+                  f"splitting its {len(batch)} services in two")
+            if checkpoint:
+                checkpoint.record('split', key=key)
+        middle = len(batch) // 2
+        halves = [
+            fetch_adaptive_batch(fetcher, batch_number, total_batches, half,
+                                 start_time, end_time, time_range, limit, on_page, checkpoint)
+            for half in (batch[:middle], batch[middle:])
+        ]
+        errors = [half['error'] for half in halves if half['error']]
+        return {
+            'batch': batch,
+            'start_time': start_time,
+            'end_time': end_time,
+            'fetched': sum(half['fetched'] for half in halves),
+            'truncated': any(half['truncated'] for half in halves),
+            'requests': 1 + sum(half['requests'] for half in halves),
+            'service_edges': {**halves[0]['service_edges'], **halves[1]['service_edges']},
+            'dependencies': halves[0]['dependencies'] + halves[1]['dependencies'],
+            'error': '; '.join(errors) or None,
+        }
+
+    if on_page and result['dependencies']:
+        on_page(result['dependencies'])
+        result['dependencies'] = []
+    if checkpoint and result['error'] is None:
+        checkpoint.record('done', key=key, result=checkpoint_result(result))
+    return result
+
+
+def fetch_batches(fetcher: HoneycombDependencyFetcher,
+                  batches: List[Optional[List[str]]],
+                  start_time: Optional[int],
+                  end_time: Optional[int],
+                  time_range: int,
+                  limit: int,
+                  concurrency: int = 1,
+                  on_page: Optional[Callable[[List[Dict]], None]] = None,
+                  windows: Optional[List[Tuple[int, int]]] = None,
+                  adaptive: bool = False,
+                  checkpoint: Optional[CheckpointJournal] = None) -> List[Dict]:
+    """
+    Fetch dependencies for every batch, with up to `concurrency` requests in flight.
+
+    When windows is given, every batch is fetched once per (start, end) window
+    instead of once for start_time/end_time, and results are ordered window by
+    window.  Results are returned in that order regardless of completion order,
+    so the merged output is deterministic.  Pages passed to on_page arrive in
+    completion order instead; when sharding, each edge is tagged with the
+    window_start of the window it came from.  With adaptive, batches that come
+    back close to the limit are split and re-fetched by fetch_adaptive_batch.
+    Progress is journaled to checkpoint, if given, so the run can be resumed.
+    """
+    fetch = fetch_adaptive_batch if adaptive else fetch_batch
+    if windows is None:
+        windows = [(start_time, end_time)]
+    tasks = [(window, batch) for window in windows for batch in batches]
+
+    def task_on_page(window):
+        if on_page is None or len(windows) == 1:
+            return on_page
+        return lambda page: on_page([dict(dep, window_start=window[0]) for dep in page])
+
+    if concurrency <= 1:
+        results = []
+        for i, (window, batch) in enumerate(tasks):
+            results.append(fetch(fetcher, i + 1, len(tasks), batch,
+                                 window[0], window[1], time_range, limit,
+                                 task_on_page(window), checkpoint))
+            # Small delay between batches
+            if i < len(tasks) - 1:
+                time.sleep(1)
+        return results
+
+    print(f"Processing {len(tasks)} batches with up to {concurrency} requests in flight")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(fetch, fetcher, i + 1, len(tasks), batch,
+                            window[0], window[1], time_range, limit,
+                            task_on_page(window), checkpoint)
+            for i, (window, batch) in enumerate(tasks)
+        ]
+        return [future.result() for future in futures]
+
+
+def report_truncated(results: List[Dict], limit: int) -> int:
+    """
+    Warn about every batch that returned `limit` or more dependencies, since
+    the API stops there and the rest of the edges were silently dropped.
+
+    Returns the number of truncated batches.
+    """
+    truncated = [result for result in results
+                 if result['error'] is None and result['truncated']]
+    for result in truncated:
+        where = ''
+        if result['start_time'] is not None and result['end_time'] is not None:
+            where = f" in window {format_window((result['start_time'], result['end_time']))}"
+        services = f"{len(result['batch'])} services" if result['batch'] else "all services"
+        print(f"Warning: batch of {services}{where} hit the limit of {limit} dependencies; "
+              f"results may be truncated (try a smaller --shard-window or --batch-size)")
+    return len(truncated)
+
+
+def collect_batch_stats(results: List[Dict]) -> Dict[str, int]:
+    """
+    Edge counts per service from every complete batch.  A service fetched in
+    several windows keeps its largest count, since that is what a batch
+    containing it has to fit.
+    """
+    edge_counts: Dict[str, int] = {}
+    for result in results:
+        if result['error'] or result['truncated']:
+            continue
+        for service, edges in result['service_edges'].items():
+            edge_counts[service] = max(edges, edge_counts.get(service, 0))
+    return edge_counts
+
+
+def print_fetch_stats(fetcher: HoneycombDependencyFetcher):
+    poll_stats = fetcher.scheduler.stats()
+    if poll_stats['completed']:
+        print(f"\nPolled {poll_stats['polls']} times for {poll_stats['completed']} requests "
+              f"(typical readiness {poll_stats['typical_readiness']:.1f}s)")
+
+    transport_stats = fetcher.transport.stats()
+    print(f"Made {transport_stats['requests']} API requests over {transport_stats['connections']} connections, "
+          f"{transport_stats['bytes_on_wire']} bytes on the wire, {transport_stats['bytes_decoded']} bytes decoded")
+
+
+def incremental_time_range(tracker_db: str, time_range: int,
+                           overlap: int) -> Tuple[int, int, Optional[int]]:
+    """
+    Work out the time range for an incremental fetch from the high-water mark
+    (the end of the last complete sync) in a tracker database.
+
+    Returns (start_time, end_time, counted_from): the range starts `overlap`
+    seconds before the high-water mark, which is returned as counted_from, and
+    ends now.  counted_from is set whenever a previous sync is used, even with
+    no overlap, since it is what makes the fetch incremental.  With no previous
+    sync, or one older than time_range, the full time_range is fetched instead
+    and counted_from is None.  The database is only read, and a missing one
+    means there is no previous sync.
+    """
+    try:
+        tracker = DependencyTracker(tracker_db, read_only=True)
+    except FileNotFoundError:
+        last_sync = None
+    else:
+        try:
+            last_sync = tracker.get_last_sync()
+        finally:
+            tracker.close()
+
+    end_time = int(time.time())
+    if last_sync is None:
+        print(f"No previous sync in {tracker_db}, fetching the full time range")
+        return end_time - time_range, end_time, None
+
+    high_water_mark = last_sync['time_range_end']
+    synced = datetime.fromtimestamp(high_water_mark).isoformat()
+    if high_water_mark <= end_time - time_range:
+        print(f"Last sync up to {synced} is older than the time range, fetching the full time range")
+        return end_time - time_range, end_time, None
+    if high_water_mark >= end_time:
+        high_water_mark = end_time
+
+    start_time = max(high_water_mark - overlap, end_time - time_range)
+    print(f"Incremental fetch since the last sync up to {synced}, "
+          f"with {high_water_mark - start_time} seconds of overlap")
+    return start_time, end_time, high_water_mark
+
+
+def fetch_metadata(args, start_time: Optional[int], end_time: Optional[int],
+                   windows: Optional[List[Tuple[int, int]]],
+                   counted_from: Optional[int]) -> Dict:
+    """The fetch metadata recorded with every output, and by the tracker"""
+    metadata = {
+        'fetch_time': datetime.now().isoformat(),
+        'time_range': args.time_range,
+        'start_time': start_time,
+        'end_time': end_time,
+        'windows': windows,
+    }
+    # An incremental run that had to fetch the full range is a full snapshot
+    if args.incremental and counted_from is not None:
+        metadata.update({
+            'incremental': True,
+            'counted_from': counted_from,
+            'inactive_after': args.inactive_after,
+        })
+    return metadata
+
+
+def print_batch_stats(results: List[Dict], args):
+    """
+    Report how many requests adaptive batching needed, and save per-service
+    edge counts when --batch-stats is set.
+    """
+    if args.adaptive:
+        requests = sum(result['requests'] for result in results)
+        print(f"Adaptive batching made {requests} requests for {len(results)} batches")
+    if args.batch_stats:
+        edge_counts = load_batch_stats(args.batch_stats)
+        edge_counts.update(collect_batch_stats(results))
+        save_batch_stats(args.batch_stats, edge_counts)
+        print(f"Saved edge counts for {len(edge_counts)} services to {args.batch_stats}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Fetch service dependencies from Honeycomb')
     parser.add_argument('--api-key', required=True, help='Honeycomb API key')
@@ -176,8 +1244,56 @@ def main():
     parser.add_argument('--output', default='dependencies.json', help='Output file (default: dependencies.json)')
     parser.add_argument('--batch-size', type=int, default=100, help='Batch size for service filters (default: 100)')
     parser.add_argument('--limit', type=int, default=10000, help='Max dependencies per request (default: 10000)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Max dependency requests in flight at once (default: 1)')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                        help='Output format; ndjson streams each page to the output file as it arrives, '
+                             'gzip-compressed if the file name ends in .gz (default: json)')
+    parser.add_argument('--shard-window', type=int,
+                        help='Split the time range into windows of this many seconds and fetch each '
+                             'window separately, summing call counts across windows')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Split batches that return close to --limit dependencies and re-fetch the halves')
+    parser.add_argument('--batch-stats',
+                        help='JSON file of per-service edge counts, used to coalesce services into '
+                             'fewer batches and updated after each run')
+    parser.add_argument('--max-batch-size', type=int, default=500,
+                        help='Most services to coalesce into one batch with --batch-stats (default: 500)')
+    parser.add_argument('--merge-rule', choices=MERGE_RULES, default='max',
+                        help='How to merge an edge returned by more than one batch: max keeps the largest '
+                             'call_count, sum adds them; windows are always summed (default: max)')
+    parser.add_argument('--db',
+                        help='Write dependencies straight into this dependency_tracker.py database '
+                             'as they are fetched, instead of to --output')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only fetch the time since the last complete sync recorded in the tracker '
+                             'database (--db or --tracker-db)')
+    parser.add_argument('--overlap', type=int, default=3600,
+                        help='Seconds before the last sync to fetch again with --incremental, so edges '
+                             'whose spans arrived late are still seen; their calls were already counted '
+                             'and are not added again (default: 3600)')
+    parser.add_argument('--inactive-after', type=int, default=604800,
+                        help='With --incremental, mark dependencies inactive once they have not been seen '
+                             'for this many seconds (default: 604800 = 7 days)')
+    parser.add_argument('--tracker-db', default='dependencies.db',
+                        help='Tracker database to read the last sync from for --incremental when not '
+                             'using --db (default: dependencies.db)')
+    parser.add_argument('--checkpoint',
+                        help='Journal each batch\'s progress to this file so an interrupted run can be resumed '
+                             '(requires --format ndjson; not supported with --db)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume the run recorded in --checkpoint, skipping finished batches and '
+                             'appending to its output file')
 
     args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.checkpoint and args.db:
+        parser.error('--checkpoint is not supported with --db')
+    if args.checkpoint and args.format != 'ndjson':
+        parser.error('--checkpoint requires --format ndjson')
+    if args.incremental and (args.start_date or args.end_date):
+        parser.error('--incremental sets its own time range; it cannot be used with --start-date/--end-date')
 
     # Initialize fetcher
     fetcher = HoneycombDependencyFetcher(args.api_key, args.api_url)
@@ -191,13 +1307,59 @@ def main():
     if args.end_date:
         end_time = int(datetime.strptime(args.end_date, '%Y-%m-%d').timestamp())
 
+    # Only fetch what changed since the last sync, plus some overlap
+    counted_from = None
+    if args.incremental:
+        start_time, end_time, counted_from = incremental_time_range(
+            args.db or args.tracker_db, args.time_range, args.overlap)
+
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = CheckpointJournal(args.checkpoint, args.resume)
+        if args.resume and checkpoint.run is None:
+            print(f"No run recorded in {args.checkpoint}, starting a new one")
+        # Pin the time bounds, so a run resumed later fetches the same range
+        start_time, end_time = resolve_time_bounds(start_time, end_time, args.time_range)
+        run = checkpoint.start_run({
+            'start_time': start_time,
+            'end_time': end_time,
+            'output': args.output,
+            'counted_from': counted_from,
+        })
+        if run['output'] != args.output:
+            parser.error(f"{args.checkpoint} is for a run writing to {run['output']}")
+        start_time, end_time = run['start_time'], run['end_time']
+        counted_from = run.get('counted_from')
+
+    # Split the range into sub-windows, each with its own request and limit.
+    # The overlap with the last sync is always a window of its own, so its
+    # calls can be told apart from new ones
+    windows = None
+    if args.shard_window or counted_from is not None:
+        bounds = resolve_time_bounds(start_time, end_time, args.time_range)
+        if counted_from is not None:
+            bounds = (bounds[0], counted_from, bounds[1])
+        windows = []
+        for window_start, window_end in zip(bounds, bounds[1:]):
+            windows.extend(time_windows(window_start, window_end,
+                                        args.shard_window or window_end - window_start))
+        if args.shard_window:
+            print(f"Sharding time range into {len(windows)} windows of up to {args.shard_window} seconds")
+
     # Load services if file provided
     service_filters = None
     if args.services_file:
         services = load_services_from_file(args.services_file)
         print(f"Loaded {len(services)} services from {args.services_file}")
 
-        if len(services) > args.batch_size:
+        edge_counts = load_batch_stats(args.batch_stats) if args.batch_stats else {}
+        if edge_counts:
+            batches = plan_batches(services, args.batch_size, edge_counts,
+                                   args.limit, args.max_batch_size)
+            known = sum(1 for service in services if service in edge_counts)
+            print(f"Planned {len(batches)} batches from remembered edge counts "
+                  f"for {known} of {len(services)} services")
+        elif len(services) > args.batch_size:
             print(f"Processing services in batches of {args.batch_size}")
             batches = batch_services(services, args.batch_size)
         else:
@@ -206,64 +1368,91 @@ def main():
         # No service filter - get all dependencies
         batches = [None]
 
-    # Collect all dependencies
-    all_dependencies = []
-    all_services = set()
-
-    for i, batch in enumerate(batches):
-        if batch:
-            print(f"Processing batch {i+1}/{len(batches)} ({len(batch)} services)")
-
-        try:
-            # Create dependency request
-            request_id = fetcher.create_dependency_request(
-                start_time=start_time,
-                end_time=end_time,
-                time_range=args.time_range,
-                service_filters=batch,
-                limit=args.limit
-            )
-            print(f"Created request: {request_id}")
-
-            # Fetch dependencies
-            dependencies = fetcher.fetch_all_dependencies(request_id)
-            print(f"Fetched {len(dependencies)} dependencies")
+    if args.db:
+        # Stream each page into the tracker database while the next ones are fetched
+        writer = DatabaseWriter(args.db, fetch_metadata(args, start_time, end_time, windows, counted_from),
+                                merge_rule=args.merge_rule)
+        results = fetch_batches(fetcher, batches, start_time, end_time,
+                                args.time_range, args.limit, args.concurrency,
+                                on_page=writer.write_dependencies, windows=windows,
+                                adaptive=args.adaptive)
+        updated = writer.close({
+            'failed_batches': sum(1 for result in results if result['error']),
+            'truncated_batches': report_truncated(results, args.limit),
+        })
+        print_fetch_stats(fetcher)
+        print_batch_stats(results, args)
+        print(f"\nResults written to {args.db} in {writer.commits} commits")
+        print(f"Total dependencies: {updated} ({writer.total_dependencies} fetched)")
+        print(f"Unique services: {len(writer.services)}")
+        return
 
-            # Add to results
-            all_dependencies.extend(dependencies)
+    if args.format == 'ndjson':
+        # Stream each page to the output file as it arrives
+        writer = NDJSONWriter(args.output, fetch_metadata(args, start_time, end_time, windows, counted_from),
+                              resume=args.resume, merge_rule=args.merge_rule)
+        results = fetch_batches(fetcher, batches, start_time, end_time,
+                                args.time_range, args.limit, args.concurrency,
+                                on_page=writer.write_dependencies, windows=windows,
+                                adaptive=args.adaptive, checkpoint=checkpoint)
+        failed_batches = sum(1 for result in results if result['error'])
+        # The summary record is only written once every batch has finished,
+        # so a file without one is from an interrupted run
+        writer.close({
+            'failed_batches': failed_batches,
+            'truncated_batches': report_truncated(results, args.limit),
+        })
+        print_fetch_stats(fetcher)
+        print_batch_stats(results, args)
+        if checkpoint:
+            checkpoint.close()
+            if failed_batches:
+                print(f"\n{failed_batches} batches failed; run again with --resume to retry them")
+        print(f"\nResults saved to {args.output}")
+        print(f"Total dependencies: {writer.total_dependencies}")
+        print(f"Duplicate edges skipped: {writer.duplicates}")
+        print(f"Unique services: {len(writer.services)}")
+        return
 
-            # Track all services seen
-            for dep in dependencies:
-                if dep.get('parent_node', {}).get('name'):
-                    all_services.add(dep['parent_node']['name'])
-                if dep.get('child_node', {}).get('name'):
-                    all_services.add(dep['child_node']['name'])
+    # Merge duplicate edges as pages arrive
+    index = EdgeIndex(args.merge_rule, counted_from)
 
-        except Exception as e:
-            print(f"Error processing batch {i+1}: {e}")
-            continue
+    results = fetch_batches(fetcher, batches, start_time, end_time,
+                            args.time_range, args.limit, args.concurrency,
+                            on_page=index.add, windows=windows, adaptive=args.adaptive)
+    truncated_batches = report_truncated(results, args.limit)
+    all_dependencies = index.dependencies()
 
-        # Small delay between batches
-        if i < len(batches) - 1:
-            time.sleep(1)
+    # Track all services seen
+    all_services = set()
+    for dep in all_dependencies:
+        if dep.get('parent_node', {}).get('name'):
+            all_services.add(dep['parent_node']['name'])
+        if dep.get('child_node', {}).get('name'):
+            all_services.add(dep['child_node']['name'])
 
     # Prepare output
-    output_data = {
-        'fetch_time': datetime.now().isoformat(),
-        'time_range': args.time_range,
-        'start_time': start_time,
-        'end_time': end_time,
+    output_data = fetch_metadata(args, start_time, end_time, windows, counted_from)
+    output_data.update({
+        'failed_batches': sum(1 for result in results if result['error']),
+        'truncated_batches': truncated_batches,
+        'merge_rule': args.merge_rule,
+        'duplicates_merged': index.duplicates,
         'total_dependencies': len(all_dependencies),
         'unique_services': len(all_services),
         'dependencies': all_dependencies
-    }
+    })
 
     # Save to file
     with open(args.output, 'w') as f:
         json.dump(output_data, f, indent=2)
 
+    print_fetch_stats(fetcher)
+    print_batch_stats(results, args)
+
     print(f"\nResults saved to {args.output}")
     print(f"Total dependencies: {len(all_dependencies)}")
+    print(f"Duplicate edges merged: {index.duplicates}")
     print(f"Unique services: {len(all_services)}")
 
 
@@ -8,20 +8,244 @@ information and providing validation capabilities against internal systems.
 Uses SQLite for lightweight persistence.
 """
 
+import gzip
 import json
 import sqlite3
+import time
 import argparse
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+import urllib.parse
+
+
+# Accepted values for PRAGMA synchronous
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# History downsampling buckets, finest first; weeks start on Monday, as in
+# compact_history
+HISTORY_BUCKETS = {
+    'hour': "strftime('%Y-%m-%d %H:00:00', {})",
+    'day': "date({})",
+    'week': "date({}, 'weekday 0', '-6 days')",
+}
+
+
+def open_dependencies_file(dependencies_file: str):
+    """Open a fetcher output file for reading, decompressing .gz files."""
+    if dependencies_file.endswith('.gz'):
+        return gzip.open(dependencies_file, 'rt', encoding='utf-8')
+    return open(dependencies_file, 'r', encoding='utf-8')
+
+
+def iter_ndjson_dependencies(f, metadata: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Yield dependency records from an NDJSON file, skipping header/summary records.
+
+    The summary record, if the file has one, is stored in metadata['summary'].
+    """
+    try:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'record' not in record:
+                yield record
+            elif record['record'] == 'summary' and metadata is not None:
+                metadata['summary'] = record
+    finally:
+        f.close()
+
+
+class StreamingJSONReader:
+    """
+    Incremental parser for the JSON layout written by dependency_fetcher.py: a
+    top-level object of fetch metadata with a 'dependencies' array.
+
+    The file is read in chunks and the array is decoded one element at a time,
+    so memory use stays flat however large the file.  read_metadata parses the
+    keys before the array; iter_dependencies then streams the array and adds
+    any keys after it to the metadata.
+    """
+
+    WHITESPACE = ' \t\n\r'
+    NUMBER_CHARS = '0123456789+-.eE'
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.in_array = False
+
+    def fill(self) -> bool:
+        """Read another chunk into the buffer, dropping what has been parsed."""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in dependencies file, found {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may continue in the next chunk
+                if self.fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if not self.eof and not self.buffer[end:].strip(self.NUMBER_CHARS) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def read_metadata(self) -> Dict:
+        """Parse the top-level keys up to the start of the 'dependencies' array."""
+        metadata = {}
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return metadata
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+            if key == 'dependencies' and self.peek() == '[':
+                self.pos += 1
+                self.in_array = True
+                return metadata
+            metadata[key] = self.decode_value()
+            if self.expect(',}') == '}':
+                return metadata
+
+    def iter_dependencies(self, metadata: Dict) -> Iterator[Dict]:
+        """Yield the 'dependencies' array one element at a time, then read the remaining keys."""
+        try:
+            if not self.in_array:
+                return
+            if self.peek() == ']':
+                self.pos += 1
+            else:
+                while True:
+                    yield self.decode_value()
+                    if self.expect(',]') == ']':
+                        break
+            self.in_array = False
+
+            # Keys after the array
+            while self.expect(',}') == ',':
+                key = self.decode_value()
+                self.expect(':')
+                metadata[key] = self.decode_value()
+        finally:
+            self.f.close()
+
+
+def read_dependencies_file(dependencies_file: str) -> Tuple[Dict, Iterable[Dict]]:
+    """
+    Read the output of dependency_fetcher.py in either its JSON or NDJSON format.
+
+    Returns the fetch metadata (fetch_time, start_time, end_time, ...) and an
+    iterable of dependencies.  NDJSON dependencies are read one line at a time,
+    so memory use does not grow with the size of the file; its summary record
+    is added to the metadata once they have all been read.  JSON dependencies
+    are streamed one array element at a time by StreamingJSONReader.
+    """
+    f = open_dependencies_file(dependencies_file)
+    # An NDJSON header is one short line; don't read a whole single-line JSON file
+    first_line = f.readline(1 << 20)
+    try:
+        header = json.loads(first_line)
+    except ValueError:
+        header = None
+
+    if isinstance(header, dict) and header.get('record') == 'header':
+        return header, iter_ndjson_dependencies(f, header)
+
+    f.seek(0)
+    reader = StreamingJSONReader(f)
+    metadata = reader.read_metadata()
+    if 'fetch_time' in metadata or not reader.in_array:
+        return metadata, reader.iter_dependencies(metadata)
+
+    # The metadata the ingest needs comes after the dependencies, so the
+    # file has to be read whole
+    f.seek(0)
+    with f:
+        data = json.load(f)
+    return data, data['dependencies']
 
 
 class DependencyTracker:
-    def __init__(self, db_path: str = "dependencies.db"):
+    def __init__(self, db_path: str = "dependencies.db",
+                 read_only: bool = False,
+                 synchronous: str = "NORMAL",
+                 cache_size: int = -65536,
+                 mmap_size: int = 268435456):
+        """
+        Open the tracker database.
+
+        The database uses a write-ahead log, so read-only connections (used by
+        query and export) keep reading the last committed snapshot while an
+        update is writing the next one, instead of failing with "database is
+        locked".  A read-only connection doesn't create or migrate anything, so
+        the database must already exist.
+
+        synchronous, cache_size and mmap_size are passed to the SQLite PRAGMAs
+        of the same names.  cache_size is in pages, or KiB if negative (64 MiB
+        by default); mmap_size is in bytes (256 MiB by default, 0 to disable).
+        With WAL, synchronous=NORMAL is safe against corruption and only risks
+        losing the last commits on power loss.
+        """
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.read_only = read_only
+        if read_only:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"Database not found: {db_path}")
+            self.conn = sqlite3.connect(f"file:{urllib.parse.quote(db_path)}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
-        self._initialize_db()
+        self.snapshot: Optional[Dict] = None
+        self._configure_connection(synchronous, cache_size, mmap_size)
+        if not read_only:
+            self._initialize_db()
+
+    def _configure_connection(self, synchronous: str, cache_size: int, mmap_size: int):
+        """Apply the storage PRAGMAs."""
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unknown synchronous mode: {synchronous}")
+        cursor = self.conn.cursor()
+        if not self.read_only:
+            # Lets compact_history return freed pages to the filesystem.  Only
+            # takes effect on a new database, so it must precede journal_mode
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # Persistent; read-only connections pick it up from the database file
+            cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute(f"PRAGMA synchronous = {synchronous.upper()}")
+        cursor.execute(f"PRAGMA cache_size = {int(cache_size)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
 
     def _initialize_db(self):
         """Create tables if they don't exist."""
@@ -65,6 +289,35 @@ class DependencyTracker:
             )
         """)
 
+        # Sync state table (one row per ingested snapshot)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fetch_time TIMESTAMP NOT NULL,
+                time_range_start INTEGER,
+                time_range_end INTEGER NOT NULL,
+                incremental BOOLEAN DEFAULT 0,
+                complete BOOLEAN DEFAULT 1,
+                dependencies INTEGER DEFAULT 0
+            )
+        """)
+
+        # History rollups (raw history compacted into daily and weekly buckets)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dependency_history_rollup (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                parent_service TEXT NOT NULL,
+                child_service TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket_start DATE NOT NULL,
+                min_calls INTEGER NOT NULL,
+                max_calls INTEGER NOT NULL,
+                sum_calls INTEGER NOT NULL,
+                observations INTEGER NOT NULL,
+                UNIQUE(parent_service, child_service, granularity, bucket_start)
+            )
+        """)
+
         # Create indexes
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_deps_parent
@@ -78,84 +331,256 @@ class DependencyTracker:
             CREATE INDEX IF NOT EXISTS idx_deps_active
             ON dependencies(active)
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_observed
+            ON dependency_history(observed_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_edge
+            ON dependency_history(parent_service, child_service, observed_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_child
+            ON dependency_history(child_service, observed_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rollup_granularity
+            ON dependency_history_rollup(granularity, bucket_start)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_rollup_child
+            ON dependency_history_rollup(child_service, bucket_start)
+        """)
 
         self.conn.commit()
 
     def update_dependencies(self, dependencies_file: str):
-        """Update the database with dependencies from a JSON file."""
-        with open(dependencies_file, 'r') as f:
-            data = json.load(f)
-
-        fetch_time = datetime.fromisoformat(data['fetch_time'])
-        time_range_start = data.get('start_time')
-        time_range_end = data.get('end_time')
+        """Update the database with dependencies from a JSON or NDJSON file."""
+        metadata, dependencies = read_dependencies_file(dependencies_file)
+        return self.ingest_dependencies(metadata, dependencies)
+
+    def ingest_dependencies(self, metadata: Dict, dependencies: Iterable[Dict]):
+        """Update the database with one snapshot of dependencies and its fetch metadata."""
+        self.begin_snapshot(metadata)
+        self.add_dependencies(dependencies)
+        return self.finish_snapshot()
+
+    def begin_snapshot(self, metadata: Dict):
+        """
+        Start a snapshot of dependencies with the given fetch metadata.  The
+        dependencies can then be added in any number of add_dependencies calls,
+        e.g. page by page as they are fetched, before finish_snapshot.
+
+        An incremental snapshot (metadata['incremental']) only covers the time
+        since the previous sync.  Its edges from windows starting before
+        metadata['counted_from'] overlap the previous sync, so they refresh
+        last_seen without being added to total_calls or history a second time.
+        """
+        time_range_start = metadata.get('start_time')
+        time_range_end = metadata.get('end_time')
 
         if time_range_start:
             time_range_start = datetime.fromtimestamp(time_range_start)
         if time_range_end:
             time_range_end = datetime.fromtimestamp(time_range_end)
 
+        self.snapshot = {
+            'metadata': metadata,
+            'fetch_time': datetime.fromisoformat(metadata['fetch_time']),
+            'time_range_start': time_range_start,
+            'time_range_end': time_range_end,
+            'counted_from': metadata.get('counted_from'),
+            'rows': 0,
+            # Time spent ingesting, which excludes waiting for pages to be fetched
+            'elapsed': 0.0,
+        }
+
+        # Edges are staged as they are added and applied in finish_snapshot
         cursor = self.conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS snapshot_staging (
+                parent_service TEXT NOT NULL,
+                child_service TEXT NOT NULL,
+                window_start INTEGER,
+                call_count INTEGER NOT NULL,
+                counted BOOLEAN NOT NULL
+            )
+        """)
+        cursor.execute("DELETE FROM snapshot_staging")
+        self.conn.commit()
 
-        # Track which dependencies we've seen in this update
-        seen_dependencies = set()
+    def add_dependencies(self, dependencies: Iterable[Dict]):
+        """Stage dependencies for the current snapshot and commit them."""
+        started = time.monotonic()
+        counted_from = self.snapshot['counted_from']
 
-        for dep in data['dependencies']:
-            parent = dep['parent_node']['name']
-            child = dep['child_node']['name']
-            call_count = dep.get('call_count', 0)
+        def staged_rows():
+            for dep in dependencies:
+                window_start = dep.get('window_start')
+                # Calls in the overlap with the previous sync were counted by it
+                overlap = (counted_from is not None and window_start is not None
+                           and window_start < counted_from)
+                yield (dep['parent_node']['name'], dep['child_node']['name'],
+                       window_start, dep.get('call_count', 0), not overlap)
 
-            seen_dependencies.add((parent, child))
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            INSERT INTO snapshot_staging
+            (parent_service, child_service, window_start, call_count, counted)
+            VALUES (?, ?, ?, ?, ?)
+        """, staged_rows())
+        self.snapshot['rows'] += max(cursor.rowcount, 0)
+        self.conn.commit()
+        self.snapshot['elapsed'] += time.monotonic() - started
+
+    def finish_snapshot(self) -> int:
+        """
+        Apply the staged snapshot to services, dependencies and history, mark
+        what it didn't see as inactive, and record the sync in sync_state, all
+        in one transaction.
+
+        Edges staged more than once are merged first: within a time window with
+        the snapshot's merge_rule ('max' by default, since the same edge comes
+        back from every batch it overlaps), and across windows by summing.
+
+        A full snapshot covers the whole graph, so anything it didn't see is
+        inactive.  An incremental snapshot only covers the time since the last
+        sync, so only what hasn't been seen for metadata['inactive_after']
+        seconds is.  A snapshot from an interrupted NDJSON fetch (no summary
+        record) is recorded as incomplete, so incremental fetches don't treat
+        it as the high-water mark.
+
+        Returns the number of distinct dependencies seen in the snapshot.
+        """
+        started = time.monotonic()
+        metadata = self.snapshot['metadata']
+        fetch_time = self.snapshot['fetch_time']
+        time_range_start = self.snapshot['time_range_start']
+        time_range_end = self.snapshot['time_range_end']
+        incremental = bool(metadata.get('incremental'))
+        cutoff = fetch_time
+        if incremental:
+            cutoff = fetch_time - timedelta(seconds=metadata.get('inactive_after', 604800))
+        window_calls = 'SUM(call_count)' if metadata.get('merge_rule') == 'sum' else 'MAX(call_count)'
 
-            # Update or insert services
-            for service in [parent, child]:
-                cursor.execute("""
-                    INSERT INTO services (name, first_seen, last_seen, active)
-                    VALUES (?, ?, ?, 1)
-                    ON CONFLICT(name) DO UPDATE SET
-                        last_seen = ?,
-                        active = 1
-                """, (service, fetch_time, fetch_time, fetch_time))
+        cursor = self.conn.cursor()
 
-            # Update or insert dependency
-            cursor.execute("""
-                INSERT INTO dependencies
-                (parent_service, child_service, first_seen, last_seen, total_calls, active)
-                VALUES (?, ?, ?, ?, ?, 1)
-                ON CONFLICT(parent_service, child_service) DO UPDATE SET
-                    last_seen = ?,
-                    total_calls = total_calls + ?,
-                    active = 1
-            """, (parent, child, fetch_time, fetch_time, call_count,
-                  fetch_time, call_count))
-
-            # Add to history
-            cursor.execute("""
-                INSERT INTO dependency_history
-                (parent_service, child_service, observed_at, call_count,
-                 time_range_start, time_range_end)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (parent, child, fetch_time, call_count,
-                  time_range_start, time_range_end))
+        # One row per edge, with its calls merged across batches and windows
+        cursor.execute("DROP TABLE IF EXISTS snapshot_edges")
+        cursor.execute(f"""
+            CREATE TEMP TABLE snapshot_edges AS
+            SELECT parent_service, child_service,
+                   SUM(CASE WHEN counted THEN calls ELSE 0 END) AS call_count,
+                   MAX(counted) AS counted
+            FROM (
+                SELECT parent_service, child_service, {window_calls} AS calls, counted
+                FROM snapshot_staging
+                GROUP BY parent_service, child_service, window_start, counted
+            )
+            GROUP BY parent_service, child_service
+        """)
+
+        # Update or insert services
+        cursor.execute("""
+            INSERT INTO services (name, first_seen, last_seen, active)
+            SELECT name, ?, ?, 1 FROM (
+                SELECT parent_service AS name FROM snapshot_edges
+                UNION
+                SELECT child_service FROM snapshot_edges
+            ) WHERE true
+            ON CONFLICT(name) DO UPDATE SET
+                last_seen = excluded.last_seen,
+                active = 1
+        """, (fetch_time, fetch_time))
+
+        # Update or insert dependencies
+        cursor.execute("""
+            INSERT INTO dependencies
+            (parent_service, child_service, first_seen, last_seen, total_calls, active)
+            SELECT parent_service, child_service, ?, ?, call_count, 1
+            FROM snapshot_edges WHERE true
+            ON CONFLICT(parent_service, child_service) DO UPDATE SET
+                last_seen = excluded.last_seen,
+                total_calls = total_calls + excluded.total_calls,
+                active = 1
+        """, (fetch_time, fetch_time))
+
+        # Add to history, except edges only seen in the overlap with the last sync
+        cursor.execute("""
+            INSERT INTO dependency_history
+            (parent_service, child_service, observed_at, call_count,
+             time_range_start, time_range_end)
+            SELECT parent_service, child_service, ?, call_count, ?, ?
+            FROM snapshot_edges
+            WHERE counted
+        """, (fetch_time, time_range_start, time_range_end))
 
         # Mark dependencies not seen as inactive
         cursor.execute("""
             UPDATE dependencies
             SET active = 0
             WHERE last_seen < ?
-        """, (fetch_time,))
+        """, (cutoff,))
 
         # Mark services not seen as inactive
         cursor.execute("""
             UPDATE services
             SET active = 0
             WHERE last_seen < ?
-        """, (fetch_time,))
+        """, (cutoff,))
+
+        cursor.execute("SELECT COUNT(*) FROM snapshot_edges")
+        updated = cursor.fetchone()[0]
+
+        summary = metadata.get('summary')
+        complete = (not metadata.get('failed_batches')
+                    and not (metadata.get('record') == 'header' and summary is None)
+                    and not (summary or {}).get('failed_batches'))
+        cursor.execute("""
+            INSERT INTO sync_state
+            (fetch_time, time_range_start, time_range_end, incremental, complete, dependencies)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (fetch_time, metadata.get('start_time'),
+              metadata.get('end_time') or int(fetch_time.timestamp()),
+              incremental, complete, updated))
 
         self.conn.commit()
 
-        print(f"Updated {len(seen_dependencies)} dependencies")
-        return len(seen_dependencies)
+        cursor.execute("DROP TABLE snapshot_edges")
+        cursor.execute("DELETE FROM snapshot_staging")
+        self.conn.commit()
+
+        rows = self.snapshot['rows']
+        elapsed = self.snapshot['elapsed'] + time.monotonic() - started
+        self.snapshot = None
+
+        print(f"Updated {updated} dependencies")
+        print(f"Ingested {rows} rows in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/sec)")
+        return updated
+
+    def get_last_sync(self) -> Optional[Dict]:
+        """Get the most recent complete sync, whose time_range_end is the incremental high-water mark."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT * FROM sync_state
+                WHERE complete = 1
+                ORDER BY time_range_end DESC
+                LIMIT 1
+            """)
+        except sqlite3.OperationalError:
+            # A database from before sync_state, opened read-only so it wasn't migrated
+            return None
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'fetch_time': row['fetch_time'],
+            'time_range_start': row['time_range_start'],
+            'time_range_end': row['time_range_end'],
+            'incremental': bool(row['incremental']),
+            'dependencies': row['dependencies'],
+        }
 
     def get_all_dependencies(self, active_only: bool = True) -> List[Dict]:
         """Get all dependencies from the database."""
@@ -264,6 +689,163 @@ class DependencyTracker:
 
         return removed_deps
 
+    def get_dependency_history(self, service_name: str, child_service: Optional[str] = None,
+                               since: Optional[str] = None, until: Optional[str] = None,
+                               bucket: Optional[str] = None) -> Dict:
+        """
+        Get the call-count time series of the service -> child_service edge,
+        or of every edge into and out of service_name, observed in
+        [since, until).
+
+        Raw points are {'time', 'call_count'}, one per observation.  With
+        bucket ('hour', 'day' or 'week') observations are downsampled into one
+        point per bucket with min_calls, max_calls, sum_calls, observations and
+        their average as call_count.  Periods already compacted by compact_history are read
+        from the rollups, matched by the date their bucket starts; a rollup
+        coarser than the requested bucket is returned as is, with its
+        granularity.
+        """
+        if bucket is not None and bucket not in HISTORY_BUCKETS:
+            raise ValueError(f"Unknown history bucket: {bucket}")
+        cursor = self.conn.cursor()
+
+        # A database from before the rollups, opened read-only so it wasn't
+        # migrated, only has raw history
+        cursor.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'table' AND name = 'dependency_history_rollup'
+        """)
+        has_rollups = cursor.fetchone() is not None
+
+        # Parse the bounds so they compare like the stored timestamps
+        since_time = datetime.fromisoformat(since) if since else None
+        until_time = datetime.fromisoformat(until) if until else None
+
+        if child_service:
+            edges = [("parent_service = ? AND child_service = ?", (service_name, child_service))]
+        else:
+            edges = [("parent_service = ?", (service_name,)),
+                     ("child_service = ? AND parent_service != ?", (service_name, service_name))]
+
+        series = {}
+
+        def add_point(row, point):
+            key = (row['parent_service'], row['child_service'])
+            series.setdefault(key, {}).setdefault(point['time'], []).append(point)
+
+        for edge_filter, edge_params in edges:
+            # Raw history, downsampled in SQL when a bucket is requested
+            conditions, params = [edge_filter], list(edge_params)
+            if since_time:
+                conditions.append("observed_at >= ?")
+                params.append(since_time)
+            if until_time:
+                conditions.append("observed_at < ?")
+                params.append(until_time)
+            where = " AND ".join(conditions)
+
+            if bucket:
+                bucket_start = HISTORY_BUCKETS[bucket].format('observed_at')
+                cursor.execute(f"""
+                    SELECT parent_service, child_service, {bucket_start} AS time,
+                           MIN(call_count) AS min_calls, MAX(call_count) AS max_calls,
+                           SUM(call_count) AS sum_calls, COUNT(*) AS observations
+                    FROM dependency_history
+                    WHERE {where}
+                    GROUP BY parent_service, child_service, time
+                """, params)
+                for row in cursor.fetchall():
+                    add_point(row, {
+                        'time': row['time'],
+                        'min_calls': row['min_calls'],
+                        'max_calls': row['max_calls'],
+                        'sum_calls': row['sum_calls'],
+                        'observations': row['observations']
+                    })
+            else:
+                cursor.execute(f"""
+                    SELECT parent_service, child_service, observed_at, call_count
+                    FROM dependency_history
+                    WHERE {where}
+                """, params)
+                for row in cursor.fetchall():
+                    add_point(row, {'time': row['observed_at'], 'call_count': row['call_count']})
+
+            if not has_rollups:
+                continue
+
+            # Compacted history; daily rollups are regrouped into weekly buckets
+            conditions, params = [edge_filter], list(edge_params)
+            if since_time:
+                conditions.append("bucket_start >= ?")
+                params.append(since_time.date().isoformat())
+            if until_time:
+                conditions.append("bucket_start < ?")
+                params.append(until_time.date().isoformat())
+            where = " AND ".join(conditions)
+
+            if bucket == 'week':
+                granularity = "'week'"
+                rollup_start = f"CASE WHEN granularity = 'day' THEN {HISTORY_BUCKETS['week'].format('bucket_start')} ELSE bucket_start END"
+            else:
+                granularity = "granularity"
+                rollup_start = "bucket_start"
+            cursor.execute(f"""
+                SELECT parent_service, child_service, {granularity} AS granularity,
+                       {rollup_start} AS time,
+                       MIN(min_calls) AS min_calls, MAX(max_calls) AS max_calls,
+                       SUM(sum_calls) AS sum_calls, SUM(observations) AS observations
+                FROM dependency_history_rollup
+                WHERE {where}
+                GROUP BY parent_service, child_service, {granularity}, time
+            """, params)
+            for row in cursor.fetchall():
+                point = {
+                    'time': row['time'],
+                    'min_calls': row['min_calls'],
+                    'max_calls': row['max_calls'],
+                    'sum_calls': row['sum_calls'],
+                    'observations': row['observations']
+                }
+                if row['granularity'] != bucket:
+                    point['granularity'] = row['granularity']
+                add_point(row, point)
+
+        result = []
+        for (parent, child), points in sorted(series.items()):
+            merged = []
+            for time_key in sorted(points):
+                parts = points[time_key]
+                if 'sum_calls' not in parts[0]:
+                    # Raw observations sharing a time, e.g. the same snapshot
+                    # ingested twice, are each a point.  Their times never
+                    # match a rollup's date.
+                    merged.extend(parts)
+                    continue
+                point = dict(parts[0])
+                if len(parts) > 1:
+                    # A bucket split between raw history and its rollup
+                    point['min_calls'] = min(p['min_calls'] for p in parts)
+                    point['max_calls'] = max(p['max_calls'] for p in parts)
+                    point['sum_calls'] = sum(p['sum_calls'] for p in parts)
+                    point['observations'] = sum(p['observations'] for p in parts)
+                point['call_count'] = point['sum_calls'] / point['observations']
+                merged.append(point)
+            result.append({
+                'parent_service': parent,
+                'child_service': child,
+                'points': merged
+            })
+
+        return {
+            'service': service_name,
+            'child_service': child_service,
+            'since': since,
+            'until': until,
+            'bucket': bucket,
+            'series': result
+        }
+
     def export_for_validation(self, output_file: str, format: str = 'json'):
         """Export dependencies in a format suitable for validation against internal systems."""
         dependencies = self.get_all_dependencies(active_only=True)
@@ -334,22 +916,141 @@ class DependencyTracker:
                 'total': row[1] + row[2]
             })
 
+        stats['last_sync'] = self.get_last_sync()
+
         return stats
 
+    def compact_history(self, raw_days: int = 30, daily_days: int = 180,
+                        chunk_size: int = 10) -> Dict:
+        """
+        Apply the history retention policy: raw history older than raw_days is
+        compacted into daily rollups, and daily rollups older than daily_days
+        into weekly rollups (weeks start on Monday).  Each rollup keeps the
+        min, max and sum of call_count and the number of observations per
+        (parent, child) and bucket.
+
+        The work is done in chunks of chunk_size snapshots (or days, for
+        daily rollups), each in its own transaction, so a large backlog never
+        holds a long write lock, and an interrupted run simply carries on where
+        it stopped next time.  Rows are merged into existing buckets, so
+        compacting part of a day or week and the rest later gives the same
+        result.  Compacted rows are deleted rather than the table rewritten;
+        their pages are reused by later updates, and returned to the
+        filesystem on databases created with incremental auto-vacuum.
+
+        Returns the number of raw rows and daily rollups compacted.
+        """
+        if daily_days <= raw_days:
+            raise ValueError("daily_days must be greater than raw_days")
+        now = datetime.now()
+        cursor = self.conn.cursor()
+        compacted = {'raw_rows': 0, 'daily_rollups': 0}
+
+        # Raw history into daily buckets, a few snapshots at a time
+        raw_cutoff = now - timedelta(days=raw_days)
+        while True:
+            cursor.execute("""
+                SELECT MAX(observed_at) FROM (
+                    SELECT DISTINCT observed_at FROM dependency_history
+                    WHERE observed_at < ?
+                    ORDER BY observed_at
+                    LIMIT ?
+                )
+            """, (raw_cutoff, chunk_size))
+            chunk_end = cursor.fetchone()[0]
+            if chunk_end is None:
+                break
+            cursor.execute("""
+                INSERT INTO dependency_history_rollup
+                (parent_service, child_service, granularity, bucket_start,
+                 min_calls, max_calls, sum_calls, observations)
+                SELECT parent_service, child_service, 'day', date(observed_at),
+                       MIN(call_count), MAX(call_count), SUM(call_count), COUNT(*)
+                FROM dependency_history
+                WHERE observed_at <= ?
+                GROUP BY parent_service, child_service, date(observed_at)
+                ON CONFLICT(parent_service, child_service, granularity, bucket_start) DO UPDATE SET
+                    min_calls = MIN(min_calls, excluded.min_calls),
+                    max_calls = MAX(max_calls, excluded.max_calls),
+                    sum_calls = sum_calls + excluded.sum_calls,
+                    observations = observations + excluded.observations
+            """, (chunk_end,))
+            cursor.execute("DELETE FROM dependency_history WHERE observed_at <= ?", (chunk_end,))
+            compacted['raw_rows'] += cursor.rowcount
+            self.conn.commit()
+
+        # Daily rollups into weekly buckets, a few days at a time
+        daily_cutoff = (now - timedelta(days=daily_days)).date()
+        while True:
+            cursor.execute("""
+                SELECT MAX(bucket_start) FROM (
+                    SELECT DISTINCT bucket_start FROM dependency_history_rollup
+                    WHERE granularity = 'day' AND bucket_start < ?
+                    ORDER BY bucket_start
+                    LIMIT ?
+                )
+            """, (daily_cutoff.isoformat(), chunk_size))
+            chunk_end = cursor.fetchone()[0]
+            if chunk_end is None:
+                break
+            cursor.execute("""
+                INSERT INTO dependency_history_rollup
+                (parent_service, child_service, granularity, bucket_start,
+                 min_calls, max_calls, sum_calls, observations)
+                SELECT parent_service, child_service, 'week',
+                       date(bucket_start, 'weekday 0', '-6 days'),
+                       MIN(min_calls), MAX(max_calls), SUM(sum_calls), SUM(observations)
+                FROM dependency_history_rollup
+                WHERE granularity = 'day' AND bucket_start <= ?
+                GROUP BY parent_service, child_service, date(bucket_start, 'weekday 0', '-6 days')
+                ON CONFLICT(parent_service, child_service, granularity, bucket_start) DO UPDATE SET
+                    min_calls = MIN(min_calls, excluded.min_calls),
+                    max_calls = MAX(max_calls, excluded.max_calls),
+                    sum_calls = sum_calls + excluded.sum_calls,
+                    observations = observations + excluded.observations
+            """, (chunk_end,))
+            cursor.execute("""
+                DELETE FROM dependency_history_rollup
+                WHERE granularity = 'day' AND bucket_start <= ?
+            """, (chunk_end,))
+            compacted['daily_rollups'] += cursor.rowcount
+            self.conn.commit()
+
+        # Return freed pages to the filesystem where the database allows it
+        cursor.execute("PRAGMA auto_vacuum")
+        if cursor.fetchone()[0] == 2:
+            # execute() steps the PRAGMA once, freeing a single page
+            self.conn.executescript("PRAGMA incremental_vacuum;")
+
+        print(f"Compacted {compacted['raw_rows']} history rows older than {raw_days} days into daily rollups")
+        print(f"Compacted {compacted['daily_rollups']} daily rollups older than {daily_days} days into weekly rollups")
+        return compacted
+
     def close(self):
         """Close the database connection."""
         self.conn.close()
 
 
+def add_storage_arguments(parser: argparse.ArgumentParser):
+    """Add the SQLite tuning options shared by every command."""
+    parser.add_argument('--synchronous', choices=SYNCHRONOUS_MODES, default='NORMAL', type=str.upper,
+                        help='SQLite synchronous mode for writes (default: NORMAL)')
+    parser.add_argument('--cache-size', type=int, default=-65536,
+                        help='SQLite page cache size, in pages or KiB if negative (default: -65536 = 64 MiB)')
+    parser.add_argument('--mmap-size', type=int, default=268435456,
+                        help='Bytes of the database to memory-map, 0 to disable (default: 268435456 = 256 MiB)')
+
+
 def main():
     parser = argparse.ArgumentParser(description='Track and analyze service dependencies')
 
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
 
     # Update command
-    update_parser = subparsers.add_parser('update', help='Update dependencies from JSON file')
-    update_parser.add_argument('dependencies_file', help='JSON file from dependency_fetcher.py')
+    update_parser = subparsers.add_parser('update', help='Update dependencies from JSON or NDJSON file')
+    update_parser.add_argument('dependencies_file', help='JSON or NDJSON (optionally .gz) file from dependency_fetcher.py')
     update_parser.add_argument('--db', default='dependencies.db', help='Database path')
+    add_storage_arguments(update_parser)
 
     # Export command
     export_parser = subparsers.add_parser('export', help='Export dependencies for validation')
@@ -357,6 +1058,18 @@ def main():
     export_parser.add_argument('--format', choices=['json', 'csv'], default='json',
                               help='Export format')
     export_parser.add_argument('--db', default='dependencies.db', help='Database path')
+    add_storage_arguments(export_parser)
+
+    # Compact command
+    compact_parser = subparsers.add_parser('compact', help='Compact old dependency history into rollups')
+    compact_parser.add_argument('--raw-days', type=int, default=30,
+                                help='Keep raw history for this many days before rolling it up by day (default: 30)')
+    compact_parser.add_argument('--daily-days', type=int, default=180,
+                                help='Keep daily rollups for this many days before rolling them up by week (default: 180)')
+    compact_parser.add_argument('--chunk-size', type=int, default=10,
+                                help='Snapshots (or days) compacted per transaction (default: 10)')
+    compact_parser.add_argument('--db', default='dependencies.db', help='Database path')
+    add_storage_arguments(compact_parser)
 
     # Query command
     query_parser = subparsers.add_parser('query', help='Query dependency information')
@@ -364,25 +1077,62 @@ def main():
     query_parser.add_argument('--new-since', help='Get new dependencies since date (YYYY-MM-DD)')
     query_parser.add_argument('--removed-since', help='Get removed dependencies since date')
     query_parser.add_argument('--stats', action='store_true', help='Show statistics')
+    query_parser.add_argument('--history', action='store_true',
+                              help='Show the call-count history of --service (and --child)')
+    query_parser.add_argument('--child', help='With --history, only the edge from --service to this service')
+    query_parser.add_argument('--since', help='With --history, start of the time range (ISO date or time)')
+    query_parser.add_argument('--until', help='With --history, end of the time range, exclusive')
+    query_parser.add_argument('--bucket', choices=list(HISTORY_BUCKETS),
+                              help='With --history, downsample into one point per bucket')
     query_parser.add_argument('--db', default='dependencies.db', help='Database path')
+    add_storage_arguments(query_parser)
 
     args = parser.parse_args()
 
     if not args.command:
         parser.print_help()
         return
-
-    tracker = DependencyTracker(args.db)
+    if args.command == 'compact' and args.daily_days <= args.raw_days:
+        parser.error('--daily-days must be greater than --raw-days')
+    if args.command == 'query' and args.history:
+        if not args.service:
+            parser.error('--history requires --service')
+        for bound in (args.since, args.until):
+            if bound:
+                try:
+                    datetime.fromisoformat(bound)
+                except ValueError:
+                    parser.error(f'Invalid time: {bound}')
+
+    # Only update and compact write; query and export read the last committed
+    # snapshot without blocking on, or being blocked by, a running update
+    try:
+        tracker = DependencyTracker(args.db,
+                                    read_only=args.command not in ('update', 'compact'),
+                                    synchronous=args.synchronous,
+                                    cache_size=args.cache_size,
+                                    mmap_size=args.mmap_size)
+    except FileNotFoundError as e:
+        print(f"{e}; run 'update' first")
+        return
 
     try:
         if args.command == 'update':
             tracker.update_dependencies(args.dependencies_file)
 
+        elif args.command == 'compact':
+            tracker.compact_history(args.raw_days, args.daily_days, args.chunk_size)
+
         elif args.command == 'export':
             tracker.export_for_validation(args.output_file, args.format)
 
         elif args.command == 'query':
-            if args.service:
+            if args.history:
+                result = tracker.get_dependency_history(args.service, args.child, args.since,
+                                                        args.until, args.bucket)
+                print(json.dumps(result, indent=2))
+
+            elif args.service:
                 result = tracker.get_service_dependencies(args.service)
                 print(json.dumps(result, indent=2))
 
@@ -403,13 +1153,18 @@ def main():
                 print(f"Inactive dependencies: {stats['inactive_dependencies']}")
                 print(f"Active services: {stats['active_services']}")
                 print(f"Inactive services: {stats['inactive_services']}")
+                if stats['last_sync']:
+                    last_sync = stats['last_sync']
+                    print(f"Last sync: {last_sync['fetch_time']} "
+                          f"({'incremental' if last_sync['incremental'] else 'full'}, "
+                          f"up to {datetime.fromtimestamp(last_sync['time_range_end']).isoformat()})")
 
                 print("\nMost connected services:")
                 for svc in stats['most_connected_services']:
                     print(f"  {svc['service']}: {svc['total']} connections "
                           f"({svc['outgoing']} outgoing, {svc['incoming']} incoming)")
             else:
-                print("Please specify a query option (--service, --new-since, --removed-since, or --stats)")
+                print("Please specify a query option (--service, --history, --new-since, --removed-since, or --stats)")
 
     finally:
         tracker.close()
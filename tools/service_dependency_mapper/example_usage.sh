@@ -49,6 +49,12 @@ echo
 echo "6. Updating database with filtered results..."
 python3 dependency_tracker.py update filtered_dependencies.json
 
+echo
+echo "7. Fetching straight into the database, without an intermediate file..."
+python3 dependency_fetcher.py \
+    --api-key "$HONEYCOMB_API_KEY" \
+    --db dependencies.db
+
 echo
 echo "=== Example complete! ==="
 echo
@@ -0,0 +1,57 @@
+"""
+Shared helpers for the tests: the local Honeycomb API stand-in
+(tools/hny_api_standin), temporary directories and dependency edges.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+from dependency_fetcher import HoneycombDependencyFetcher, PollScheduler
+from dependency_tracker import DependencyTracker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'hny_api_standin'))
+from standin_harness import Standin  # noqa: E402,F401
+
+
+class StandinTestCase(unittest.TestCase):
+    """Runs each test against a fresh API stand-in, with a fetcher pointed at it."""
+
+    standin_args = ()
+
+    def setUp(self):
+        super().setUp()
+        self.standin = Standin(*self.standin_args)
+        self.standin.__enter__()
+        self.addCleanup(self.standin.__exit__, None, None, None)
+        # Poll ready requests straight away
+        self.fetcher = HoneycombDependencyFetcher('key', self.standin.url, PollScheduler(min_interval=0.01))
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Gives each test a temporary directory for its output files and databases."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def tracker(self, name='dependencies.db'):
+        tracker = DependencyTracker(self.path(name))
+        self.addCleanup(tracker.close)
+        return tracker
+
+
+def services(count):
+    """Names of the stand-in's first count dependency graph services."""
+    return [f"service-{i:04d}" for i in range(count)]
+
+
+def edge(parent, child, call_count, **fields):
+    """A dependency edge as returned by the API, with any extra fields."""
+    return dict(fields, parent_node={'name': parent, 'type': 'service'},
+                child_node={'name': child, 'type': 'service'}, call_count=call_count)
@@ -0,0 +1,249 @@
+import threading
+import time
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dependency_fetcher import (EdgeIndex, HTTPTransport, HoneycombDependencyFetcher, PollScheduler, batch_services,
+                                collect_batch_stats, fetch_batches, plan_batches, resolve_time_bounds, time_windows)
+
+from helpers import Standin, StandinTestCase, edge, services
+
+
+def sorted_edges(dependencies):
+    index = EdgeIndex('max')
+    index.add(dependencies)
+    return index.dependencies()
+
+
+class EdgeIndexTest(unittest.TestCase):
+    def test_duplicates_merge_with_the_rule(self):
+        pages = [[edge('b', 'c', 2), edge('a', 'b', 3)], [edge('a', 'b', 5)]]
+        merged = {}
+        for rule in ('max', 'sum'):
+            index = EdgeIndex(rule)
+            for page in pages:
+                index.add(page)
+            merged[rule] = [(dep['parent_node']['name'], dep['call_count']) for dep in index.dependencies()]
+
+        self.assertEqual(merged, {'max': [('a', 5), ('b', 2)], 'sum': [('a', 8), ('b', 2)]})
+        with self.assertRaises(ValueError):
+            EdgeIndex('min')
+
+    def test_windows_are_summed_and_the_overlap_is_not_counted(self):
+        index = EdgeIndex('max', counted_from=200)
+
+        index.add([edge('a', 'b', 3, window_start=100), edge('a', 'b', 4, window_start=200),
+                   edge('a', 'b', 6, window_start=300), edge('a', 'b', 5, window_start=300),
+                   edge('c', 'd', 7, window_start=100)])
+
+        self.assertEqual(index.dependencies(), [edge('a', 'b', 10), edge('c', 'd', 0, window_start=100)])
+        self.assertEqual(index.duplicates, 1)
+
+    def test_concurrent_adds(self):
+        index = EdgeIndex('sum')
+        threads = [threading.Thread(target=lambda: [index.add([edge('a', 'b', 1)]) for _ in range(1000)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(index.dependencies(), [edge('a', 'b', 4000)])
+
+
+class ConcurrentFetchTest(StandinTestCase):
+    standin_args = ('--dependency-services', '40', '--dependency-edges', '200')
+
+    def test_concurrent_batches_match_one_unfiltered_request(self):
+        batches = batch_services(services(40), 10)
+        index = EdgeIndex('max')
+
+        results = fetch_batches(self.fetcher, batches, None, None, 7200, 10000,
+                                concurrency=4, on_page=index.add)
+
+        unfiltered = self.fetcher.fetch_all_dependencies(self.fetcher.create_dependency_request(time_range=7200))
+        self.assertEqual([result['batch'] for result in results], batches)
+        self.assertTrue(all(result['error'] is None for result in results))
+        self.assertEqual(index.dependencies(), sorted_edges(unfiltered))
+        self.assertGreater(index.duplicates, 0)
+        self.assertEqual(self.standin.count('POST'), len(batches) + 1)
+
+
+class AdaptiveFetchTest(StandinTestCase):
+    standin_args = ('--dependency-services', '40', '--dependency-edges', '200')
+
+    def test_truncated_batches_are_split_until_complete(self):
+        index = EdgeIndex('max')
+        pages = []
+
+        def on_page(page):
+            pages.append(len(page))
+            index.add(page)
+
+        results = fetch_batches(self.fetcher, [services(40)], None, None, 7200, 60,
+                                on_page=on_page, adaptive=True)
+
+        unfiltered = self.fetcher.fetch_all_dependencies(self.fetcher.create_dependency_request(time_range=7200))
+        self.assertFalse(results[0]['truncated'])
+        self.assertGreater(results[0]['requests'], 1)
+        self.assertEqual(results[0]['requests'], self.standin.count('POST') - 1)
+        self.assertEqual(index.dependencies(), sorted_edges(unfiltered))
+        self.assertTrue(all(size < 60 * 0.9 for size in pages))
+        self.assertEqual(sorted(results[0]['service_edges']), services(40))
+
+
+class PlanBatchesTest(unittest.TestCase):
+    def test_remembered_services_are_coalesced(self):
+        edge_counts = {'a': 300, 'b': 150, 'c': 100, 'd': 400}
+
+        batches = plan_batches(['a', 'b', 'c', 'd', 'new1', 'new2', 'new3'], 2, edge_counts, 1000, max_batch_size=2)
+
+        self.assertEqual(batches, [['a', 'b'], ['c', 'd'], ['new1', 'new2'], ['new3']])
+
+    def test_batch_stats_skip_failed_and_truncated_batches(self):
+        results = [
+            {'error': None, 'truncated': False, 'service_edges': {'a': 3, 'b': 1}},
+            {'error': None, 'truncated': False, 'service_edges': {'a': 5}},
+            {'error': None, 'truncated': True, 'service_edges': {'c': 9}},
+            {'error': 'failed', 'truncated': False, 'service_edges': {'d': 0}},
+        ]
+
+        self.assertEqual(collect_batch_stats(results), {'a': 5, 'b': 1})
+
+
+class TimeWindowTest(unittest.TestCase):
+    def test_windows_cover_the_range(self):
+        self.assertEqual(time_windows(0, 10, 4), [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(time_windows(5, 5, 4), [])
+        self.assertEqual(resolve_time_bounds(100, None, 50), (100, 150))
+        self.assertEqual(resolve_time_bounds(None, 100, 50), (50, 100))
+
+
+class ShardedFetchTest(StandinTestCase):
+    def test_sharded_call_counts_sum_to_the_unsharded_ones(self):
+        start, end = 1790000000, 1790000000 + 4 * 3600
+        index = EdgeIndex('max')
+
+        results = fetch_batches(self.fetcher, [None], start, end, 7200, 10000, concurrency=4,
+                                on_page=index.add, windows=time_windows(start, end, 3600))
+
+        unsharded = self.fetcher.fetch_all_dependencies(self.fetcher.create_dependency_request(start, end))
+        self.assertEqual([(result['start_time'], result['end_time']) for result in results],
+                         time_windows(start, end, 3600))
+        self.assertEqual(index.dependencies(), sorted_edges(unsharded))
+        self.assertEqual(len(index), 4 * len(unsharded))
+
+
+class PollSchedulerTest(unittest.TestCase):
+    def test_polls_back_off_then_aim_at_the_typical_readiness(self):
+        scheduler = PollScheduler(min_interval=0.5, backoff=2, jitter=0)
+
+        scheduler.register('a')
+        first = scheduler.next_poll('a') - time.monotonic()
+        scheduler.not_ready('a')
+        second = scheduler.next_poll('a') - time.monotonic()
+        scheduler.pending['a']['created'] -= 10
+        scheduler.ready('a')
+        scheduler.register('b')
+
+        self.assertAlmostEqual(first, 0.5, delta=0.05)
+        self.assertAlmostEqual(second, 1.0, delta=0.05)
+        self.assertAlmostEqual(scheduler.next_poll('b') - time.monotonic(), 8, delta=0.1)
+        self.assertEqual(scheduler.stats()['polls'], 2)
+        self.assertEqual(scheduler.stats()['completed'], 1)
+
+
+class WaitForResultsTest(unittest.TestCase):
+    def test_pending_requests_are_polled_until_ready(self):
+        scheduler = PollScheduler(min_interval=0.05, jitter=0)
+
+        with Standin('--dependency-ready-after', '0.3') as standin:
+            fetcher = HoneycombDependencyFetcher('key', standin.url, scheduler)
+            result = fetcher.wait_for_results(fetcher.create_dependency_request())
+            polls = standin.count('GET')
+
+        self.assertEqual(result['status'], 'ready')
+        self.assertGreater(polls, 1)
+        self.assertEqual(scheduler.stats()['polls'], polls)
+        self.assertGreaterEqual(scheduler.typical_readiness(), 0.3)
+        self.assertEqual(scheduler.pending, {})
+
+    def test_timeout_stops_tracking_the_request(self):
+        scheduler = PollScheduler(min_interval=0.05)
+
+        with Standin('--dependency-ready-after', '60') as standin:
+            fetcher = HoneycombDependencyFetcher('key', standin.url, scheduler)
+            with self.assertRaises(TimeoutError):
+                fetcher.wait_for_results(fetcher.create_dependency_request(), max_wait=0.5)
+
+        self.assertEqual(scheduler.pending, {})
+        self.assertEqual(scheduler.stats()['completed'], 0)
+
+
+class TransportTest(StandinTestCase):
+    def test_requests_share_a_compressed_keep_alive_connection(self):
+        dependencies = self.fetcher.fetch_all_dependencies(self.fetcher.create_dependency_request())
+        self.fetcher.fetch_all_dependencies(self.fetcher.create_dependency_request())
+
+        stats = self.fetcher.transport.stats()
+        self.assertEqual(len(dependencies), 500)
+        self.assertEqual(stats['requests'], self.standin.count())
+        self.assertEqual(stats['connections'], 1)
+        self.assertLess(stats['bytes_on_wire'], stats['bytes_decoded'] / 4)
+
+    def test_each_thread_gets_its_own_connection(self):
+        transport = HTTPTransport()
+        fetcher = HoneycombDependencyFetcher('key', self.standin.url, transport=transport)
+
+        fetch_batches(fetcher, [[service] for service in services(4)], None, None, 7200, 10000, concurrency=2)
+
+        self.assertEqual(transport.stats()['connections'], 2)
+
+    def test_error_responses_raise_http_errors(self):
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            self.fetcher.get_dependencies('missing')
+
+        self.assertEqual(raised.exception.code, 404)
+        self.assertEqual(self.fetcher.transport.stats()['requests'], 1)
+
+
+class SlowFirstResponseHandler(BaseHTTPRequestHandler):
+    """Keep-alive handler that answers the server's first request late."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if not self.server.answered_late:
+            self.server.answered_late = True
+            time.sleep(0.5)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class TransportFailureTest(unittest.TestCase):
+    def test_a_timed_out_connection_is_not_reused(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowFirstResponseHandler)
+        server.daemon_threads = True
+        server.answered_late = False
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/1/auth"
+        transport = HTTPTransport(timeout=0.2)
+
+        with self.assertRaises(TimeoutError):
+            transport.request('GET', url)
+        responses = [transport.request('GET', url) for _ in range(2)]
+
+        self.assertEqual(responses, [b'{}', b'{}'])
+        self.assertEqual(transport.stats()['connections'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
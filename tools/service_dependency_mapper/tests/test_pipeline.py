@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from dependency_fetcher import incremental_time_range, main
+from dependency_tracker import DependencyTracker
+
+from helpers import StandinTestCase, TempDirTestCase, edge
+
+
+class PipelineTestCase(StandinTestCase, TempDirTestCase):
+    """Runs dependency_fetcher.py end to end against the stand-in, with temporary output files."""
+
+    def run_fetcher(self, *args):
+        argv = ['dependency_fetcher.py', '--api-key', 'key', '--api-url', self.standin.url] + list(args)
+        with mock.patch.object(sys, 'argv', argv), contextlib.redirect_stdout(io.StringIO()):
+            main()
+
+    def record_sync(self, name, end_time, dependencies):
+        """Record a complete earlier sync ending at end_time"""
+        tracker = DependencyTracker(self.path(name))
+        tracker.ingest_dependencies({
+            'fetch_time': datetime.fromtimestamp(end_time).isoformat(),
+            'time_range': 7200,
+            'start_time': end_time - 7200,
+            'end_time': end_time,
+        }, dependencies)
+        tracker.close()
+
+
+class IncrementalFetchTest(PipelineTestCase):
+    def test_no_overlap_still_counts_from_the_last_sync(self):
+        high_water_mark = int(time.time()) - 7200
+        self.record_sync('dependencies.db', high_water_mark, [edge('old-a', 'old-b', 5)])
+
+        self.assertEqual(incremental_time_range(self.path('dependencies.db'), 86400, 0)[::2],
+                         (high_water_mark, high_water_mark))
+
+    def test_a_missing_tracker_database_is_not_created(self):
+        end_time = int(time.time())
+        start_time, _, counted_from = incremental_time_range(self.path('missing.db'), 86400, 3600)
+
+        self.assertAlmostEqual(start_time, end_time - 86400, delta=5)
+        self.assertIsNone(counted_from)
+        self.assertFalse(os.path.exists(self.path('missing.db')))
+
+        cwd = os.getcwd()
+        os.chdir(self.dir)
+        self.addCleanup(os.chdir, cwd)
+        self.run_fetcher('--incremental', '--output', 'out.json')
+        self.assertEqual(os.listdir(self.dir), ['out.json'])
+
+    def test_no_overlap_is_recorded_as_an_incremental_sync(self):
+        high_water_mark = int(time.time()) - 7200
+        self.record_sync('dependencies.db', high_water_mark, [edge('old-a', 'old-b', 5)])
+
+        self.run_fetcher('--db', self.path('dependencies.db'), '--incremental', '--overlap', '0',
+                         '--time-range', '86400')
+
+        tracker = self.tracker()
+        last_sync = tracker.get_last_sync()
+        active = {(dep['parent_service'], dep['child_service']) for dep in tracker.get_all_dependencies()}
+        self.assertTrue(last_sync['incremental'])
+        self.assertEqual(last_sync['time_range_start'], high_water_mark)
+        self.assertIn(('old-a', 'old-b'), active)
+        self.assertEqual(len(active), 501)
+
+    def test_no_overlap_to_a_file(self):
+        high_water_mark = int(time.time()) - 7200
+        self.record_sync('tracker.db', high_water_mark, [])
+
+        self.run_fetcher('--output', self.path('dependencies.json'), '--tracker-db', self.path('tracker.db'),
+                         '--incremental', '--overlap', '0', '--time-range', '86400')
+
+        tracker = self.tracker('tracker.db')
+        tracker.update_dependencies(self.path('dependencies.json'))
+        self.assertTrue(tracker.get_last_sync()['incremental'])
+        self.assertEqual(len(tracker.get_all_dependencies()), 500)
+
+
+class DatabaseOutputTest(PipelineTestCase):
+    standin_args = ('--dependency-services', '40', '--dependency-edges', '200')
+
+    def total_calls(self, name):
+        return {(dep['parent_service'], dep['child_service']): dep['total_calls']
+                for dep in self.tracker(name).get_all_dependencies()}
+
+    def test_db_matches_a_file_update_for_each_merge_rule(self):
+        with open(self.path('services.txt'), 'w') as f:
+            f.write('\n'.join(f"service-{i:04d}" for i in range(40)))
+        fetch_args = ['--services-file', self.path('services.txt'), '--batch-size', '10', '--concurrency', '4',
+                      '--start-date', '2026-09-01', '--end-date', '2026-09-02']
+
+        calls = {}
+        for rule in ('max', 'sum'):
+            self.run_fetcher(*fetch_args, '--merge-rule', rule, '--db', self.path(f'{rule}-db.db'))
+            self.run_fetcher(*fetch_args, '--merge-rule', rule, '--output', self.path(f'{rule}.json'))
+            tracker = self.tracker(f'{rule}-file.db')
+            tracker.update_dependencies(self.path(f'{rule}.json'))
+
+            calls[rule] = self.total_calls(f'{rule}-db.db')
+            self.assertEqual(calls[rule], self.total_calls(f'{rule}-file.db'))
+
+        self.assertEqual(calls['max'].keys(), calls['sum'].keys())
+        self.assertGreater(sum(calls['sum'].values()), sum(calls['max'].values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
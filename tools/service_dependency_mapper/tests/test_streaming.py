@@ -0,0 +1,174 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from dependency_fetcher import (CheckpointJournal, DatabaseWriter, NDJSONWriter, WrittenEdges, batch_services,
+                                fetch_batch, fetch_batches, main)
+
+from helpers import StandinTestCase, TempDirTestCase, edge, services
+
+
+def metadata(**fields):
+    return dict({'fetch_time': '2026-10-01T12:00:00', 'time_range': 7200,
+                 'start_time': None, 'end_time': None, 'windows': None}, **fields)
+
+
+class OutputTestCase(TempDirTestCase):
+    def total_calls(self, filename):
+        """Edges and their total calls after loading filename into a new database"""
+        tracker = self.tracker(filename + '.db')
+        tracker.update_dependencies(self.path(filename))
+        return {(dep['parent_service'], dep['child_service']): dep['total_calls']
+                for dep in tracker.get_all_dependencies()}
+
+
+class NDJSONWriterTest(OutputTestCase):
+    def test_gzipped_output_reads_back_into_the_tracker(self):
+        writer = NDJSONWriter(self.path('deps.ndjson.gz'), metadata())
+        writer.write_dependencies([edge('a', 'b', 5), edge('b', 'c', 2)])
+        writer.write_dependencies([edge('a', 'b', 3)])
+        writer.close({'failed_batches': 0})
+
+        with gzip.open(self.path('deps.ndjson.gz'), 'rt') as f:
+            records = [json.loads(line) for line in f]
+        tracker = self.tracker()
+        updated = tracker.update_dependencies(self.path('deps.ndjson.gz'))
+
+        self.assertEqual(records[0]['record'], 'header')
+        self.assertEqual(records[0]['merge_rule'], 'max')
+        self.assertEqual(records[-1]['record'], 'summary')
+        self.assertEqual(records[-1]['total_dependencies'], 2)
+        self.assertEqual(records[-1]['duplicates_skipped'], 1)
+        self.assertEqual(updated, 2)
+        self.assertEqual({(dep['parent_service'], dep['total_calls']) for dep in tracker.get_all_dependencies()},
+                         {('a', 5), ('b', 2)})
+        self.assertIsNotNone(tracker.get_last_sync())
+
+    def test_interrupted_output_is_recorded_as_incomplete(self):
+        writer = NDJSONWriter(self.path('deps.ndjson'), metadata(end_time=1790000000))
+        writer.write_dependencies([edge('a', 'b', 5)])
+        # Killed before close() wrote the summary record
+        writer.file.close()
+
+        tracker = self.tracker()
+        tracker.update_dependencies(self.path('deps.ndjson'))
+
+        self.assertEqual(len(tracker.get_all_dependencies()), 1)
+        self.assertIsNone(tracker.get_last_sync())
+        self.assertEqual(tracker.conn.execute("SELECT complete FROM sync_state").fetchone()[0], 0)
+
+    def test_larger_count_arriving_second_is_written_and_merged_by_the_reader(self):
+        written = WrittenEdges('max')
+        self.assertFalse(written.is_duplicate(edge('a', 'b', 3)))
+        self.assertFalse(written.is_duplicate(edge('a', 'b', 5)))
+        self.assertTrue(written.is_duplicate(edge('a', 'b', 4)))
+
+        writer = NDJSONWriter(self.path('deps.ndjson'), metadata())
+        writer.write_dependencies([edge('a', 'b', 3)])
+        writer.write_dependencies([edge('a', 'b', 5), edge('a', 'b', 4)])
+        writer.close()
+
+        self.assertEqual(writer.total_dependencies, 2)
+        self.assertEqual(writer.duplicates, 1)
+        self.assertEqual(self.total_calls('deps.ndjson'), {('a', 'b'): 5})
+
+
+class DatabaseWriterTest(OutputTestCase):
+    def test_repeated_edges_are_merged_by_the_tracker(self):
+        writer = DatabaseWriter(self.path('dependencies.db'), metadata(), queue_size=2)
+        for page in ([edge('a', 'b', 3), edge('b', 'c', 2)], [edge('a', 'b', 5)], [edge('a', 'b', 4)], []):
+            writer.write_dependencies(page)
+        updated = writer.close({'failed_batches': 0})
+
+        tracker = self.tracker()
+        self.assertEqual(updated, 2)
+        self.assertEqual(writer.total_dependencies, 4)
+        self.assertEqual(writer.services, {'a', 'b', 'c'})
+        self.assertEqual({(dep['parent_service'], dep['total_calls']) for dep in tracker.get_all_dependencies()},
+                         {('a', 5), ('b', 2)})
+
+    def test_checkpoint_is_rejected_with_db(self):
+        stderr = io.StringIO()
+        argv = ['dependency_fetcher.py', '--api-key', 'key', '--db', self.path('dependencies.db'),
+                '--format', 'ndjson', '--checkpoint', self.path('fetch.checkpoint')]
+
+        with mock.patch.object(sys, 'argv', argv), contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit):
+                main()
+
+        self.assertIn('--checkpoint is not supported with --db', stderr.getvalue())
+        self.assertFalse(os.path.exists(self.path('dependencies.db')))
+
+
+class ResumeTest(StandinTestCase, OutputTestCase):
+    standin_args = ('--dependency-services', '40', '--dependency-edges', '200', '--page-size', '10')
+
+    def fetch(self, on_page, checkpoint=None):
+        return fetch_batches(self.fetcher, batch_services(services(40), 10), 1790000000, 1790007200, 7200, 10000,
+                             concurrency=2, on_page=on_page, checkpoint=checkpoint)
+
+    def test_resumed_run_matches_an_uninterrupted_one(self):
+        full = NDJSONWriter(self.path('full.ndjson'), metadata())
+        self.fetch(full.write_dependencies)
+        full.close()
+
+        writer = NDJSONWriter(self.path('resumed.ndjson'), metadata())
+        lock = threading.Lock()
+        pages = []
+
+        def interrupted(page):
+            # The third page fails before it is written, stopping its batch part way through
+            with lock:
+                pages.append(page)
+                if len(pages) == 3:
+                    raise ConnectionResetError("connection lost")
+            writer.write_dependencies(page)
+
+        checkpoint = CheckpointJournal(self.path('fetch.checkpoint'))
+        results = self.fetch(interrupted, checkpoint)
+        writer.file.close()
+        checkpoint.close()
+
+        checkpoint = CheckpointJournal(self.path('fetch.checkpoint'), resume=True)
+        writer = NDJSONWriter(self.path('resumed.ndjson'), metadata(), resume=True)
+        resumed = self.fetch(writer.write_dependencies, checkpoint)
+        writer.close()
+        checkpoint.close()
+
+        self.assertEqual(sum(1 for result in results if result['error']), 1)
+        self.assertTrue(all(result['error'] is None for result in resumed))
+        self.assertEqual(self.total_calls('resumed.ndjson'), self.total_calls('full.ndjson'))
+
+    def test_a_request_that_expires_again_keeps_the_earlier_skip(self):
+        batch = services(10)
+        full = []
+        fetch_batch(self.fetcher, 1, 1, batch, 1790000000, 1790007200, 7200, 10000, on_page=full.extend)
+        # A first request wrote 25 edges and expired.  Its replacement had fetched
+        # 10 of them again when the run stopped, and has expired too.
+        key = CheckpointJournal.batch_key(batch, 1790000000, 1790007200, 7200, 10000)
+        checkpoint = CheckpointJournal(self.path('fetch.checkpoint'))
+        checkpoint.record('created', key=key, request_id='expired', cursor=None, edges_written=0, skip=25,
+                          batch=batch, start_time=1790000000, end_time=1790007200)
+        checkpoint.record('page', key=key, cursor='10', edges_written=10, service_edges={})
+        checkpoint.close()
+
+        checkpoint = CheckpointJournal(self.path('fetch.checkpoint'), resume=True)
+        self.addCleanup(checkpoint.close)
+        resumed = []
+        result = fetch_batch(self.fetcher, 1, 1, batch, 1790000000, 1790007200, 7200, 10000,
+                             on_page=resumed.extend, checkpoint=checkpoint)
+
+        self.assertIsNone(result['error'])
+        self.assertGreater(len(full), 25)
+        self.assertEqual(resumed, full[25:])
+        self.assertEqual(result['fetched'], len(full))
+
+
+if __name__ == '__main__':
+    unittest.main()
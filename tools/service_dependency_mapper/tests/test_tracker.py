@@ -0,0 +1,214 @@
+import io
+import json
+import os
+import sqlite3
+import unittest
+from datetime import datetime, timedelta
+
+from dependency_tracker import DependencyTracker, StreamingJSONReader, read_dependencies_file
+
+from helpers import TempDirTestCase, edge
+
+
+DOCUMENT = {
+    'fetch_time': '2026-10-01T12:00:00',
+    'time_range': 7200,
+    'start_time': 1790000000,
+    'end_time': 1790007200,
+    'windows': [[1790000000, 1790003600], [1790003600, 1790007200]],
+    'dependencies': [edge(f"service-{i}", f"service-{i + 1}", 10 ** i) for i in range(12)],
+    'failed_batches': 0,
+    'total_dependencies': 12,
+}
+
+
+class StreamingJSONReaderTest(TempDirTestCase):
+    def test_tiny_chunks_read_like_json_load(self):
+        for indent in (None, 2):
+            text = json.dumps(DOCUMENT, indent=indent)
+            for chunk_size in (1, 2, 3, 7):
+                reader = StreamingJSONReader(io.StringIO(text), chunk_size)
+
+                metadata = reader.read_metadata()
+                dependencies = list(reader.iter_dependencies(metadata))
+
+                self.assertEqual(dependencies, DOCUMENT['dependencies'])
+                self.assertEqual(dict(metadata, dependencies=dependencies), DOCUMENT)
+
+    def test_empty_array_and_malformed_input(self):
+        reader = StreamingJSONReader(io.StringIO('{"fetch_time": "x", "dependencies": [], "total": 0}'), 4)
+        metadata = reader.read_metadata()
+        self.assertEqual(list(reader.iter_dependencies(metadata)), [])
+        self.assertEqual(metadata, {'fetch_time': 'x', 'total': 0})
+
+        reader = StreamingJSONReader(io.StringIO('{"fetch_time": "x", "dependencies": [{"a": 1} {"a": 2}]}'), 4)
+        metadata = reader.read_metadata()
+        with self.assertRaises(ValueError):
+            list(reader.iter_dependencies(metadata))
+
+    def test_metadata_after_the_array_falls_back_to_a_whole_read(self):
+        document = {'dependencies': DOCUMENT['dependencies'], 'fetch_time': DOCUMENT['fetch_time']}
+        with open(self.path('dependencies.json'), 'w') as f:
+            json.dump(document, f)
+
+        metadata, dependencies = read_dependencies_file(self.path('dependencies.json'))
+
+        self.assertEqual(metadata['fetch_time'], DOCUMENT['fetch_time'])
+        self.assertEqual(list(dependencies), DOCUMENT['dependencies'])
+
+    def test_update_from_a_json_file(self):
+        with open(self.path('dependencies.json'), 'w') as f:
+            json.dump(DOCUMENT, f, indent=2)
+        tracker = self.tracker()
+
+        self.assertEqual(tracker.update_dependencies(self.path('dependencies.json')), 12)
+        self.assertEqual(tracker.get_service_dependencies('service-11')['outgoing_dependencies'][0]['total_calls'],
+                         10 ** 11)
+        self.assertEqual(tracker.get_last_sync()['time_range_end'], DOCUMENT['end_time'])
+
+
+class ConcurrentReadTest(TempDirTestCase):
+    def ingest(self, tracker, fetch_time, dependencies):
+        tracker.ingest_dependencies({'fetch_time': fetch_time, 'start_time': None, 'end_time': None}, dependencies)
+
+    def test_reads_see_the_last_commit_while_a_write_is_open(self):
+        writer = self.tracker()
+        self.ingest(writer, '2026-10-01T12:00:00', [edge('a', 'b', 1)])
+
+        writer.conn.execute("BEGIN IMMEDIATE")
+        writer.conn.execute("UPDATE dependencies SET total_calls = 99")
+        reader = DependencyTracker(self.path('dependencies.db'), read_only=True)
+        self.addCleanup(reader.close)
+
+        self.assertEqual([dep['total_calls'] for dep in reader.get_all_dependencies()], [1])
+        writer.conn.commit()
+        self.assertEqual([dep['total_calls'] for dep in reader.get_all_dependencies()], [99])
+        self.assertEqual(reader.conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.conn.execute("DELETE FROM dependencies")
+
+    def test_read_only_needs_an_existing_database(self):
+        with self.assertRaises(FileNotFoundError):
+            DependencyTracker(self.path('missing.db'), read_only=True)
+        self.assertFalse(os.path.exists(self.path('missing.db')))
+
+    def test_storage_settings(self):
+        with self.assertRaises(ValueError):
+            DependencyTracker(self.path('dependencies.db'), synchronous='SOMETIMES')
+
+        tracker = DependencyTracker(self.path('dependencies.db'), synchronous='full', cache_size=-1024, mmap_size=0)
+        self.addCleanup(tracker.close)
+        self.assertEqual(tracker.conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+        self.assertEqual(tracker.conn.execute("PRAGMA cache_size").fetchone()[0], -1024)
+
+
+class CompactHistoryTest(TempDirTestCase):
+    def tracker_with_history(self, name):
+        """A tracker with hourly snapshots of a -> b on three old days and one recent one"""
+        tracker = self.tracker(name)
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        for days_ago in (200, 199, 40, 1):
+            for hour in range(3):
+                fetch_time = now - timedelta(days=days_ago) + timedelta(hours=hour)
+                tracker.ingest_dependencies({'fetch_time': fetch_time.isoformat(), 'start_time': None, 'end_time': None},
+                                            [edge('a', 'b', days_ago + hour)])
+        return tracker
+
+    def rollups(self, tracker):
+        return tracker.conn.execute("""
+            SELECT granularity, bucket_start, min_calls, max_calls, sum_calls, observations
+            FROM dependency_history_rollup ORDER BY granularity, bucket_start
+        """).fetchall()
+
+    def test_compaction_keeps_the_totals_and_is_idempotent(self):
+        tracker = self.tracker_with_history('dependencies.db')
+        total = tracker.conn.execute("SELECT SUM(call_count) FROM dependency_history").fetchone()[0]
+
+        compacted = tracker.compact_history(raw_days=30, daily_days=180, chunk_size=1)
+        again = tracker.compact_history(raw_days=30, daily_days=180)
+
+        rollups = self.rollups(tracker)
+        raw = tracker.conn.execute("SELECT SUM(call_count), COUNT(*) FROM dependency_history").fetchone()
+        self.assertEqual(compacted, {'raw_rows': 9, 'daily_rollups': 2})
+        self.assertEqual(again, {'raw_rows': 0, 'daily_rollups': 0})
+        self.assertEqual(tuple(raw), (1 + 2 + 3, 3))
+        self.assertEqual(sum(row['sum_calls'] for row in rollups) + raw[0], total)
+        self.assertEqual(sum(row['observations'] for row in rollups), 9)
+        self.assertEqual({row['granularity'] for row in rollups}, {'day', 'week'})
+        self.assertEqual(tracker.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+    def test_chunk_size_does_not_change_the_result(self):
+        chunked = self.tracker_with_history('chunked.db')
+        whole = self.tracker_with_history('whole.db')
+
+        chunked.compact_history(raw_days=30, daily_days=180, chunk_size=1)
+        whole.compact_history(raw_days=30, daily_days=180, chunk_size=100)
+
+        self.assertEqual([tuple(row) for row in self.rollups(chunked)], [tuple(row) for row in self.rollups(whole)])
+
+    def test_daily_retention_must_outlast_raw_retention(self):
+        tracker = self.tracker()
+
+        with self.assertRaises(ValueError):
+            tracker.compact_history(raw_days=30, daily_days=30)
+
+
+class DependencyHistoryTest(TempDirTestCase):
+    def ingest(self, tracker, fetch_time, call_count):
+        tracker.ingest_dependencies({'fetch_time': fetch_time.isoformat(), 'start_time': None, 'end_time': None},
+                                    [edge('a', 'b', call_count), edge('c', 'a', 1)])
+
+    def test_raw_and_compacted_history_are_bucketed_together(self):
+        tracker = self.tracker()
+        day = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=40)
+        for hour, call_count in enumerate((2, 4, 9)):
+            self.ingest(tracker, day + timedelta(hours=hour), call_count)
+        tracker.compact_history(raw_days=30, daily_days=180)
+        self.ingest(tracker, day + timedelta(hours=3), 5)
+
+        history = tracker.get_dependency_history('a', 'b', bucket='day')
+        edges = tracker.get_dependency_history('a')['series']
+
+        self.assertEqual(history['series'][0]['points'], [{
+            'time': day.date().isoformat(), 'min_calls': 2, 'max_calls': 9, 'sum_calls': 20,
+            'observations': 4, 'call_count': 5.0,
+        }])
+        self.assertEqual([(series['parent_service'], series['child_service']) for series in edges],
+                         [('a', 'b'), ('c', 'a')])
+        with self.assertRaises(ValueError):
+            tracker.get_dependency_history('a', bucket='month')
+
+    def test_a_snapshot_ingested_twice_keeps_both_observations(self):
+        tracker = self.tracker()
+        fetch_time = datetime.now().replace(minute=30, second=0, microsecond=0) - timedelta(hours=1)
+        self.ingest(tracker, fetch_time, 3)
+        self.ingest(tracker, fetch_time, 3)
+
+        raw = tracker.get_dependency_history('a', 'b')['series'][0]['points']
+        hourly = tracker.get_dependency_history('a', 'b', bucket='hour')['series'][0]['points']
+
+        self.assertEqual([point['call_count'] for point in raw], [3, 3])
+        self.assertEqual(len({point['time'] for point in raw}), 1)
+        self.assertEqual([(point['sum_calls'], point['observations'], point['call_count']) for point in hourly],
+                         [(6, 2, 3.0)])
+
+    def test_database_from_before_rollups_opened_read_only(self):
+        tracker = DependencyTracker(self.path('dependencies.db'))
+        now = datetime.now().replace(microsecond=0)
+        self.ingest(tracker, now - timedelta(hours=2), 3)
+        self.ingest(tracker, now - timedelta(hours=1), 6)
+        tracker.conn.execute("DROP TABLE dependency_history_rollup")
+        tracker.conn.commit()
+        tracker.close()
+
+        reader = DependencyTracker(self.path('dependencies.db'), read_only=True)
+        self.addCleanup(reader.close)
+        raw = reader.get_dependency_history('a', 'b')
+        daily = reader.get_dependency_history('a', 'b', bucket='week')
+
+        self.assertEqual([point['call_count'] for point in raw['series'][0]['points']], [3, 6])
+        self.assertEqual(daily['series'][0]['points'][0]['sum_calls'], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()